@@ -0,0 +1,11 @@
+"""app URL Configuration for the ASGI entry point
+
+Same routes as app.urls, with the views listed in ASYNC_POOLED_VIEWS
+running in core.pool's thread pool.
+"""
+from django.conf import settings
+
+from app import urls
+from core.pool import pool_views
+
+urlpatterns = pool_views(urls.urlpatterns, set(settings.ASYNC_POOLED_VIEWS))
@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'core',
@@ -74,6 +75,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'app.wsgi.application'
 
+# app.asgi resolves against this urlconf, see core.pool
+ASGI_URLCONF = 'app.asgi_urls'
+
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
@@ -94,6 +98,23 @@ DATABASES = {
 }
 
 
+# per-user data versions and cached responses live here, so production
+# needs a cache shared by every worker (e.g. memcached), not locmem
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# whether every worker sees the default cache; None guesses from the
+# backend. List ETags and cached list responses are off when it is not.
+CACHE_IS_SHARED = {'1': True, '0': False}.get(
+    os.environ.get('CACHE_IS_SHARED')
+)
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -142,3 +163,93 @@ STATIC_ROOT = '/vol/web/static'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'core.User'
+
+
+# Django REST framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'recipe.pagination.KeysetPagination',
+    'PAGE_SIZE': 100,
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+}
+
+# upper bound for the ?page_size= query parameter on list endpoints
+RECIPE_API_MAX_PAGE_SIZE = 1000
+
+# upper bound for the number of items in one /recipes/bulk/ request
+RECIPE_BULK_MAX_ITEMS = 1000
+
+# rows fetched per server-side cursor round trip by /recipes/export/
+RECIPE_EXPORT_CHUNK_SIZE = 2000
+
+# seconds a cached list response lives, writes make it unreachable sooner
+RECIPE_RESPONSE_CACHE_TIMEOUT = 300
+
+# recipe.renditions: widths and formats generated for every recipe image,
+# encoder quality and the number of threads generating them
+RECIPE_IMAGE_RENDITIONS = {
+    'WIDTHS': [320, 640, 1280],
+    'FORMATS': ['webp', 'jpeg'],
+    'QUALITY': 80,
+    'WORKERS': 2,
+}
+
+# core.views.serve_media: 'sendfile' streams files itself, zero copy under
+# servers with a sendfile wsgi.file_wrapper; 'x-accel-redirect' (nginx) and
+# 'x-sendfile' (Apache) hand them to the front end server, where
+# ACCEL_PREFIX must be an internal location aliasing MEDIA_ROOT. MAX_AGE is
+# the cache lifetime in seconds of files that are not content addressed
+MEDIA_SERVING = {
+    'MODE': os.environ.get('MEDIA_SERVING_MODE', 'sendfile'),
+    'ACCEL_PREFIX': '/protected-media/',
+    'MAX_AGE': 3600,
+}
+
+# recipe.uploads: largest chunk in bytes accepted by the resumable
+# /recipes/<id>/uploads/ endpoints
+RECIPE_IMAGE_UPLOADS = {
+    'MAX_CHUNK_SIZE': 8 * 1024 * 1024,
+}
+
+# recipe.validators: limits checked on the size and header of every
+# uploaded recipe image before its pixels are decoded; FORMATS are Pillow
+# format names
+RECIPE_IMAGE_LIMITS = {
+    'MAX_BYTES': 20 * 1024 * 1024,
+    'MAX_PIXELS': 40 * 1000 * 1000,
+    'FORMATS': ['JPEG', 'PNG', 'WEBP', 'GIF'],
+}
+
+# users.authentication.CachedTokenAuthentication: per-process LRU size,
+# seconds an entry is trusted, and an optional shared cache alias
+TOKEN_AUTH_CACHE = {
+    'MAX_ENTRIES': 10000,
+    'TIMEOUT': 60,
+    'SHARED_CACHE': None,
+}
+
+# lifetimes in seconds of the signed tokens from /api/users/token/
+SIGNED_TOKENS = {
+    'ACCESS_TTL': 300,
+    'REFRESH_TTL': 14 * 24 * 3600,
+}
+
+# views that app.asgi runs in a thread pool of ASYNC_VIEW_THREADS threads,
+# which also caps the database connections those views hold at once
+ASYNC_POOLED_VIEWS = [
+    'recipe:recipe-list',
+    'recipe:recipe-detail',
+    'recipe:tag-list',
+    'recipe:ingredient-list',
+    'users:me',
+]
+ASYNC_VIEW_THREADS = int(os.environ.get('ASYNC_VIEW_THREADS', 16))
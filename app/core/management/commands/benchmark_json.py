@@ -0,0 +1,77 @@
+import decimal
+import io
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer, orjson
+
+
+class Command(BaseCommand):
+    """Benchmark encoding and decoding recipe list payloads"""
+
+    help = (
+        'Time the stdlib and orjson backed renderer and parser on synthetic '
+        'recipe list pages and print their throughput.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING(
+                'orjson is not installed, both paths use the stdlib encoder'
+            ))
+
+        for size in options['sizes']:
+            data = {'next': None, 'previous': None, 'results': self.recipes(size)}
+            body = JSONRenderer().render(data)
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{size} recipes, {len(body) / 1024:.0f} KiB'
+            ))
+
+            for name, renderer in (('stdlib', JSONRenderer()), ('orjson', FastJSONRenderer())):
+                if renderer.render(data) != body:
+                    raise CommandError(f'{name} output differs at {size} recipes')
+                self.report(f'encode {name}', len(body), options['repeat'],
+                            lambda: renderer.render(data))
+
+            for name, parser in (('stdlib', JSONParser()), ('orjson', FastJSONParser())):
+                self.report(f'decode {name}', len(body), options['repeat'],
+                            lambda: parser.parse(io.BytesIO(body)))
+
+    def recipes(self, count):
+        """return recipe list items with Decimal prices"""
+        return [
+            {
+                'id': i,
+                'title': f'Recipe {i}',
+                'time_minutes': 1 + i % 120,
+                'price': decimal.Decimal(i % 500) / 10,
+                'link': f'https://example.com/recipes/{i}',
+                'tags': list(range(i % 7)),
+                'ingredients': list(range(i % 11)),
+            }
+            for i in range(count)
+        ]
+
+    def report(self, label, size, repeat, func):
+        """print the median latency and throughput of func"""
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+
+        median = statistics.median(timings)
+        self.stdout.write(
+            f'{label:14} median {median * 1000:8.2f} ms, '
+            f'{size / median / 2 ** 20:8.1f} MiB/s'
+        )
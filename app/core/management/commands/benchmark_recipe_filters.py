@@ -0,0 +1,113 @@
+import statistics
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.models import Recipe
+from recipe import filters
+
+
+class Command(BaseCommand):
+    """Benchmark tag filtering of the recipe list on a large synthetic account"""
+
+    help = (
+        'Seed a throwaway user with many recipes and print the query plan '
+        'and latency of the ANY/ALL tag filters. Do not run on production.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000000)
+        parser.add_argument('--tags', type=int, default=50)
+        parser.add_argument('--tags-per-recipe', type=int, default=3)
+        parser.add_argument('--filter-tags', type=int, default=2,
+                            help='number of tag ids in the filter')
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--keep', action='store_true',
+                            help='keep the seeded data instead of deleting it')
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.create_user(
+            f'benchmark-{uuid.uuid4().hex}@example.com', uuid.uuid4().hex
+        )
+        try:
+            self.seed(user, options)
+            # tags of one recipe, so match=all has results too
+            tag_ids = list(
+                Recipe.tags.through.objects.filter(
+                    recipe_id=user.recipe_set.order_by('id').values('id')[:1]
+                ).values_list('tag_id', flat=True)
+            )[:options['filter_tags']]
+
+            for match in filters.MATCH_MODES:
+                queryset = filters.filter_recipes(
+                    Recipe.objects.filter(user=user), tag_ids=tag_ids, match=match
+                ).order_by('-id')[:options['page_size']]
+                self.report(match, queryset, options['repeat'])
+        finally:
+            if not options['keep']:
+                self.stdout.write('Deleting benchmark data ...')
+                user.delete()
+
+    def seed(self, user, options):
+        """insert tags, recipes and through rows with set based SQL"""
+        self.stdout.write(f"Seeding {options['recipes']} recipes ...")
+        start = time.perf_counter()
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO core_tag (name, user_id) "
+                "SELECT 'tag ' || i, %s FROM generate_series(1, %s) AS i",
+                [user.id, options['tags']],
+            )
+            cursor.execute(
+                "INSERT INTO core_recipe "
+                "(title, time_minutes, price, link, tag_ids, ingredient_ids, version, user_id) "
+                "SELECT 'recipe ' || i, 1 + i %% 120, (i %% 500) / 10.0, '', '{}', '{}', 1, %s "
+                "FROM generate_series(1, %s) AS i",
+                [user.id, options['recipes']],
+            )
+            # spread tags so each one matches roughly tags_per_recipe / tags
+            # of the recipes and tag pairs overlap on a smaller fraction
+            cursor.execute(
+                "INSERT INTO core_recipe_tags (recipe_id, tag_id) "
+                "SELECT DISTINCT r.id, t.ids[1 + (r.id * 7919 + j * 104729) %% t.n] "
+                "FROM core_recipe r, generate_series(0, %s - 1) AS j, "
+                "(SELECT array_agg(id ORDER BY id) AS ids, count(*) AS n "
+                " FROM core_tag WHERE user_id = %s) AS t "
+                "WHERE r.user_id = %s",
+                [options['tags_per_recipe'], user.id, user.id],
+            )
+            cursor.execute(
+                "UPDATE core_recipe r SET tag_ids = ("
+                " SELECT array_agg(tag_id ORDER BY tag_id) FROM core_recipe_tags"
+                " WHERE recipe_id = r.id) "
+                "WHERE r.user_id = %s",
+                [user.id],
+            )
+            # sets the visibility map too, so index only scans are possible
+            cursor.execute('VACUUM ANALYZE core_recipe, core_tag, core_recipe_tags')
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f'Seeded in {elapsed:.1f}s'))
+
+    def report(self, match, queryset, repeat):
+        """print the plan and latency percentiles for queryset"""
+        self.stdout.write(self.style.MIGRATE_HEADING(f'match={match}'))
+        self.stdout.write(queryset.explain(analyze=True, buffers=True))
+
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            list(queryset.values_list('id', flat=True))
+            timings.append((time.perf_counter() - start) * 1000)
+
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(
+            f'median {statistics.median(timings):.2f} ms, '
+            f'p95 {p95:.2f} ms over {repeat} runs'
+        )
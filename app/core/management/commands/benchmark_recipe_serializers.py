@@ -0,0 +1,107 @@
+import statistics
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Recipe
+from recipe.fastpath import FastListSerializer
+from recipe.serializers import RecipeSerializer
+
+
+class Command(BaseCommand):
+    """Compare DRF list serialization of recipes against the fast path"""
+
+    help = (
+        'Seed a throwaway user with recipes and time rendering them with '
+        'RecipeSerializer(many=True) and with FastListSerializer. '
+        'Do not run on production.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+        parser.add_argument('--tags', type=int, default=50)
+        parser.add_argument('--tags-per-recipe', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--keep', action='store_true',
+                            help='keep the seeded data instead of deleting it')
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.create_user(
+            f'benchmark-{uuid.uuid4().hex}@example.com', uuid.uuid4().hex
+        )
+        try:
+            self.seed(user, max(options['sizes']), options)
+            engine = FastListSerializer(RecipeSerializer)
+            renderer = JSONRenderer()
+
+            for size in options['sizes']:
+                queryset = Recipe.objects.filter(user=user).order_by('-id')[:size]
+                self.stdout.write(self.style.MIGRATE_HEADING(f'{size} rows'))
+
+                drf = self.time(options['repeat'], lambda: renderer.render(
+                    RecipeSerializer(queryset, many=True).data
+                ))
+                fast = self.time(options['repeat'], lambda: renderer.render(
+                    engine.render(engine.rows(queryset))
+                ))
+                if drf[1] != fast[1]:
+                    raise CommandError(f'output differs at {size} rows')
+
+                self.stdout.write(
+                    f'drf  median {drf[0]:.1f} ms\n'
+                    f'fast median {fast[0]:.1f} ms '
+                    f'({drf[0] / fast[0]:.1f}x), {len(fast[1])} bytes identical'
+                )
+        finally:
+            if not options['keep']:
+                self.stdout.write('Deleting benchmark data ...')
+                user.delete()
+
+    def seed(self, user, count, options):
+        """insert tags, recipes and through rows with set based SQL"""
+        self.stdout.write(f'Seeding {count} recipes ...')
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO core_tag (name, user_id) "
+                "SELECT 'tag ' || i, %s FROM generate_series(1, %s) AS i",
+                [user.id, options['tags']],
+            )
+            cursor.execute(
+                "INSERT INTO core_recipe "
+                "(title, time_minutes, price, link, tag_ids, ingredient_ids, version, user_id) "
+                "SELECT 'recipe ' || i, 1 + i %% 120, (i %% 500) / 10.0, '', '{}', '{}', 1, %s "
+                "FROM generate_series(1, %s) AS i",
+                [user.id, count],
+            )
+            cursor.execute(
+                "INSERT INTO core_recipe_tags (recipe_id, tag_id) "
+                "SELECT DISTINCT r.id, t.ids[1 + (r.id * 7919 + j * 104729) %% t.n] "
+                "FROM core_recipe r, generate_series(0, %s - 1) AS j, "
+                "(SELECT array_agg(id ORDER BY id) AS ids, count(*) AS n "
+                " FROM core_tag WHERE user_id = %s) AS t "
+                "WHERE r.user_id = %s",
+                [options['tags_per_recipe'], user.id, user.id],
+            )
+            cursor.execute(
+                "UPDATE core_recipe r SET tag_ids = ("
+                " SELECT array_agg(tag_id ORDER BY tag_id) FROM core_recipe_tags"
+                " WHERE recipe_id = r.id) "
+                "WHERE r.user_id = %s",
+                [user.id],
+            )
+
+    def time(self, repeat, render):
+        """return the median milliseconds of render() and its last output"""
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            output = render()
+            timings.append((time.perf_counter() - start) * 1000)
+
+        return statistics.median(timings), output
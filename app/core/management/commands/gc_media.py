@@ -0,0 +1,231 @@
+import os
+import posixpath
+import re
+import time
+from datetime import datetime, timezone
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.models import ImageUpload, Recipe, StoredImage
+from core.storage import PENDING_PREFIX, image_storage
+
+
+CONTENT_STEM = re.compile(r'^[0-9a-f]{64}$')
+
+
+def walk(root, prefix):
+    """yield (name, stat) of the files under root/prefix, depth first"""
+    try:
+        entries = os.scandir(os.path.join(root, prefix))
+    except FileNotFoundError:
+        return
+
+    with entries:
+        for entry in entries:
+            name = posixpath.join(prefix, entry.name)
+            if entry.is_dir(follow_symlinks=False):
+                yield from walk(root, name)
+            elif entry.is_file(follow_symlinks=False):
+                yield name, entry.stat(follow_symlinks=False)
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    """Delete media files nothing refers to"""
+
+    help = (
+        'Delete recipe images whose StoredImage count has been 0 for the '
+        'grace period, renditions of images that are gone and abandoned '
+        'chunked uploads. Old files without a StoredImage row are counted '
+        'from Recipe.image, or deleted when no recipe uses them. Every image '
+        'is deleted under its StoredImage row lock, which uploads of the '
+        'same bytes take too, so it is safe to run while uploads are in '
+        'progress.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=float, default=24,
+                            help='hours a file is kept after it was last used or written')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='only report what would be deleted')
+
+    def handle(self, *args, **options):
+        if options['grace'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--grace and --batch-size must be positive')
+
+        self.root = image_storage.location
+        self.cutoff = time.time() - options['grace'] * 3600
+        self.cutoff_time = datetime.fromtimestamp(self.cutoff, tz=timezone.utc)
+        self.dry_run = options['dry_run']
+        self.batch_size = options['batch_size']
+
+        for label, collect in (
+            ('images', self.collect_images),
+            ('renditions', self.collect_renditions),
+            ('partial uploads', self.collect_uploads),
+        ):
+            self.files = self.bytes = 0
+            collect()
+            verb = 'Would delete' if self.dry_run else 'Deleted'
+            self.stdout.write(
+                f'{verb} {self.files} {label}, {self.bytes / 2 ** 20:.1f} MiB'
+            )
+
+    def is_old(self, name):
+        try:
+            return os.stat(os.path.join(self.root, name)).st_mtime < self.cutoff
+        except FileNotFoundError:
+            return False
+
+    def delete(self, name, size):
+        if not self.dry_run:
+            os.remove(os.path.join(self.root, name))
+        self.files += 1
+        self.bytes += size
+
+    def collect_images(self):
+        """recipe images whose StoredImage count stayed 0, and uncounted files"""
+        unused = StoredImage.objects.filter(refcount=0, updated__lt=self.cutoff_time) \
+            .values_list('name', flat=True).iterator()
+        for batch in batches(unused, self.batch_size):
+            for name in batch:
+                self.delete_unused(name)
+
+        # files written before the counts, or through paths that skip them
+        old_files = (
+            (name, stat) for name, stat in walk(self.root, 'uploads/recipe')
+            if stat.st_mtime < self.cutoff and not name.startswith(PENDING_PREFIX)
+        )
+        for batch in batches(old_files, self.batch_size):
+            counted = set(
+                StoredImage.objects.filter(name__in=[name for name, _ in batch])
+                .values_list('name', flat=True)
+            )
+            for name, stat in batch:
+                if name not in counted:
+                    self.count_or_delete(name, stat.st_size)
+
+    def delete_unused(self, name):
+        with transaction.atomic():
+            # uploads of the same bytes lock the row before reusing the file
+            stored = StoredImage.objects.select_for_update().filter(
+                name=name, refcount=0, updated__lt=self.cutoff_time
+            ).first()
+            if stored is None:
+                return
+            # a count that missed a reference is repaired, not trusted
+            references = Recipe.objects.filter(image=name).count()
+            if references:
+                if not self.dry_run:
+                    StoredImage.objects.filter(name=name).update(refcount=references)
+                return
+            try:
+                size = os.stat(os.path.join(self.root, name)).st_size
+            except FileNotFoundError:
+                pass
+            else:
+                self.delete(name, size)
+            if not self.dry_run:
+                stored.delete()
+
+    def count_or_delete(self, name, size):
+        """start counting a file without a StoredImage row, or delete it"""
+        if self.dry_run:
+            if not Recipe.objects.filter(image=name).exists():
+                self.delete(name, size)
+            return
+
+        with transaction.atomic():
+            # inserting the row locks it like delete_unused() does
+            stored, created = StoredImage.objects.get_or_create(
+                name=name, defaults={'size': size}
+            )
+            if not created:
+                return
+            references = Recipe.objects.filter(image=name).count()
+            if references or not self.is_old(name):
+                StoredImage.objects.filter(name=name).update(refcount=references)
+                return
+            self.delete(name, size)
+            stored.delete()
+
+    def collect_renditions(self):
+        """rendition directories whose original image is gone
+
+        Runs after collect_images, so a dry run does not count the
+        renditions of images it would delete.
+        """
+        prefix = 'renditions/recipe'
+        self.legacy_stems = None
+        try:
+            entries = os.scandir(os.path.join(self.root, prefix))
+        except FileNotFoundError:
+            return
+
+        with entries:
+            for entry in entries:
+                if not entry.is_dir(follow_symlinks=False) \
+                        or self.original_exists(entry.name):
+                    continue
+                directory = posixpath.join(prefix, entry.name)
+                for name, stat in walk(self.root, directory):
+                    if stat.st_mtime < self.cutoff:
+                        self.delete(name, stat.st_size)
+                if not self.dry_run:
+                    try:
+                        os.rmdir(os.path.join(self.root, directory))
+                    except OSError:
+                        # not empty, a rendition was written meanwhile
+                        pass
+
+    def original_exists(self, stem):
+        if CONTENT_STEM.match(stem):
+            directory = os.path.join(self.root, 'uploads/recipe', stem[:2])
+            try:
+                with os.scandir(directory) as entries:
+                    return any(
+                        posixpath.splitext(entry.name)[0] == stem for entry in entries
+                    )
+            except FileNotFoundError:
+                return False
+
+        # the uuid names images had before content addressing
+        if self.legacy_stems is None:
+            self.legacy_stems = set()
+            try:
+                with os.scandir(os.path.join(self.root, 'uploads/recipe')) as entries:
+                    self.legacy_stems.update(
+                        posixpath.splitext(entry.name)[0] for entry in entries
+                        if entry.is_file(follow_symlinks=False)
+                    )
+            except FileNotFoundError:
+                pass
+        return stem in self.legacy_stems
+
+    def collect_uploads(self):
+        """chunked uploads not written to for the grace period"""
+        for name, stat in walk(self.root, 'uploads/partial'):
+            if stat.st_mtime >= self.cutoff:
+                continue
+            with transaction.atomic():
+                # waits for a chunk being written right now
+                uploads = list(
+                    ImageUpload.objects.select_for_update().filter(name=name)
+                )
+                if not self.is_old(name):
+                    continue
+                self.delete(name, stat.st_size)
+                if not self.dry_run:
+                    for upload in uploads:
+                        upload.delete()
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from recipe import renditions
+
+
+class Command(BaseCommand):
+    """Generate missing recipe image renditions"""
+
+    help = (
+        'Render the image renditions of recipes that have none, e.g. after a '
+        'restart dropped queued jobs. With --all re-render every image, e.g. '
+        'after changing RECIPE_IMAGE_RENDITIONS.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='also re-render images that have renditions')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['all']:
+            recipes = recipes.filter(image_renditions__isnull=True)
+
+        done = failed = 0
+        for recipe_id, image_name in recipes.values_list('id', 'image').iterator():
+            if renditions.generate(recipe_id, image_name, force=options['all']):
+                done += 1
+            else:
+                failed += 1
+
+        self.stdout.write(f'Rendered {done} images, {failed} failed')
@@ -0,0 +1,251 @@
+import contextlib
+import csv
+import io
+import json
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.models import ImportCheckpoint, Ingredient, Recipe, Tag
+from core.renderers import orjson
+from core.versions import bump_data_version
+from recipe.export import LIST_SEPARATOR
+
+
+loads = orjson.loads if orjson else json.loads
+
+RECIPE_COLUMNS = (
+    'id', 'user_id', 'title', 'time_minutes', 'price', 'link',
+    'tag_ids', 'ingredient_ids', 'version',
+)
+
+
+def copy_text(value):
+    """format value as a column of COPY's text format"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, list):
+        return '{' + ','.join(map(str, value)) + '}'
+
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t') \
+        .replace('\n', '\\n').replace('\r', '\\r')
+
+
+def copy_rows(cursor, table, columns, rows):
+    """load rows into table with a single COPY FROM STDIN"""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(map(copy_text, row)) + '\n')
+    buffer.seek(0)
+
+    quote = connection.ops.quote_name
+    cursor.copy_expert(
+        f"COPY {quote(table)} ({', '.join(map(quote, columns))}) FROM STDIN",
+        buffer
+    )
+
+
+def allocate_ids(cursor, model, count):
+    """reserve count primary keys from the model's id sequence"""
+    cursor.execute(
+        'SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)',
+        [model._meta.db_table, model._meta.pk.column, count]
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _names(value):
+    if isinstance(value, str):
+        value = value.split(LIST_SEPARATOR) if value else []
+    names = [str(name).strip() for name in value or []]
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def clean(record, number):
+    """return a validated recipe dict for the input record number"""
+    try:
+        title = str(record['title']).strip()
+        time_minutes = int(record['time_minutes'])
+        price = Decimal(str(record['price'])).quantize(Decimal('0.01'))
+    except (KeyError, TypeError, ValueError, InvalidOperation) as exc:
+        raise CommandError(f'record {number}: invalid or missing {exc}')
+
+    link = str(record.get('link') or '')
+    tags = _names(record.get('tags'))
+    ingredients = _names(record.get('ingredients'))
+
+    if not title or len(title) > 255 or len(link) > 255:
+        raise CommandError(f'record {number}: title and link must be 1-255 characters')
+    if abs(price) >= 1000:
+        raise CommandError(f'record {number}: price must be below 1000')
+    if any(len(name) > 255 for name in tags + ingredients):
+        raise CommandError(f'record {number}: names must be at most 255 characters')
+
+    return {
+        'title': title,
+        'time_minutes': time_minutes,
+        'price': price,
+        'link': link,
+        'tags': tags,
+        'ingredients': ingredients,
+    }
+
+
+class Command(BaseCommand):
+    """Load recipes for one user from NDJSON or CSV with COPY"""
+
+    help = (
+        'Import recipes, deduplicating tags and ingredients by name. Reads '
+        'the NDJSON or CSV written by /api/recipe/recipes/export/.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="input file, or '-' for stdin")
+        parser.add_argument('--user', required=True, help='email of the owner')
+        parser.add_argument('--format', choices=('ndjson', 'csv'),
+                            help='input format, by default from the file extension')
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument(
+            '--checkpoint',
+            help='commit every batch and record progress under this name; '
+                 'rerunning with the same name resumes after the last batch. '
+                 'Without it the whole input is loaded in one transaction.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"no user with email {options['user']}")
+
+        checkpoint = None
+        if options['checkpoint']:
+            checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+                name=options['checkpoint'], defaults={'user': user}
+            )
+            if checkpoint.user_id != user.id:
+                raise CommandError('checkpoint belongs to another user')
+            if checkpoint.records:
+                self.stdout.write(f'Resuming after {checkpoint.records} records')
+
+        self.tag_ids = {}
+        self.ingredient_ids = {}
+        self.counts = dict.fromkeys(('recipes', 'tags', 'ingredients', 'relations'), 0)
+        self.start = time.perf_counter()
+
+        fmt = options['format'] or ('csv' if options['path'].endswith('.csv') else 'ndjson')
+        skip = checkpoint.records if checkpoint else 0
+
+        with self.open(options['path']) as stream:
+            records = islice(enumerate(self.read(stream, fmt), 1), skip, None)
+            batches = iter(lambda: list(islice(records, options['batch_size'])), [])
+
+            # one transaction for the input, or one per batch with a checkpoint
+            outer = transaction.atomic() if checkpoint is None else contextlib.nullcontext()
+            with outer, connection.cursor() as cursor:
+                for batch in batches:
+                    with transaction.atomic():
+                        recipes = [clean(record, number) for number, record in batch]
+                        self.load(cursor, user, recipes)
+                        if checkpoint is not None:
+                            checkpoint.records = batch[-1][0]
+                            checkpoint.save(update_fields=['records', 'updated'])
+                    self.report(batch[-1][0])
+
+        self.report(None)
+
+    def open(self, path):
+        if path == '-':
+            return contextlib.nullcontext(sys.stdin)
+        try:
+            return open(path, newline='', encoding='utf-8')
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+    def read(self, stream, fmt):
+        """yield input records as dicts"""
+        if fmt == 'csv':
+            yield from csv.DictReader(stream)
+            return
+
+        for number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                yield loads(line)
+            except ValueError as exc:
+                raise CommandError(f'line {number}: invalid JSON, {exc}')
+
+    def resolve(self, cursor, model, user, names, cache):
+        """add {name: id} for names to cache, insert missing ones, return how many"""
+        missing = [name for name in names if name not in cache]
+        if missing:
+            # oldest first wins when a name already exists more than once
+            existing = model.objects.filter(user=user, name__in=missing) \
+                .order_by('-id').values_list('name', 'id')
+            cache.update(existing)
+
+        missing = [name for name in missing if name not in cache]
+        if missing:
+            ids = allocate_ids(cursor, model, len(missing))
+            copy_rows(cursor, model._meta.db_table, ('id', 'name', 'user_id'),
+                      [(pk, name, user.id) for pk, name in zip(ids, missing)])
+            cache.update(zip(missing, ids))
+
+        return len(missing)
+
+    def load(self, cursor, user, recipes):
+        """COPY one batch of recipes, their new tags/ingredients and relations"""
+        tag_names = list(dict.fromkeys(n for r in recipes for n in r['tags']))
+        ingredient_names = list(dict.fromkeys(n for r in recipes for n in r['ingredients']))
+        self.counts['tags'] += self.resolve(cursor, Tag, user, tag_names, self.tag_ids)
+        self.counts['ingredients'] += self.resolve(
+            cursor, Ingredient, user, ingredient_names, self.ingredient_ids
+        )
+
+        ids = allocate_ids(cursor, Recipe, len(recipes))
+        rows, tag_rows, ingredient_rows = [], [], []
+        for pk, recipe in zip(ids, recipes):
+            tag_ids = sorted(self.tag_ids[name] for name in recipe['tags'])
+            ingredient_ids = sorted(self.ingredient_ids[name] for name in recipe['ingredients'])
+            rows.append((
+                pk, user.id, recipe['title'], recipe['time_minutes'],
+                recipe['price'], recipe['link'], tag_ids, ingredient_ids, 1,
+            ))
+            tag_rows.extend((pk, tag_id) for tag_id in tag_ids)
+            ingredient_rows.extend((pk, ingredient_id) for ingredient_id in ingredient_ids)
+
+        copy_rows(cursor, Recipe._meta.db_table, RECIPE_COLUMNS, rows)
+        copy_rows(cursor, Recipe.tags.through._meta.db_table,
+                  ('recipe_id', 'tag_id'), tag_rows)
+        copy_rows(cursor, Recipe.ingredients.through._meta.db_table,
+                  ('recipe_id', 'ingredient_id'), ingredient_rows)
+
+        # the id arrays were copied, only the search vector is left
+        Recipe.objects.filter(id__in=ids).update_search_vector()
+        # COPY sends no signals
+        bump_data_version(user.id)
+
+        self.counts['recipes'] += len(rows)
+        self.counts['relations'] += len(tag_rows) + len(ingredient_rows)
+
+    def report(self, record):
+        """print progress after a batch, or the totals when record is None"""
+        elapsed = time.perf_counter() - self.start
+        rows = sum(self.counts.values())
+        rate = rows / elapsed if elapsed else 0
+
+        if record is not None:
+            self.stdout.write(f'{record} records read, {rate:.0f} rows/s')
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {self.counts['recipes']} recipes, {self.counts['tags']} tags, "
+            f"{self.counts['ingredients']} ingredients and "
+            f"{self.counts['relations']} relations in {elapsed:.1f}s ({rate:.0f} rows/s)"
+        ))
@@ -0,0 +1,124 @@
+import asyncio
+import ssl
+import statistics
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """Load a running server with concurrent slow clients"""
+
+    help = (
+        'Send GET requests to a running server from many concurrent clients '
+        'that write their request and read the response slowly, and report '
+        'throughput and latency. Run it against the same code served both '
+        'ways, e.g. `gunicorn --threads 16 app.wsgi` and '
+        '`uvicorn app.asgi:application`, to compare the WSGI and ASGI paths.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='full URL of the endpoint to load')
+        parser.add_argument('--clients', type=int, default=100,
+                            help='number of concurrent connections')
+        parser.add_argument('--requests', type=int, default=5,
+                            help='requests sent by each client, one at a time')
+        parser.add_argument('--header', action='append', default=[],
+                            help="extra request header, e.g. 'Authorization: Token ...'")
+        parser.add_argument('--send-delay', type=float, default=0.0,
+                            help='seconds between request header lines')
+        parser.add_argument('--read-delay', type=float, default=0.0,
+                            help='seconds between reads of the response')
+        parser.add_argument('--chunk-size', type=int, default=1024,
+                            help='bytes read from the response at a time')
+        parser.add_argument('--timeout', type=float, default=60.0,
+                            help='seconds before a request counts as failed')
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme not in ('http', 'https') or not url.hostname:
+            raise CommandError('url must be an absolute http(s) URL')
+        for header in options['header']:
+            if ':' not in header:
+                raise CommandError(f'bad header {header!r}, expected "Name: value"')
+
+        started = time.perf_counter()
+        results = asyncio.run(self.run(url, options))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for _, latency in results)
+        statuses = Counter(status for status, _ in results)
+        self.stdout.write(
+            f"{len(results)} requests from {options['clients']} clients "
+            f"in {elapsed:.2f}s: {len(results) / elapsed:.1f} req/s"
+        )
+        self.stdout.write(
+            f'latency p50 {statistics.median(latencies) * 1000:.0f}ms, '
+            f'p95 {latencies[int((len(latencies) - 1) * 0.95)] * 1000:.0f}ms, '
+            f'max {latencies[-1] * 1000:.0f}ms'
+        )
+        self.stdout.write('status ' + ', '.join(
+            f'{status}: {count}' for status, count in sorted(statuses.items(), key=str)
+        ))
+
+    async def run(self, url, options):
+        clients = [
+            self.client(url, options) for _ in range(options['clients'])
+        ]
+        results = []
+        for client_results in await asyncio.gather(*clients):
+            results.extend(client_results)
+        return results
+
+    async def client(self, url, options):
+        results = []
+        for _ in range(options['requests']):
+            started = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(
+                    self.request(url, options), options['timeout']
+                )
+            except (asyncio.TimeoutError, OSError, ValueError, IndexError):
+                # the server refused, dropped, garbled or never answered
+                status = 'error'
+            results.append((status, time.perf_counter() - started))
+        return results
+
+    async def request(self, url, options):
+        https = url.scheme == 'https'
+        reader, writer = await asyncio.open_connection(
+            url.hostname, url.port or (443 if https else 80),
+            ssl=ssl.create_default_context() if https else None,
+        )
+        try:
+            target = url.path or '/'
+            if url.query:
+                target += '?' + url.query
+            lines = [
+                f'GET {target} HTTP/1.1',
+                f'Host: {url.netloc}',
+                'Accept: application/json',
+                'Connection: close',
+                *options['header'],
+            ]
+            for line in lines:
+                writer.write(f'{line}\r\n'.encode('latin-1'))
+                await writer.drain()
+                if options['send_delay']:
+                    await asyncio.sleep(options['send_delay'])
+            writer.write(b'\r\n')
+            await writer.drain()
+
+            status_line = await reader.readline()
+            if not status_line:
+                raise ConnectionResetError('empty response')
+            # Connection: close, so the response ends at EOF
+            while await reader.read(options['chunk_size']):
+                if options['read_delay']:
+                    await asyncio.sleep(options['read_delay'])
+
+            return int(status_line.split()[1])
+        finally:
+            writer.close()
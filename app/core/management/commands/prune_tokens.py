@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from core.models import DeniedToken
+
+
+class Command(BaseCommand):
+    """Delete denylist entries of expired refresh tokens"""
+
+    help = (
+        'Delete denied refresh token ids whose tokens have expired, and with '
+        '--db-token-max-age also database tokens older than that many days.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--db-token-max-age', type=int,
+                            help='delete authtoken tokens created more than N days ago')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        # expired refresh tokens fail their signature check on their own
+        denied, _ = DeniedToken.objects.filter(expires__lte=now).delete()
+        self.stdout.write(f'Deleted {denied} expired denylist entries')
+
+        if options['db_token_max_age'] is not None:
+            cutoff = now - timedelta(days=options['db_token_max_age'])
+            tokens, _ = Token.objects.filter(created__lt=cutoff).delete()
+            self.stdout.write(f'Deleted {tokens} database tokens')
@@ -0,0 +1,107 @@
+"""
+Helpers for serving recipe images and renditions from MEDIA_ROOT.
+
+core.views.serve_media answers conditional and Range requests itself and
+then either streams the file through FileResponse, which WSGI servers with
+a sendfile capable wsgi.file_wrapper (gunicorn, uWSGI) send without
+copying through Python, or hands the file to the front end server with
+X-Accel-Redirect (nginx) or X-Sendfile (Apache, lighttpd).
+"""
+import re
+
+from django.conf import settings
+
+from core.storage import CONTENT_NAME
+
+
+DEFAULTS = {
+    'MODE': 'sendfile',
+    'ACCEL_PREFIX': '/protected-media/',
+    'MAX_AGE': 3600,
+}
+
+MODES = ('sendfile', 'x-accel-redirect', 'x-sendfile')
+
+# only these parts of MEDIA_ROOT are public, uploads in progress are not
+PUBLIC_PREFIXES = ('uploads/recipe/', 'renditions/recipe/')
+
+# content addressed names never change their bytes
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'MEDIA_SERVING', {})}
+
+
+def is_public(name):
+    return name.startswith(PUBLIC_PREFIXES)
+
+
+def etag_and_cache_control(name, stat):
+    """the strong ETag and Cache-Control header of the file name"""
+    match = CONTENT_NAME.match(name)
+    if match is not None:
+        return f'"{match.group(1)}"', IMMUTABLE
+
+    # renditions keep their names when re-rendered with other settings
+    return (
+        f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"',
+        f"public, max-age={get_config()['MAX_AGE']}",
+    )
+
+
+def parse_range(header, size):
+    """
+    return the (start, end) of a single byte range header, end inclusive
+
+    Returns None to send the whole file: without a header, for malformed
+    headers and for multiple ranges, which RFC 9110 allows ignoring.
+    Raises ValueError for ranges that do not overlap the file.
+    """
+    match = RANGE.match(header or '')
+    if match is None:
+        return None
+
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError('empty suffix range')
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError('range not satisfiable')
+    return start, end
+
+
+class FileRange:
+    """file-like view of length bytes of file from start, for FileResponse
+
+    Keeps fileno(), so a sendfile capable wsgi.file_wrapper still sends the
+    range from the current offset without copying.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,43 @@
+"""
+Counters shared by all workers through the default cache.
+
+Counters are declared at import time so that `snapshot()` can report every
+one of them, including those that have not been incremented yet.
+"""
+from django.core.cache import cache
+
+
+_counters = {}
+
+
+class Counter:
+    """a named counter, incremented with incr()"""
+
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self.key = f'metrics:{name}'
+        _counters[name] = self
+
+    def incr(self, delta=1):
+        try:
+            cache.incr(self.key, delta)
+        except ValueError:
+            # first use, or evicted; another worker may add it meanwhile
+            if not cache.add(self.key, delta, timeout=None):
+                cache.incr(self.key, delta)
+
+    def value(self):
+        return cache.get(self.key, 0)
+
+
+def snapshot():
+    """return {name: {'value', 'description'}} for every declared counter"""
+    values = cache.get_many([counter.key for counter in _counters.values()])
+    return {
+        name: {
+            'value': values.get(counter.key, 0),
+            'description': counter.description,
+        }
+        for name, counter in sorted(_counters.items())
+    }
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Index the recipe M2M tables by related object first.
+
+    Django only creates single column indexes and a (recipe_id, related_id)
+    unique constraint on auto-created through tables. Filtering recipes by
+    tag or ingredient ids starts from the related side, so these composite
+    indexes let both the EXISTS and the grouped HAVING plans run as index
+    only scans.
+    """
+
+    dependencies = [
+        ('core', '0008_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX core_recipe_tags_tag_recipe_idx '
+                'ON core_recipe_tags (tag_id, recipe_id);',
+            reverse_sql='DROP INDEX core_recipe_tags_tag_recipe_idx;',
+        ),
+        migrations.RunSQL(
+            sql='CREATE INDEX core_recipe_ingredients_ingredient_recipe_idx '
+                'ON core_recipe_ingredients (ingredient_id, recipe_id);',
+            reverse_sql='DROP INDEX core_recipe_ingredients_ingredient_recipe_idx;',
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 3.2.12 on 2026-10-18 19:08
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+# same sorted arrays as RecipeQuerySet.update_derived_fields
+BACKFILL_SQL = '''
+UPDATE core_recipe r SET
+    tag_ids = coalesce((
+        SELECT array_agg(rt.tag_id ORDER BY rt.tag_id)
+        FROM core_recipe_tags rt WHERE rt.recipe_id = r.id), '{}'),
+    ingredient_ids = coalesce((
+        SELECT array_agg(ri.ingredient_id ORDER BY ri.ingredient_id)
+        FROM core_recipe_ingredients ri WHERE ri.recipe_id = r.id), '{}');
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_recipe_ordering_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='tag_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.RunSQL(
+            sql=BACKFILL_SQL,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['user', 'tag_ids'], name='core_recipe_user_tag_ids', opclasses=['int8_ops', 'array_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['user', 'ingredient_ids'], name='core_recipe_user_ingr_ids', opclasses=['int8_ops', 'array_ops']),
+        ),
+    ]
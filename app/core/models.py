@@ -1,16 +1,23 @@
 from django.db import models
+from django.contrib.postgres.aggregates import ArrayAgg, StringAgg
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.conf import settings
 import uuid
-import os
+
+from core.storage import get_image_storage, pending_name
 
 
 def recipe_image_file_path(instance, filename):
-    """Generate file path for new recipe image"""
-    ext = filename.split('.')[-1]
-    filename = f"{uuid.uuid4()}.{ext}"
+    """Generate the file path for a new recipe image"""
+    # the storage hashes the bytes once and saves them under that address
+    return pending_name(filename)
 
-    return os.path.join('uploads/recipe/', filename)
 
 class UserManager(BaseUserManager):
     def create_user(self, email, password=None, **kwargs):
@@ -55,6 +62,18 @@ class Tag(models.Model):
         on_delete=models.CASCADE,
     )
 
+    class Meta:
+        indexes = [
+            # keyset pagination walks (user, name, id) backwards
+            models.Index(fields=['user', 'name', 'id']),
+            # autocomplete, needs the btree_gin and pg_trgm extensions
+            GinIndex(
+                name='core_tag_user_name_trgm',
+                fields=['user', 'name'],
+                opclasses=['int8_ops', 'gin_trgm_ops'],
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -66,10 +85,81 @@ class Ingredient(models.Model):
         on_delete=models.CASCADE
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'name', 'id']),
+            GinIndex(
+                name='core_ingredient_user_name_trgm',
+                fields=['user', 'name'],
+                opclasses=['int8_ops', 'gin_trgm_ops'],
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
 
+# text search configuration used for Recipe.search_vector and queries on it
+SEARCH_CONFIG = 'english'
+
+
+def _related_names(model):
+    """subquery of the space separated names of model related to a recipe"""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(recipe=OuterRef('pk'))
+            .values('recipe')
+            .annotate(names=StringAgg('name', ' '))
+            .values('names')
+        ),
+        Value(''),
+    )
+
+
+def _related_ids(through, column):
+    """subquery of the sorted ids in column of a recipe's through rows"""
+    return Coalesce(
+        Subquery(
+            through.objects.filter(recipe_id=OuterRef('pk'))
+            .values('recipe_id')
+            .annotate(ids=ArrayAgg(column, ordering=column))
+            .values('ids')
+        ),
+        Value([], output_field=ArrayField(models.BigIntegerField())),
+    )
+
+
+def _search_vector():
+    """title weighted above the names of the recipe's tags and ingredients"""
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(_related_names(Tag), weight='B', config=SEARCH_CONFIG)
+        + SearchVector(_related_names(Ingredient), weight='B', config=SEARCH_CONFIG)
+    )
+
+
+class RecipeQuerySet(models.QuerySet):
+    def update_search_vector(self):
+        """recompute only the search vector, when the id arrays are current"""
+        return self.update(search_vector=_search_vector())
+
+    def update_derived_fields(self):
+        """recompute derived columns and bump the version in one UPDATE"""
+        return self.update(
+            version=F('version') + 1,
+            search_vector=_search_vector(),
+            tag_ids=_related_ids(Recipe.tags.through, 'tag_id'),
+            ingredient_ids=_related_ids(Recipe.ingredients.through, 'ingredient_id'),
+        )
+
+
+# Recipe columns maintained by RecipeQuerySet.update_derived_fields(), and
+# image_renditions written by recipe.renditions; a full save() skips them
+DERIVED_FIELDS = (
+    'search_vector', 'tag_ids', 'ingredient_ids', 'version', 'image_renditions',
+)
+
+
 class Recipe(models.Model):
     """Recipe Model"""
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -79,7 +169,150 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
-    image = models.ImageField(null = True, upload_to = recipe_image_file_path)
+    image = models.ImageField(
+        null = True, upload_to = recipe_image_file_path, storage = get_image_storage
+    )
+    # {width: {format: name}} written by recipe.renditions, None until then
+    image_renditions = models.JSONField(null = True, editable = False)
+    # derived from the title and relations, maintained by core.signals
+    search_vector = SearchVectorField(null = True, editable = False)
+    tag_ids = ArrayField(models.BigIntegerField(), default = list, blank = True, editable = False)
+    ingredient_ids = ArrayField(models.BigIntegerField(), default = list, blank = True, editable = False)
+    # bumped with the derived columns, the detail view's ETag
+    version = models.PositiveIntegerField(default = 1, editable = False)
+
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # keyset pagination walks (user, id) backwards
+            models.Index(fields=['user', 'id']),
+            # gc_media and shared renditions look recipes up by image
+            models.Index(fields=['image']),
+            # ?ordering= and min_/max_ range filters
+            models.Index(fields=['user', 'time_minutes', 'id']),
+            models.Index(fields=['user', 'price', 'id']),
+            GinIndex(fields=['search_vector']),
+            # single table @> / && filters on the relation ids
+            GinIndex(
+                name='core_recipe_user_tag_ids',
+                fields=['user', 'tag_ids'],
+                opclasses=['int8_ops', 'array_ops'],
+            ),
+            GinIndex(
+                name='core_recipe_user_ingr_ids',
+                fields=['user', 'ingredient_ids'],
+                opclasses=['int8_ops', 'array_ops'],
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        # the derived columns held in memory may be stale, only their
+        # writers update them on an existing row; deferred fields stay too
+        if self.pk is not None and not self._state.adding \
+                and kwargs.get('update_fields') is None:
+            skipped = set(DERIVED_FIELDS) | self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.attname for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skipped
+            ]
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return self.title
+
+
+class ImportCheckpoint(models.Model):
+    """progress of a resumable import_recipes run"""
+    name = models.CharField(max_length=255, unique=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # input records committed so far, a resumed run skips this many
+    records = models.PositiveBigIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+
+def _stored_size(name):
+    try:
+        return get_image_storage().size(name)
+    except FileNotFoundError:
+        return 0
+
+
+class StoredImageQuerySet(models.QuerySet):
+    def lock(self, name, size):
+        """
+        lock the row of name until the transaction ends, creating it if missing
+
+        Taken before a stored file is reused or written, gc_media deletes
+        files under the same lock.
+        """
+        while True:
+            self.get_or_create(name=name, defaults={'size': size})
+            stored = self.select_for_update().filter(name=name).first()
+            if stored is not None:
+                return stored
+            # gc_media deleted the row, and the file, while we waited
+
+    def retain(self, name):
+        """count one more recipe using the stored image name"""
+        stored, created = self.get_or_create(
+            name=name, defaults={'size': _stored_size(name), 'refcount': 1},
+        )
+        if not created:
+            self.filter(name=name).update(
+                refcount=F('refcount') + 1, updated=timezone.now()
+            )
+
+    def release(self, name):
+        """count one recipe less using name, a no-op for other names"""
+        self.filter(name=name, refcount__gt=0).update(
+            refcount=F('refcount') - 1, updated=timezone.now()
+        )
+
+
+class StoredImage(models.Model):
+    """
+    a recipe image file and the number of recipes using it
+
+    core.signals keeps refcount current on every recipe save and delete,
+    gc_media deletes files whose count stayed 0 for its grace period.
+    """
+    name = models.CharField(max_length=255, primary_key=True)
+    size = models.PositiveBigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    # last change of refcount, unused files are kept for a grace period
+    updated = models.DateTimeField(auto_now=True)
+
+    objects = StoredImageQuerySet.as_manager()
+
+    def __str__(self):
+        return self.name
+
+
+class ImageUpload(models.Model):
+    """a resumable recipe image upload, deleted once finalized"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    recipe = models.ForeignKey('Recipe', on_delete=models.CASCADE)
+    # storage name the chunks are written to, moved to its content
+    # address when finalized
+    name = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    # bytes received so far, the next chunk starts here
+    offset = models.PositiveBigIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+class DeniedToken(models.Model):
+    """a used or revoked refresh token id, kept until the token expires"""
+    jti = models.CharField(max_length=32, primary_key=True)
+    expires = models.DateTimeField(db_index=True)
 
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return self.jti
@@ -0,0 +1,33 @@
+"""JSON parser backed by orjson, falling back to DRF's stdlib parser"""
+import io
+
+from django.conf import settings
+from rest_framework import parsers
+
+from core.renderers import FastJSONRenderer, orjson
+
+
+UTF8 = ('utf-8', 'utf8')
+
+
+class FastJSONParser(parsers.JSONParser):
+    """Parse JSON request bodies with orjson when available"""
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        body = stream.read()
+
+        try:
+            if encoding.lower() not in UTF8:
+                return orjson.loads(body.decode(encoding))
+            return orjson.loads(body)
+        except ValueError:
+            # orjson rejects some input json accepts (NaN when not strict,
+            # integers over 64 bits), let the stdlib parser decide and
+            # produce its error message
+            return super().parse(io.BytesIO(body), media_type, parser_context)
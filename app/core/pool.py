@@ -0,0 +1,158 @@
+"""
+Serve selected sync views from a bounded thread pool under ASGI.
+
+Under ASGI, Django runs sync views one at a time on a single shared thread
+unless they are async. `pooled()` turns a view into a coroutine that runs
+the view and renders its response on one of ASYNC_VIEW_THREADS pool
+threads. The event loop keeps handling slow clients while at most that many
+requests, and so at most that many database connections, are busy with
+ORM work.
+
+The ASGI entry point routes through ASGI_URLCONF, which is ROOT_URLCONF
+with the views named in ASYNC_POOLED_VIEWS wrapped by `pool_views()`, so
+WSGI keeps calling the plain sync views.
+
+Django 3.2 iterates streaming responses on the event loop, where lazy ORM
+queries such as those of the recipe export raise SynchronousOnlyOperation.
+PooledASGIHandler pulls their content on the thread that ran sync views
+instead, which also owns any server-side cursor the iterator reads from.
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections
+from django.urls import URLPattern, URLResolver
+
+
+# bytes of streaming content pulled per hop to the sync thread
+STREAM_BATCH_SIZE = 64 * 1024
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """return the process wide pool, created on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_VIEW_THREADS,
+                thread_name_prefix='view-pool',
+            )
+        return _executor
+
+
+def _run(view, request, args, kwargs):
+    # pool threads keep their own connections, so do what Django's
+    # request_started and request_finished handlers do for the main thread
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        # rendering may serialize querysets, keep it off the event loop too
+        if callable(getattr(response, 'render', None)):
+            response = response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def pooled(view):
+    """wrap a sync view as an async view running in the pool"""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            get_executor(), _run, view, request, args, kwargs
+        )
+
+    return wrapper
+
+
+def pool_views(patterns, names, namespace=None):
+    """copy a urlconf, wrapping the views whose 'namespace:name' is in names"""
+    result = []
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            inner = pattern.namespace
+            if namespace and inner:
+                inner = f'{namespace}:{inner}'
+            pattern = URLResolver(
+                pattern.pattern,
+                pool_views(pattern.url_patterns, names, inner or namespace),
+                pattern.default_kwargs,
+                pattern.app_name,
+                pattern.namespace,
+            )
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            full_name = f'{namespace}:{pattern.name}' if namespace else pattern.name
+            if full_name in names:
+                pattern = URLPattern(
+                    pattern.pattern, pooled(pattern.callback),
+                    pattern.default_args, pattern.name,
+                )
+        result.append(pattern)
+
+    return result
+
+
+def _next_parts(iterator):
+    """up to STREAM_BATCH_SIZE bytes of parts from a response iterator"""
+    parts, size = [], 0
+    for part in iterator:
+        parts.append(part)
+        size += len(part)
+        if size >= STREAM_BATCH_SIZE:
+            break
+    return parts
+
+
+class PooledASGIHandler(ASGIHandler):
+    """ASGIHandler resolving requests against ASGI_URLCONF
+
+    Also pulls streaming content off the event loop, see the module docstring.
+    """
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = settings.ASGI_URLCONF
+        return request, error_response
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+
+        headers = [
+            (header.encode('ascii'), value.encode('latin1'))
+            for header, value in response.items()
+        ]
+        headers.extend(
+            (b'Set-Cookie', cookie.output(header='').encode('ascii').strip())
+            for cookie in response.cookies.values()
+        )
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': headers,
+        })
+
+        iterator = iter(response)
+        next_parts = sync_to_async(_next_parts, thread_sensitive=True)
+        while True:
+            parts = await next_parts(iterator)
+            if not parts:
+                break
+            for part in parts:
+                for chunk, _ in self.chunk_bytes(part):
+                    await send({
+                        'type': 'http.response.body', 'body': chunk, 'more_body': True,
+                    })
+        await send({'type': 'http.response.body'})
+        await sync_to_async(response.close, thread_sensitive=True)()
@@ -0,0 +1,57 @@
+"""
+JSON renderer backed by orjson, falling back to DRF's stdlib renderer.
+
+The output is the same as `rest_framework.renderers.JSONRenderer` for the
+compact and indent=2 forms. Other indents, `UNICODE_JSON = False` and data
+orjson refuses (integers over 64 bits) go through the stdlib encoder.
+"""
+import decimal
+
+from rest_framework import renderers
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is an optional speedup
+    orjson = None
+
+
+# dict subclasses such as ReturnDict are serialized natively, datetimes go
+# through the DRF encoder so they keep its 'Z' suffix format
+ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) \
+    if orjson else 0
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """Render JSON with orjson when available"""
+
+    def __init__(self):
+        self.encoder = self.encoder_class()
+
+    def default(self, obj):
+        """encode the types orjson does not know like DRF's encoder does"""
+        if isinstance(obj, decimal.Decimal):
+            return float(obj)
+        return self.encoder.default(obj)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.ensure_ascii or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is None and self.compact:
+            options = ORJSON_OPTIONS
+        elif indent == 2:
+            options = ORJSON_OPTIONS | orjson.OPT_INDENT_2
+        else:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.default, option=options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # same strict javascript subset escaping as the stdlib renderer
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028') \
+                .replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -0,0 +1,140 @@
+"""Keep denormalized recipe data current when recipes or their relations change"""
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_init,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from core.models import Ingredient, Recipe, StoredImage, Tag
+from core.versions import bump_data_version
+
+
+def refresh_recipes(recipe_ids):
+    """recompute derived columns for the given recipes"""
+    if recipe_ids:
+        Recipe.objects.filter(id__in=list(recipe_ids)).update_derived_fields()
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is None or 'title' in update_fields:
+        refresh_recipes([instance.pk])
+
+
+# the image of a row loaded with the field deferred is unknown
+UNKNOWN = object()
+
+
+def _image_name(value):
+    name = getattr(value, 'name', value)
+    return name or None
+
+
+@receiver(post_init, sender=Recipe)
+def recipe_loaded(sender, instance, **kwargs):
+    # the stored image the row names, to count changes when saved
+    if 'image' in instance.__dict__:
+        instance._saved_image = _image_name(instance.__dict__['image'])
+    else:
+        instance._saved_image = UNKNOWN
+
+
+@receiver(pre_save, sender=Recipe)
+def recipe_saving(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding:
+        instance._saved_image = None
+    elif instance._saved_image is UNKNOWN \
+            and (update_fields is None or 'image' in update_fields):
+        instance._saved_image = _image_name(
+            Recipe.objects.filter(pk=instance.pk)
+            .values_list('image', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(sender, instance, update_fields=None, **kwargs):
+    # every way of setting an image is counted: API, admin, FieldFile.save()
+    if update_fields is not None and 'image' not in update_fields:
+        return
+
+    old, new = instance._saved_image, _image_name(instance.image)
+    if old is UNKNOWN or old == new:
+        return
+    if new:
+        StoredImage.objects.retain(new)
+    if old:
+        StoredImage.objects.release(old)
+    instance._saved_image = new
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    # also runs for recipes deleted with their user
+    if instance.image:
+        StoredImage.objects.release(instance.image.name)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_relations_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # the related side is cleared, remember which recipes it touched
+        instance._cleared_recipe_ids = list(
+            instance.recipe_set.values_list('id', flat=True)
+        )
+        return
+
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        refresh_recipes([instance.pk])
+        # keep the in memory instance consistent for serializers
+        instance.refresh_from_db(fields=['tag_ids', 'ingredient_ids', 'version'])
+    elif action == 'post_clear':
+        refresh_recipes(getattr(instance, '_cleared_recipe_ids', ()))
+    else:
+        refresh_recipes(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def recipe_attr_saved(sender, instance, created, **kwargs):
+    if not created:
+        refresh_recipes(instance.recipe_set.values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def recipe_attr_deleting(sender, instance, **kwargs):
+    # the through rows are gone by post_delete
+    instance._deleted_recipe_ids = list(
+        instance.recipe_set.values_list('id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def recipe_attr_deleted(sender, instance, **kwargs):
+    refresh_recipes(getattr(instance, '_deleted_recipe_ids', ()))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def user_data_changed(sender, instance, **kwargs):
+    bump_data_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def user_relations_changed(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_data_version(instance.user_id)
@@ -0,0 +1,97 @@
+"""
+Content addressed storage for recipe images.
+
+A recipe image is stored as uploads/recipe/<aa>/<sha256>.<ext>, so
+identical bytes get the same name, and one file serves every recipe
+using it. Files saved under a pending_name(), as the image field's
+upload_to gives them, are hashed and renamed by the storage itself.
+core.models.StoredImage counts the recipes using each file. Because a
+name always means the same bytes, clients may cache the files forever.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+
+
+BLOCK_SIZE = 64 * 1024
+
+# names under this prefix are rewritten to the content address on save
+PENDING_PREFIX = 'uploads/recipe/pending/'
+
+CONTENT_NAME = re.compile(r'^uploads/recipe/[0-9a-f]{2}/([0-9a-f]{64})\.\w+$')
+
+
+def pending_name(filename):
+    """the name a new image is saved under, the storage replaces it"""
+    return PENDING_PREFIX + posixpath.basename(filename)
+
+
+def content_name(digest, filename):
+    """the storage name of bytes with SHA-256 digest, uploaded as filename"""
+    ext = posixpath.splitext(filename)[1].lower()
+    return f'uploads/recipe/{digest[:2]}/{digest}{ext}'
+
+
+def file_digest(file):
+    """hex SHA-256 of a django File, leaves it at its start"""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks(BLOCK_SIZE):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that keeps a single copy of a content addressed name"""
+
+    def get_available_name(self, name, max_length=None):
+        # a taken content name already holds these bytes
+        return name
+
+    def _save(self, name, content):
+        if name.startswith(PENDING_PREFIX):
+            name = content_name(file_digest(content), name)
+        # gc_media may delete the file between the check and the touch
+        if self.exists(name) and self.touch(name):
+            return name
+        # identical concurrent uploads replace each other harmlessly
+        return self.replace(name, content)
+
+    def replace(self, name, content):
+        """write content to name, readers see the old or the new file whole"""
+        # write under a private name first, so readers never see a partial
+        # file, and no reader finds name missing in between
+        temporary = super()._save(f'{name}.{uuid.uuid4().hex}.part', content)
+        os.replace(self.path(temporary), self.path(name))
+        return name
+
+    def touch(self, name):
+        """mark name as in use now, False when it does not exist
+
+        gc_media spares recently used files.
+        """
+        try:
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def adopt(self, temporary, name):
+        """move the complete file at temporary to name, without copying"""
+        if self.exists(name) and self.touch(name):
+            self.delete(temporary)
+        else:
+            os.makedirs(os.path.dirname(self.path(name)), exist_ok=True)
+            os.replace(self.path(temporary), self.path(name))
+
+
+image_storage = ContentAddressedStorage()
+
+
+def get_image_storage():
+    return image_storage
@@ -0,0 +1,192 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core.models import ImageUpload, Recipe, StoredImage
+from core.storage import content_name, image_storage
+from recipe import uploads
+
+DIGESTS = ['a' * 64, 'b' * 64, 'c' * 64]
+
+
+class GcMediaCommandTests(TestCase):
+    """Test the gc_media command"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+        self.user = get_user_model().objects.create_user('diego@oxd.com', 'pass12345')
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Paella', time_minutes=40, price=12
+        )
+
+    def save(self, name, content=b'x' * 1024, age=48):
+        name = image_storage.save(name, ContentFile(content))
+        then = time.time() - age * 3600
+        os.utime(image_storage.path(name), (then, then))
+        return name
+
+    def hours_ago(self, hours):
+        return timezone.now() - timedelta(hours=hours)
+
+    def gc(self, *args):
+        out = StringIO()
+        call_command('gc_media', *args, stdout=out)
+        return out.getvalue()
+
+    def test_deletes_unreferenced_old_files(self):
+        """test only old files without a recipe go, with their renditions"""
+        used = self.save(content_name(DIGESTS[0], 'a.jpg'))
+        unused = self.save(content_name(DIGESTS[1], 'b.jpg'))
+        fresh = self.save(content_name(DIGESTS[2], 'c.jpg'), age=1)
+        legacy = self.save('uploads/recipe/1234-uuid.jpg')
+        StoredImage.objects.create(name=unused, size=1024)
+        StoredImage.objects.filter(name=unused).update(updated=self.hours_ago(48))
+        Recipe.objects.filter(pk=self.recipe.pk).update(image=used)
+        kept_rendition = self.save(f'renditions/recipe/{DIGESTS[0]}/320.webp')
+        gone_rendition = self.save(f'renditions/recipe/{DIGESTS[1]}/320.webp')
+
+        out = self.gc()
+
+        self.assertTrue(image_storage.exists(used))
+        self.assertTrue(image_storage.exists(fresh))
+        self.assertFalse(image_storage.exists(unused))
+        self.assertFalse(image_storage.exists(legacy))
+        self.assertFalse(StoredImage.objects.filter(name=unused).exists())
+        self.assertTrue(image_storage.exists(kept_rendition))
+        self.assertFalse(image_storage.exists(gone_rendition))
+        self.assertFalse(os.path.exists(image_storage.path(f'renditions/recipe/{DIGESTS[1]}')))
+        self.assertIn('Deleted 2 images, 0.0 MiB', out)
+        self.assertIn('Deleted 1 renditions', out)
+        # files without a row are counted from then on
+        self.assertEqual(StoredImage.objects.get(name=used).refcount, 1)
+
+    def test_counts_decide(self):
+        """test a count recently dropped to 0 keeps the file, old ones go"""
+        recent = self.save(content_name(DIGESTS[0], 'a.jpg'))
+        unused = self.save(content_name(DIGESTS[1], 'b.jpg'))
+        StoredImage.objects.create(name=recent, size=1024)
+        StoredImage.objects.create(name=unused, size=1024)
+        StoredImage.objects.filter(name=unused).update(updated=self.hours_ago(48))
+
+        self.gc()
+
+        self.assertTrue(image_storage.exists(recent))
+        self.assertFalse(image_storage.exists(unused))
+        self.assertEqual(list(StoredImage.objects.values_list('name', flat=True)), [recent])
+
+    def test_missed_reference_repaired(self):
+        """test a 0 count with a recipe using the image is fixed, not deleted"""
+        name = self.save(content_name(DIGESTS[0], 'a.jpg'))
+        StoredImage.objects.create(name=name, size=1024)
+        StoredImage.objects.filter(name=name).update(updated=self.hours_ago(48))
+        Recipe.objects.filter(pk=self.recipe.pk).update(image=name)
+
+        self.gc()
+
+        self.assertTrue(image_storage.exists(name))
+        self.assertEqual(StoredImage.objects.get(name=name).refcount, 1)
+
+    def test_dry_run(self):
+        """test a dry run reports the reclaimable bytes and deletes nothing"""
+        name = self.save(content_name(DIGESTS[0], 'a.jpg'), content=b'x' * 2 ** 20)
+
+        out = self.gc('--dry-run')
+
+        self.assertIn('Would delete 1 images, 1.0 MiB', out)
+        self.assertTrue(image_storage.exists(name))
+
+    def test_reupload_protects_file(self):
+        """test storing the same bytes again restarts the grace period"""
+        name = self.save(content_name(DIGESTS[0], 'a.jpg'))
+
+        image_storage.save(name, ContentFile(b'x' * 1024))
+        self.gc()
+
+        self.assertTrue(image_storage.exists(name))
+
+    def test_abandoned_uploads(self):
+        """test stale partial uploads go, active ones stay"""
+        stale = self.save('uploads/partial/stale.jpg')
+        active = self.save('uploads/partial/active.jpg', age=0)
+        ImageUpload.objects.create(user=self.user, recipe=self.recipe, name=stale, size=10)
+        ImageUpload.objects.create(user=self.user, recipe=self.recipe, name=active, size=10)
+
+        out = self.gc('--grace', '12')
+
+        self.assertFalse(image_storage.exists(stale))
+        self.assertTrue(image_storage.exists(active))
+        self.assertEqual(list(ImageUpload.objects.values_list('name', flat=True)), [active])
+        self.assertIn('Deleted 1 partial uploads', out)
+
+
+class GcMediaUploadRaceTests(TransactionTestCase):
+    """Test gc_media and uploads of the same bytes exclude each other"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+        user = get_user_model().objects.create_user('diego@oxd.com', 'pass12345')
+        self.recipe = Recipe.objects.create(
+            user=user, title='Paella', time_minutes=40, price=12
+        )
+
+    def gc_in_thread(self):
+        def run():
+            try:
+                call_command('gc_media', stdout=StringIO())
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread
+
+    def test_upload_reusing_unused_file(self):
+        """test gc waits for an upload reusing a file it found unused"""
+        content = b'x' * 1024
+        name = content_name(hashlib.sha256(content).hexdigest(), 'a.jpg')
+        image_storage.save(name, ContentFile(content))
+        then = time.time() - 48 * 3600
+        os.utime(image_storage.path(name), (then, then))
+        StoredImage.objects.create(name=name, size=1024)
+        StoredImage.objects.filter(name=name).update(
+            updated=timezone.now() - timedelta(hours=48)
+        )
+
+        with transaction.atomic():
+            self.assertEqual(uploads.store(ContentFile(content, name='a.jpg')), name)
+            thread = self.gc_in_thread()
+            # gc blocks on the row lock, give it time to get there
+            thread.join(0.5)
+            self.assertTrue(thread.is_alive())
+            uploads.attach(self.recipe, name)
+        thread.join()
+
+        self.assertTrue(image_storage.exists(name))
+        self.assertEqual(StoredImage.objects.get(name=name).refcount, 1)
+
+    def test_retain_missing_file(self):
+        """test counting a name whose file is gone does not fail"""
+        uploads.attach(self.recipe, content_name('a' * 64, 'a.jpg'))
+
+        self.assertEqual(StoredImage.objects.get().size, 0)
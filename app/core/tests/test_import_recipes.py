@@ -0,0 +1,116 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core.models import ImportCheckpoint, Ingredient, Recipe, Tag
+
+
+class ImportRecipesCommandTests(TestCase):
+    """Test the COPY based import_recipes command"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'diego@oxd.com',
+            'MyPassword123'
+        )
+
+    def write(self, content, suffix='.ndjson'):
+        """write content to a temporary file and return its path"""
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def ndjson(self, *records):
+        return ''.join(json.dumps(record) + '\n' for record in records)
+
+    def run_import(self, path, **options):
+        call_command('import_recipes', path, user=self.user.email,
+                     stdout=StringIO(), **options)
+
+    def test_import_ndjson(self):
+        """test recipes, relations and derived columns are loaded"""
+        existing = Tag.objects.create(user=self.user, name='Vegan')
+        path = self.write(self.ndjson(
+            {'title': 'Green\tCurry', 'time_minutes': 30, 'price': '7.5',
+             'tags': ['Vegan', 'Spicy'], 'ingredients': ['Kale']},
+            {'title': 'Kale soup', 'time_minutes': 10, 'price': 3,
+             'link': 'https://example.com', 'tags': ['Spicy'], 'ingredients': ['Kale']},
+        ))
+
+        self.run_import(path)
+
+        curry = Recipe.objects.get(title='Green\tCurry')
+        spicy = Tag.objects.get(user=self.user, name='Spicy')
+        kale = Ingredient.objects.get(user=self.user, name='Kale')
+        self.assertEqual(str(curry.price), '7.50')
+        self.assertEqual(curry.tag_ids, sorted([existing.id, spicy.id]))
+        self.assertEqual(set(curry.tags.all()), {existing, spicy})
+        self.assertEqual(list(curry.ingredients.all()), [kale])
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(
+            list(Recipe.objects.filter(search_vector='kale').order_by('title')
+                 .values_list('title', flat=True)),
+            ['Green\tCurry', 'Kale soup']
+        )
+
+    def test_import_csv(self):
+        """test the CSV written by the export endpoint can be imported"""
+        path = self.write(
+            'id,title,time_minutes,price,link,tags,ingredients\r\n'
+            '7,Curry,30,7.50,,Vegan|Spicy,"Kale, raw"\r\n',
+            suffix='.csv'
+        )
+
+        self.run_import(path)
+
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertEqual(recipe.title, 'Curry')
+        self.assertEqual(sorted(t.name for t in recipe.tags.all()), ['Spicy', 'Vegan'])
+        self.assertEqual([i.name for i in recipe.ingredients.all()], ['Kale, raw'])
+
+    def test_invalid_record_rolls_back(self):
+        """test without a checkpoint nothing is loaded when a record fails"""
+        path = self.write(self.ndjson(
+            {'title': 'Curry', 'time_minutes': 30, 'price': 5, 'tags': ['Vegan']},
+            {'title': 'Soup', 'time_minutes': 'soon', 'price': 5},
+        ))
+
+        with self.assertRaises(CommandError):
+            self.run_import(path, batch_size=1)
+
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(Tag.objects.exists())
+
+    def test_resume_from_checkpoint(self):
+        """test a checkpointed import keeps finished batches and resumes"""
+        records = [
+            {'title': f'Recipe {i}', 'time_minutes': 10, 'price': 5, 'tags': ['Vegan']}
+            for i in range(5)
+        ]
+        broken = dict(records[3], price='free')
+        path = self.write(self.ndjson(*records[:3], broken, records[4]))
+
+        with self.assertRaises(CommandError):
+            self.run_import(path, batch_size=2, checkpoint='customer-a')
+
+        self.assertEqual(Recipe.objects.count(), 2)
+        self.assertEqual(ImportCheckpoint.objects.get(name='customer-a').records, 2)
+
+        path = self.write(self.ndjson(*records))
+        self.run_import(path, batch_size=2, checkpoint='customer-a')
+
+        self.assertEqual(
+            sorted(Recipe.objects.values_list('title', flat=True)),
+            [f'Recipe {i}' for i in range(5)]
+        )
+        self.assertEqual(Tag.objects.count(), 1)
+        self.assertEqual(ImportCheckpoint.objects.get(name='customer-a').records, 5)
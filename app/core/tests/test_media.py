@@ -0,0 +1,121 @@
+import hashlib
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import Client, TestCase, override_settings
+
+from core.storage import content_name, image_storage
+
+
+class ServeMediaTests(TestCase):
+    """Test serving recipe images and renditions"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+        self.client = Client()
+        self.data = bytes(range(256)) * 40
+        self.digest = hashlib.sha256(self.data).hexdigest()
+        self.name = image_storage.save(
+            content_name(self.digest, 'photo.jpg'), ContentFile(self.data)
+        )
+        self.url = '/media/' + self.name
+
+    def body(self, res):
+        return b''.join(res.streaming_content)
+
+    def test_serves_content_addressed_image(self):
+        """test an image is served with its digest as ETag, cached forever"""
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.body(res), self.data)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res['Content-Length'], str(len(self.data)))
+        self.assertEqual(res['ETag'], f'"{self.digest}"')
+        self.assertIn('immutable', res['Cache-Control'])
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+
+    def test_rendition_not_immutable(self):
+        """test files without a content address are revalidated"""
+        name = image_storage.save('renditions/recipe/x/320.webp', ContentFile(b'webp'))
+
+        res = self.client.get('/media/' + name)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Cache-Control'], 'public, max-age=3600')
+        self.assertTrue(res['ETag'].startswith('"'))
+
+    def test_not_modified(self):
+        """test a matching If-None-Match gets 304"""
+        res = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"{self.digest}"')
+
+        self.assertEqual(res.status_code, 304)
+
+    def test_ranges(self):
+        """test single byte ranges are served as 206"""
+        res = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(self.body(res), self.data[100:200])
+        self.assertEqual(res['Content-Range'], f'bytes 100-199/{len(self.data)}')
+        self.assertEqual(res['Content-Length'], '100')
+
+        res = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(self.body(res), self.data[-10:])
+
+        res = self.client.get(self.url, HTTP_RANGE='bytes=10000-')
+        self.assertEqual(self.body(res), self.data[10000:])
+
+    def test_range_not_satisfiable(self):
+        """test ranges past the end get 416"""
+        res = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.data)}-')
+
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res['Content-Range'], f'bytes */{len(self.data)}')
+
+    def test_if_range_mismatch(self):
+        """test a stale If-Range gets the whole file"""
+        res = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.body(res), self.data)
+
+    def test_head(self):
+        """test HEAD reports the size without a body"""
+        res = self.client.head(self.url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Content-Length'], str(len(self.data)))
+        self.assertEqual(res.content, b'')
+
+    def test_private_and_missing_files(self):
+        """test uploads in progress, traversal and missing files are 404"""
+        image_storage.save('uploads/partial/x.jpg', ContentFile(b'partial'))
+
+        for path in ('uploads/partial/x.jpg', 'uploads/recipe/../partial/x.jpg',
+                     'uploads/recipe/missing.jpg', 'uploads/recipe/'):
+            self.assertEqual(self.client.get('/media/' + path).status_code, 404)
+
+        self.assertEqual(self.client.post(self.url).status_code, 405)
+
+    @override_settings(MEDIA_SERVING={'MODE': 'x-accel-redirect',
+                                      'ACCEL_PREFIX': '/protected-media/'})
+    def test_x_accel_redirect(self):
+        """test nginx mode hands the file over with its cache headers"""
+        res = self.client.get(self.url, HTTP_RANGE='bytes=0-9')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['X-Accel-Redirect'], '/protected-media/' + self.name)
+        self.assertEqual(res.content, b'')
+        self.assertIn('immutable', res['Cache-Control'])
+
+    @override_settings(MEDIA_SERVING={'MODE': 'x-sendfile'})
+    def test_x_sendfile(self):
+        """test Apache mode names the file"""
+        res = self.client.get(self.url)
+
+        self.assertEqual(res['X-Sendfile'], image_storage.path(self.name))
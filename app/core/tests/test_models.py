@@ -1,8 +1,13 @@
-from django.test import TestCase
-from django.contrib.auth import get_user_model
-from core.models import Tag, Ingredient, Recipe, recipe_image_file_path
+import hashlib
+import tempfile
 from unittest.mock import patch
 
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from core.models import Tag, Ingredient, Recipe, StoredImage, recipe_image_file_path
+from core.storage import file_digest
+
 
 def sample_user(email='diego@oxd.com', password='MyPassword123'):
     """create a sample user"""
@@ -73,15 +78,63 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(recipe), recipe.title)
     
-    @patch('uuid.uuid4')
-    def test_recipe_file_name_uuid(self, mock_uuid4):
-        """Test that image is saved in correct location"""
-        uuid = 'test-uuid'
-        mock_uuid4.return_value = uuid
-        file_path = recipe_image_file_path(None, 'myimage.jpg')
-
-        exp_path = f"uploads/recipe/{uuid}.jpg"
-        self.assertEqual(file_path, exp_path)
+    def test_recipe_relation_ids_follow_m2m_changes(self):
+        """Test tag_ids/ingredient_ids track adds, removes and clears"""
+        user = sample_user()
+        recipe = Recipe.objects.create(
+            user=user, title='Curry', time_minutes=5, price=5.00
+        )
+        tag1 = Tag.objects.create(user=user, name='Vegan')
+        tag2 = Tag.objects.create(user=user, name='Spicy')
+        ingredient = Ingredient.objects.create(user=user, name='Tofu')
+
+        recipe.tags.add(tag2, tag1)
+        recipe.ingredients.add(ingredient)
+        self.assertEqual(recipe.tag_ids, sorted([tag1.id, tag2.id]))
+        self.assertEqual(recipe.ingredient_ids, [ingredient.id])
+
+        recipe.tags.remove(tag1)
+        ingredient.recipe_set.clear()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.tag_ids, [tag2.id])
+        self.assertEqual(recipe.ingredient_ids, [])
+
+    def test_recipe_relation_ids_follow_deletes(self):
+        """Test deleting a tag removes it from the recipe tag_ids"""
+        user = sample_user()
+        recipe = Recipe.objects.create(
+            user=user, title='Curry', time_minutes=5, price=5.00
+        )
+        tag = Tag.objects.create(user=user, name='Vegan')
+        recipe.tags.add(tag)
+
+        tag.delete()
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.tag_ids, [])
+
+    def test_recipe_file_name_digest(self):
+        """Test that image is saved under its content digest, hashed once"""
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        recipe = Recipe.objects.create(
+            user=sample_user(), title='Steak', time_minutes=5, price=5.00
+        )
+        self.assertEqual(
+            recipe_image_file_path(recipe, 'MyImage.JPG'),
+            'uploads/recipe/pending/MyImage.JPG'
+        )
+
+        with override_settings(MEDIA_ROOT=media.name), \
+                patch('core.storage.file_digest', wraps=file_digest) as digest:
+            recipe.image.save('MyImage.JPG', ContentFile(b'image bytes'))
+
+        sha = hashlib.sha256(b'image bytes').hexdigest()
+        exp_path = f"uploads/recipe/{sha[:2]}/{sha}.jpg"
+        self.assertEqual(recipe.image.name, exp_path)
+        self.assertEqual(digest.call_count, 1)
+        # images saved through the field are counted too
+        self.assertEqual(StoredImage.objects.get(name=exp_path).refcount, 1)
 
 
 
@@ -0,0 +1,130 @@
+import asyncio
+import threading
+from io import StringIO
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import LiveServerTestCase, SimpleTestCase, TransactionTestCase
+from django.urls import path, include
+from rest_framework.authtoken.models import Token
+
+from app import asgi, asgi_urls
+from core import pool
+from core.models import Recipe, Tag
+
+
+def plain_view(request):
+    return threading.current_thread().name
+
+
+class PoolViewsTests(SimpleTestCase):
+    """Test wrapping named views of a urlconf"""
+
+    def test_wraps_only_named_views(self):
+        """test only the listed namespaced names are pooled"""
+        patterns = pool.pool_views([
+            path('a/', include(([path('x/', plain_view, name='x'),
+                                 path('y/', plain_view, name='y')], 'ns'))),
+            path('x/', plain_view, name='x'),
+        ], {'ns:x'})
+
+        inner = patterns[0].url_patterns
+        self.assertIsNot(inner[0].callback, plain_view)
+        self.assertIs(inner[1].callback, plain_view)
+        self.assertIs(patterns[1].callback, plain_view)
+
+    def test_asgi_urlconf_pools_read_views(self):
+        """test the ASGI urlconf pools the configured views"""
+        recipe = next(p for p in asgi_urls.urlpatterns if p.namespace == 'recipe')
+        names = {
+            p.name for p in recipe.url_patterns[0].url_patterns
+            if asyncio.iscoroutinefunction(p.callback)
+        }
+
+        self.assertIn('recipe-list', names)
+        self.assertNotIn('recipe-bulk', names)
+
+    async def test_runs_in_pool_thread(self):
+        """test a pooled view runs on a pool thread"""
+        thread = await pool.pooled(plain_view)(None)
+
+        self.assertTrue(thread.startswith('view-pool'))
+
+
+class PooledASGIHandlerTests(TransactionTestCase):
+    """Test serving the read views through the ASGI application"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('diego@oxd.com', 'pass12345')
+        self.token = Token.objects.create(user=self.user)
+        Tag.objects.create(user=self.user, name='Vegan')
+
+    async def get(self, path):
+        communicator = ApplicationCommunicator(asgi.application, {
+            'type': 'http',
+            'method': 'GET',
+            'path': path,
+            'query_string': b'',
+            'headers': [
+                (b'host', b'testserver'),
+                (b'authorization', f'Token {self.token.key}'.encode()),
+            ],
+        })
+        await communicator.send_input({'type': 'http.request', 'body': b''})
+        start = await communicator.receive_output(10)
+        body = b''
+        while True:
+            message = await communicator.receive_output(10)
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                return start['status'], body
+
+    async def test_tag_list_served_from_pool(self):
+        """test the tag list is served by the pool"""
+        with patch('core.pool._run', wraps=pool._run) as run:
+            status, body = await self.get('/api/recipe/tags/')
+
+        self.assertEqual(status, 200)
+        self.assertIn(b'Vegan', body)
+        self.assertEqual(run.call_count, 1)
+
+    async def test_streaming_export(self):
+        """test the streamed export runs its queries off the event loop"""
+        await sync_to_async(Recipe.objects.create)(
+            user=self.user, title='Curry', time_minutes=10, price=5
+        )
+
+        status, body = await self.get('/api/recipe/recipes/export/')
+
+        self.assertEqual(status, 200)
+        self.assertIn(b'Curry', body)
+
+    async def test_other_views_not_pooled(self):
+        """test views outside ASYNC_POOLED_VIEWS run as before"""
+        with patch('core.pool._run', wraps=pool._run) as run:
+            status, _ = await self.get('/api/metrics/')
+
+        self.assertEqual(status, 403)
+        self.assertEqual(run.call_count, 0)
+
+
+class LoadTestCommandTests(LiveServerTestCase):
+    """Test the load_test command"""
+
+    def test_reports_requests(self):
+        """test every request is counted by status"""
+        user = get_user_model().objects.create_user('diego@oxd.com', 'pass12345')
+        token = Token.objects.create(user=user)
+        out = StringIO()
+
+        call_command(
+            'load_test', self.live_server_url + '/api/recipe/tags/',
+            clients=3, requests=2, read_delay=0.01, chunk_size=64,
+            header=[f'Authorization: Token {token.key}'], stdout=out,
+        )
+
+        self.assertIn('6 requests from 3 clients', out.getvalue())
+        self.assertIn('status 200: 6', out.getvalue())
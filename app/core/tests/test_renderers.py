@@ -0,0 +1,101 @@
+import datetime
+import decimal
+import io
+import uuid
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+
+
+SAMPLE = {
+    'results': [
+        {
+            'id': 1,
+            'title': 'Crème brûlée   ☕',
+            'price': decimal.Decimal('5.50'),
+            'tags': [1, 2],
+            'link': None,
+        },
+    ],
+    'created': datetime.datetime(2022, 5, 1, 12, 30, 0, 123456, tzinfo=datetime.timezone.utc),
+    'day': datetime.date(2022, 5, 1),
+    'token': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'empty': {},
+    'flags': (True, False),
+}
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    """Test the orjson renderer matches DRF's JSON renderer"""
+
+    def assert_same(self, data, accepted_media_type=None):
+        self.assertEqual(
+            FastJSONRenderer().render(data, accepted_media_type),
+            JSONRenderer().render(data, accepted_media_type)
+        )
+
+    def test_compact_output_matches(self):
+        """test compact output is byte for byte the stdlib output"""
+        self.assert_same(SAMPLE)
+        self.assert_same([{1: 'int key'}])
+
+    def test_indent_output_matches(self):
+        """test indented output is the stdlib output for every indent"""
+        self.assert_same(SAMPLE, 'application/json; indent=2')
+        self.assert_same(SAMPLE, 'application/json; indent=4')
+
+    def test_none_renders_empty(self):
+        """test a missing body renders as no bytes"""
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_large_integer_falls_back(self):
+        """test integers orjson cannot encode use the stdlib encoder"""
+        self.assert_same({'big': 2 ** 70})
+
+    def test_without_orjson(self):
+        """test the renderer works when orjson is not installed"""
+        with patch('core.renderers.orjson', None):
+            self.assert_same(SAMPLE)
+
+
+class FastJSONParserTests(SimpleTestCase):
+    """Test the orjson parser matches DRF's JSON parser"""
+
+    def parse(self, body, parser=None, **context):
+        return (parser or FastJSONParser()).parse(
+            io.BytesIO(body), parser_context=context
+        )
+
+    def test_parse(self):
+        """test request bodies parse like the stdlib parser"""
+        body = FastJSONRenderer().render(SAMPLE)
+
+        self.assertEqual(self.parse(body), self.parse(body, JSONParser()))
+
+    def test_parse_other_encoding(self):
+        """test bodies in a non utf-8 charset are decoded first"""
+        body = '{"title": "Crème"}'.encode('latin-1')
+
+        self.assertEqual(self.parse(body, encoding='latin-1'), {'title': 'Crème'})
+
+    def test_parse_large_integer(self):
+        """test integers orjson rejects are parsed by the stdlib parser"""
+        self.assertEqual(self.parse(b'[36893488147419103232]'), [2 ** 65])
+
+    def test_parse_error(self):
+        """test invalid json raises a parse error"""
+        for body in (b'{"title": ', b'[NaN]'):
+            with self.assertRaises(ParseError):
+                self.parse(body)
+
+    def test_without_orjson(self):
+        """test the parser works when orjson is not installed"""
+        with patch('core.parsers.orjson', None):
+            self.assertEqual(self.parse(b'{"id": 1}'), {'id': 1})
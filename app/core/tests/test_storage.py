@@ -0,0 +1,130 @@
+import io
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, StoredImage
+from core.storage import image_storage
+from recipe import renditions
+
+
+def image_file(color='red'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (20, 20), color).save(buffer, 'PNG')
+    buffer.seek(0)
+    buffer.name = 'photo.png'
+    return buffer
+
+
+class ContentAddressedStorageTests(TestCase):
+    """Test storing recipe images once per content"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+        self.user = get_user_model().objects.create_user('diego@oxd.com', 'pass12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def recipe(self):
+        return Recipe.objects.create(
+            user=self.user, title='Paella', time_minutes=40, price=12
+        )
+
+    def upload(self, recipe, color='red'):
+        url = reverse('recipe:recipe-upload-image', args=[recipe.id])
+        res = self.client.post(url, {'image': image_file(color)}, format='multipart')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipe.refresh_from_db()
+        return recipe.image.name
+
+    def test_identical_uploads_stored_once(self):
+        """test the same bytes uploaded twice share one file"""
+        first, second = self.recipe(), self.recipe()
+
+        name = self.upload(first)
+        self.assertEqual(self.upload(second), name)
+
+        self.assertRegex(name, r'^uploads/recipe/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+        self.assertEqual(os.listdir(os.path.dirname(image_storage.path(name))),
+                         [os.path.basename(name)])
+        self.assertEqual(StoredImage.objects.get(name=name).refcount, 2)
+
+    def test_reupload_same_image(self):
+        """test uploading the current image again changes no count"""
+        recipe = self.recipe()
+        name = self.upload(recipe)
+
+        self.upload(recipe)
+
+        self.assertEqual(StoredImage.objects.get(name=name).refcount, 1)
+
+    def test_replace_and_delete_release(self):
+        """test replacing and deleting recipes release their images"""
+        recipe = self.recipe()
+        old = self.upload(recipe)
+        new = self.upload(recipe, color='blue')
+
+        self.assertEqual(StoredImage.objects.get(name=old).refcount, 0)
+        self.assertEqual(StoredImage.objects.get(name=new).refcount, 1)
+
+        self.user.delete()
+        self.assertEqual(StoredImage.objects.get(name=new).refcount, 0)
+
+    def test_existing_content_not_rewritten(self):
+        """test saving a taken content name leaves the file alone"""
+        name = image_storage.save('uploads/recipe/ab/' + 'ab' * 32 + '.png',
+                                  ContentFile(b'first'))
+
+        self.assertEqual(image_storage.save(name, ContentFile(b'first')), name)
+        with image_storage.open(name) as f:
+            self.assertEqual(f.read(), b'first')
+
+    def test_file_deleted_before_touch_is_written(self):
+        """test a file removed between the exists check and the touch is saved"""
+        name = image_storage.save('uploads/recipe/ab/' + 'ab' * 32 + '.png',
+                                  ContentFile(b'first'))
+        utime = os.utime
+
+        def collected(path, *args, **kwargs):
+            # gc_media deletes the file right after exists() saw it
+            os.remove(path)
+            utime(path, *args, **kwargs)
+
+        with patch('core.storage.os.utime', side_effect=collected):
+            self.assertEqual(image_storage.save(name, ContentFile(b'first')), name)
+        with image_storage.open(name) as f:
+            self.assertEqual(f.read(), b'first')
+
+        partial = image_storage.save('uploads/partial/upload.png', ContentFile(b'first'))
+        with patch('core.storage.os.utime', side_effect=collected):
+            image_storage.adopt(partial, name)
+        with image_storage.open(name) as f:
+            self.assertEqual(f.read(), b'first')
+
+    def test_renditions_shared(self):
+        """test a second recipe with the same image reuses the renditions"""
+        first, second = self.recipe(), self.recipe()
+        name = self.upload(first)
+        self.upload(second)
+        renditions.generate(first.id, name)
+
+        with patch('recipe.renditions.render') as render:
+            self.assertTrue(renditions.generate(second.id, name))
+
+        render.assert_not_called()
+        second.refresh_from_db()
+        self.assertEqual(second.image_renditions['320']['webp'],
+                         renditions.rendition_names(name)[320]['webp'])
@@ -0,0 +1,10 @@
+from django.urls import path
+
+from core import views
+
+
+app_name = 'core'
+
+urlpatterns = [
+    path('', views.MetricsView.as_view(), name='metrics'),
+]
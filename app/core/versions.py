@@ -0,0 +1,65 @@
+"""
+Per-user data versions for conditional requests.
+
+Every write to a user's recipes, tags, ingredients or their links bumps the
+user's version in the default cache. Readers take the version before
+reading the data, so anything derived from it (ETags, cached responses)
+goes stale as soon as a write commits.
+
+That only holds when every worker sees the same cache. Views check
+`cache_is_shared()` and skip what depends on the versions otherwise.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection, transaction
+
+
+# backends whose entries only the current process sees
+PROCESS_LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+
+def _key(user_id):
+    return f'data-version:{user_id}'
+
+
+def cache_is_shared():
+    """whether every worker sees the data versions in the default cache"""
+    shared = getattr(settings, 'CACHE_IS_SHARED', None)
+    if shared is not None:
+        return shared
+
+    return not isinstance(caches['default'], PROCESS_LOCAL_BACKENDS)
+
+
+def get_data_version(user_id):
+    """return the current data version of user_id"""
+    key = _key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # a fresh start after eviction must not repeat an earlier version
+        version = time.time_ns()
+        # another worker may have started one first
+        cache.add(key, version, timeout=None)
+        version = cache.get(key, version)
+
+    return version
+
+
+def _bump(user_id):
+    key = _key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def bump_data_version(user_id):
+    """mark the data of user_id as changed, now and when the transaction commits"""
+    _bump(user_id)
+    # readers between now and the commit may still see the old rows
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _bump(user_id))
@@ -1,3 +1,98 @@
-from django.shortcuts import render
+import mimetypes
+import os
+import posixpath
+import stat
+from urllib.parse import quote
 
-# Create your views here.
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core import media, metrics
+from users.authentication import CachedTokenAuthentication, SignedTokenAuthentication
+
+
+class MetricsView(APIView):
+    """Report the shared counters to staff users"""
+    authentication_classes = (CachedTokenAuthentication, SignedTokenAuthentication,)
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        return Response(metrics.snapshot())
+
+
+@require_safe
+def serve_media(request, path):
+    """serve a public recipe image or rendition, see core.media"""
+    if posixpath.normpath(path) != path or not media.is_public(path):
+        raise Http404()
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        file_stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404()
+    if not stat.S_ISREG(file_stat.st_mode):
+        raise Http404()
+
+    etag, cache_control = media.etag_and_cache_control(path, file_stat)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(file_stat.st_mtime)
+    )
+    if response is None:
+        response = _media_response(request, path, full_path, file_stat.st_size, etag)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(file_stat.st_mtime)
+    response['Cache-Control'] = cache_control
+    return response
+
+
+def _media_response(request, path, full_path, size, etag):
+    config = media.get_config()
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+    # the front end server handles ranges and the transfer
+    if config['MODE'] == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = quote(config['ACCEL_PREFIX'] + path)
+        return response
+    if config['MODE'] == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = full_path
+        return response
+
+    byte_range = None
+    # a range of a since changed file would not fit the client's copy
+    if request.META.get('HTTP_IF_RANGE', etag) == etag:
+        try:
+            byte_range = media.parse_range(request.META.get('HTTP_RANGE'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+    elif byte_range is None:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+    else:
+        response = FileResponse(
+            media.FileRange(open(full_path, 'rb'), start, length),
+            content_type=content_type,
+        )
+
+    if byte_range is not None:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,96 @@
+"""Bulk writes for recipes: one INSERT per table instead of one per row"""
+from core.models import Recipe
+from core.signals import refresh_recipes
+from core.versions import bump_data_version
+from recipe.fields import UserPrimaryKeysField
+
+
+RELATION_FIELDS = ('tags', 'ingredients')
+
+
+def preload_related(serializer, items):
+    """
+    Resolve every related id submitted across items, one query per field.
+
+    The result is meant for the serializer context under `resolved_pks` so
+    that each item's UserPrimaryKeysField reads it instead of querying.
+    """
+    resolved = {}
+    for name, field in serializer.fields.items():
+        if not isinstance(field, UserPrimaryKeysField):
+            continue
+
+        pks = set()
+        for item in items:
+            values = item.get(name) if isinstance(item, dict) else None
+            if not isinstance(values, list):
+                continue
+            for value in values:
+                try:
+                    pks.add(int(value))
+                except (TypeError, ValueError):
+                    pass
+
+        resolved[name] = field.resolve(list(pks)) if pks else {}
+
+    return resolved
+
+
+def create_recipes(user, validated):
+    """insert recipes and their relations, return recipes in input order"""
+    recipes = [
+        Recipe(user=user, **_column_values(data)) for data in validated
+    ]
+    Recipe.objects.bulk_create(recipes)
+    set_relations(recipes, validated, replace=False)
+    # bulk writes send no save or m2m_changed signals
+    refresh_recipes([recipe.id for recipe in recipes])
+    bump_data_version(user.id)
+
+    return recipes
+
+
+def update_recipes(recipes, validated):
+    """apply partial updates to recipes and replace submitted relations"""
+    fields = set()
+    for recipe, data in zip(recipes, validated):
+        values = _column_values(data)
+        for name, value in values.items():
+            setattr(recipe, name, value)
+        fields.update(values)
+
+    if fields:
+        Recipe.objects.bulk_update(recipes, sorted(fields))
+    set_relations(recipes, validated, replace=True)
+    refresh_recipes([recipe.id for recipe in recipes])
+    for user_id in {recipe.user_id for recipe in recipes}:
+        bump_data_version(user_id)
+
+    return recipes
+
+
+def set_relations(recipes, validated, replace):
+    """write all through-table rows for each relation in a single INSERT"""
+    for name in RELATION_FIELDS:
+        through = getattr(Recipe, name).through
+        target = getattr(Recipe, name).field.m2m_reverse_field_name()
+        # the last item naming a recipe wins, as bulk_update does for columns
+        related = {
+            recipe.id: {obj.id for obj in data[name]}
+            for recipe, data in zip(recipes, validated) if name in data
+        }
+        if not related:
+            continue
+
+        if replace:
+            through.objects.filter(recipe_id__in=list(related)).delete()
+
+        through.objects.bulk_create([
+            through(**{'recipe_id': recipe_id, f'{target}_id': pk})
+            for recipe_id, pks in related.items() for pk in sorted(pks)
+        ])
+
+
+def _column_values(data):
+    """return validated data without the many to many relations"""
+    return {k: v for k, v in data.items() if k not in RELATION_FIELDS}
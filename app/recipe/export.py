@@ -0,0 +1,109 @@
+"""
+Streaming export of recipes as NDJSON or CSV.
+
+Rows are read through a server-side cursor in chunks. Tag and ingredient
+names are loaded with one query per chunk, so memory stays bounded by the
+chunk size rather than the account size.
+"""
+import csv
+from itertools import chain, islice
+
+from rest_framework import renderers
+
+from core.models import Ingredient, Tag
+from core.renderers import FastJSONRenderer
+
+
+EXPORT_FIELDS = ('id', 'title', 'time_minutes', 'price', 'link', 'tags', 'ingredients')
+
+# joins tag and ingredient names in a single CSV cell
+LIST_SEPARATOR = '|'
+
+_COLUMNS = ('id', 'title', 'time_minutes', 'price', 'link', 'tag_ids', 'ingredient_ids')
+
+
+def _names(model, ids):
+    return dict(model.objects.filter(id__in=ids).values_list('id', 'name'))
+
+
+def export_records(queryset, chunk_size):
+    """yield one dict per recipe with tag and ingredient names"""
+    rows = queryset.values_list(*_COLUMNS, named=True).iterator(chunk_size=chunk_size)
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+
+        tags = _names(Tag, {pk for row in chunk for pk in row.tag_ids})
+        ingredients = _names(Ingredient, {pk for row in chunk for pk in row.ingredient_ids})
+
+        for row in chunk:
+            yield {
+                'id': row.id,
+                'title': row.title,
+                'time_minutes': row.time_minutes,
+                'price': str(row.price),
+                'link': row.link,
+                'tags': [tags[pk] for pk in row.tag_ids if pk in tags],
+                'ingredients': [
+                    ingredients[pk] for pk in row.ingredient_ids if pk in ingredients
+                ],
+            }
+
+
+class NDJSONRenderer(renderers.BaseRenderer):
+    """one JSON document per line"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def __init__(self):
+        self.json = FastJSONRenderer()
+
+    def render_records(self, records):
+        for record in records:
+            yield self.json.render(record) + b'\n'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        records = data if isinstance(data, list) else [data]
+        return b''.join(self.render_records(records))
+
+
+class _Line:
+    """file-like object handing back what csv.writer writes"""
+
+    def write(self, value):
+        return value
+
+
+class CSVRenderer(renderers.BaseRenderer):
+    """comma separated values with a header row, lists joined by `|`"""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render_records(self, records, fields=None):
+        writer = csv.writer(_Line())
+        records = iter(records)
+        if fields is None:
+            first = next(records, None)
+            if first is None:
+                return
+            fields = list(first)
+            records = chain([first], records)
+
+        yield writer.writerow(fields).encode()
+        for record in records:
+            yield writer.writerow([
+                LIST_SEPARATOR.join(map(str, value)) if isinstance(value, list) else value
+                for value in (record.get(name) for name in fields)
+            ]).encode()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        records = data if isinstance(data, list) else [data]
+        return b''.join(self.render_records(records))
@@ -0,0 +1,173 @@
+"""
+Read-only list rendering that skips per-object ModelSerializer work.
+
+DRF's `ModelSerializer(many=True)` instantiates a model per row and then,
+per field, resolves the attribute and calls `to_representation`. For list
+pages of plain columns that overhead dominates. FastListSerializer compiles
+a serializer class into a plan of (key, column, converter) and renders
+`values_list()` rows with it, producing the same output as the serializer.
+`for_serializer()` keeps one compiled engine per serializer class and field
+set for the life of the process.
+"""
+from rest_framework import fields as drf_fields
+from rest_framework import relations
+
+from recipe.fields import UserPrimaryKeysField
+
+
+# field classes whose to_representation is exactly a builtin conversion
+_BUILTIN_CONVERTERS = {
+    drf_fields.IntegerField: int,
+    drf_fields.CharField: str,
+}
+
+
+# (serializer class, set of field names or None) -> engine or None
+_engines = {}
+
+
+class Unsupported(Exception):
+    """the serializer has a field the fast path cannot render"""
+
+
+class FastListSerializer:
+    """Render querysets like serializer_class(many=True) without model instances"""
+
+    def __init__(self, serializer_class, fields=None, context=None):
+        kwargs = {'context': context or {}}
+        if fields is not None:
+            kwargs['fields'] = fields
+        serializer = serializer_class(**kwargs)
+        self.model = serializer.Meta.model
+
+        # (key, column, converter) for columns on the row and
+        # (key, relation name) for ids grouped from a through table
+        self.plan = []
+        self.relations = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            self._compile(name, field)
+
+    @classmethod
+    def for_serializer(cls, serializer_class, fields=None):
+        """return the cached engine for serializer_class, or None if unsupported
+
+        Engines are compiled without a context, so they hold on to no
+        request and are shared by all of them.
+        """
+        key = (serializer_class, None if fields is None else frozenset(fields))
+        try:
+            return _engines[key]
+        except KeyError:
+            pass
+
+        try:
+            engine = cls(serializer_class, fields=fields)
+        except Unsupported:
+            engine = None
+        # concurrent first requests may both compile, either result is fine
+        _engines[key] = engine
+        return engine
+
+    def _compile(self, name, field):
+        source = field.source
+        if source == '*' or '.' in source:
+            raise Unsupported(name)
+
+        if isinstance(field, UserPrimaryKeysField):
+            if field.ids_attr:
+                self.plan.append((name, field.ids_attr, list))
+            else:
+                self._add_relation(name, source)
+            return
+
+        if isinstance(field, relations.ManyRelatedField):
+            if not isinstance(field.child_relation, relations.PrimaryKeyRelatedField):
+                raise Unsupported(name)
+            self._add_relation(name, source)
+            return
+
+        if isinstance(field, (relations.RelatedField, drf_fields.SerializerMethodField)) \
+                or hasattr(field, 'fields') or hasattr(field, 'child'):
+            raise Unsupported(name)
+
+        convert = _BUILTIN_CONVERTERS.get(type(field), field.to_representation)
+        self.plan.append((name, source, convert))
+
+    def _add_relation(self, name, source):
+        descriptor = getattr(self.model, source, None)
+        if descriptor is None or not getattr(descriptor, 'field', None) \
+                or not descriptor.field.many_to_many or descriptor.reverse:
+            raise Unsupported(name)
+        self.relations.append((name, source))
+        # the relation map is keyed by primary key
+        self.plan.append((name, None, None))
+
+    def columns(self, queryset):
+        """return the columns to select for the plan and the queryset ordering"""
+        columns = ['pk'] if self.relations else []
+        for _, column, _ in self.plan:
+            if column and column not in columns:
+                columns.append(column)
+        for ordering in queryset.query.order_by:
+            name = ordering.lstrip('-')
+            if name not in columns:
+                columns.append(name)
+
+        return columns
+
+    def rows(self, queryset):
+        """return a values_list queryset of named rows for render()"""
+        return queryset.values_list(*self.columns(queryset), named=True)
+
+    def render(self, rows):
+        """return the list of dicts the serializer would have produced"""
+        rows = list(rows)
+        if not rows:
+            return []
+
+        fields = rows[0]._fields
+        relation_maps = self._relation_maps(rows) if self.relations else {}
+
+        steps = []
+        for name, column, convert in self.plan:
+            if column is None:
+                steps.append((name, None, relation_maps[name]))
+            else:
+                steps.append((name, fields.index(column), convert))
+
+        pk_index = fields.index('pk') if self.relations else None
+        data = []
+        for row in rows:
+            item = {}
+            for name, index, convert in steps:
+                if index is None:
+                    item[name] = convert.get(row[pk_index], [])
+                    continue
+                value = row[index]
+                item[name] = None if value is None else convert(value)
+            data.append(item)
+
+        return data
+
+    def _relation_maps(self, rows):
+        """group related primary keys by row with one query per relation"""
+        pk_index = rows[0]._fields.index('pk')
+        pks = [row[pk_index] for row in rows]
+
+        maps = {}
+        for name, source in self.relations:
+            m2m = getattr(self.model, source).field
+            through = m2m.remote_field.through
+            owner = m2m.m2m_column_name()
+            target = m2m.m2m_reverse_name()
+
+            grouped = {}
+            pairs = through.objects.filter(**{f'{owner}__in': pks}) \
+                .order_by(owner, target).values_list(owner, target)
+            for owner_pk, target_pk in pairs:
+                grouped.setdefault(owner_pk, []).append(target_pk)
+            maps[name] = grouped
+
+        return maps
@@ -0,0 +1,108 @@
+from rest_framework import serializers
+from rest_framework.fields import empty
+from rest_framework.utils import html
+
+from recipe import validators
+
+
+class UserPrimaryKeysField(serializers.Field):
+    """
+    List of primary keys for objects owned by the requesting user.
+
+    Replaces `PrimaryKeyRelatedField(many=True)`, which runs one query per
+    submitted id and does not check ownership. The whole list is resolved
+    with a single `pk IN (...)` query scoped to `request.user`, and every
+    missing or foreign id is reported in one error.
+    """
+    default_error_messages = {
+        'not_a_list': 'Expected a list of items but got type "{input_type}".',
+        'incorrect_type': 'Incorrect type. Expected pk value, received {data_type}.',
+        'does_not_exist': 'Invalid pk(s) {pk_values} - object(s) do not exist.',
+        'empty': 'This list may not be empty.',
+    }
+
+    def __init__(self, queryset, ids_attr=None, allow_empty=True, **kwargs):
+        self.queryset = queryset
+        # model attribute holding the denormalized list of related ids
+        self.ids_attr = ids_attr
+        self.allow_empty = allow_empty
+        super().__init__(**kwargs)
+
+    def get_value(self, dictionary):
+        # html forms cannot send an empty list, so a missing key means []
+        # unless this is a partial update
+        if html.is_html_input(dictionary):
+            if self.field_name not in dictionary:
+                if getattr(self.root, 'partial', False):
+                    return empty
+            return dictionary.getlist(self.field_name)
+
+        return dictionary.get(self.field_name, empty)
+
+    def get_queryset(self):
+        """return the queryset restricted to the requesting user"""
+        request = self.context.get('request')
+        return self.queryset.filter(user=request.user)
+
+    def to_internal_value(self, data):
+        if isinstance(data, (str, dict)) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        pks = []
+        for item in data:
+            if isinstance(item, bool):
+                self.fail('incorrect_type', data_type=type(item).__name__)
+            try:
+                pk = int(item)
+            except (TypeError, ValueError):
+                self.fail('incorrect_type', data_type=type(item).__name__)
+            if pk not in pks:
+                pks.append(pk)
+
+        if not pks:
+            return []
+
+        objects = self.resolve(pks)
+        missing = [pk for pk in pks if pk not in objects]
+        if missing:
+            self.fail('does_not_exist', pk_values=missing)
+
+        return [objects[pk] for pk in pks]
+
+    def resolve(self, pks):
+        """return a {pk: object} map for the pks owned by the user"""
+        # bulk writes resolve the ids of every item up front
+        resolved = self.context.get('resolved_pks', {}).get(self.field_name)
+        if resolved is not None:
+            return {pk: resolved[pk] for pk in pks if pk in resolved}
+
+        return {obj.pk: obj for obj in self.get_queryset().filter(pk__in=pks)}
+
+    def get_attribute(self, instance):
+        if self.ids_attr:
+            return getattr(instance, self.ids_attr)
+
+        return super().get_attribute(instance)
+
+    def to_representation(self, value):
+        if isinstance(value, list):
+            return list(value)
+
+        return [obj.pk for obj in value.all()]
+
+
+class HeaderCheckedImageField(serializers.FileField):
+    """
+    Image upload checked by recipe.validators.check_image().
+
+    Replaces `ImageField`, which has Pillow load and verify the whole file
+    in the request thread. Only the size and the header are looked at;
+    the pixels are first decoded by the renditions, off the request.
+    """
+
+    def to_internal_value(self, data):
+        file = super().to_internal_value(data)
+        validators.check_image(file)
+        return file
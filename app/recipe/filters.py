@@ -0,0 +1,78 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast
+
+from core.models import SEARCH_CONFIG
+
+
+MATCH_MODES = ('any', 'all')
+
+# columns the recipe list can be ordered and range filtered by, each one
+# backed by a (user, column, id) index
+ORDERING_FIELDS = ('id', 'time_minutes', 'price')
+ORDERING_CHOICES = ORDERING_FIELDS + tuple(f'-{f}' for f in ORDERING_FIELDS)
+RANGE_FIELDS = ('time_minutes', 'price')
+
+
+def related_filter(column, ids, match='any'):
+    """
+    Filter recipes related to any or all of ids.
+
+    Uses the denormalized id arrays on Recipe, so `any` is an overlap
+    (&&) and `all` a containment (@>) test on one table, both answered by
+    the GIN (user, <column>) index without joining the through tables.
+    """
+    lookup = 'contains' if match == 'all' else 'overlap'
+    return Q(**{f'{column}__{lookup}': sorted(set(ids))})
+
+
+def filter_recipes(queryset, tag_ids=None, ingredient_ids=None, match='any'):
+    """apply the tag and ingredient filters of the recipe list"""
+    if tag_ids:
+        queryset = queryset.filter(related_filter('tag_ids', tag_ids, match))
+
+    if ingredient_ids:
+        queryset = queryset.filter(
+            related_filter('ingredient_ids', ingredient_ids, match)
+        )
+
+    return queryset
+
+
+def filter_ranges(queryset, params):
+    """apply min_<field> / max_<field> bounds from validated params"""
+    for field in RANGE_FIELDS:
+        if params.get(f'min_{field}') is not None:
+            queryset = queryset.filter(**{f'{field}__gte': params[f'min_{field}']})
+        if params.get(f'max_{field}') is not None:
+            queryset = queryset.filter(**{f'{field}__lte': params[f'max_{field}']})
+
+    return queryset
+
+
+def keyset_ordering(ordering):
+    """
+    return ordering with an id tie break in the same direction
+
+    Keeping both directions equal lets one forward or backward scan of the
+    (user, field, id) index return the page in order.
+    """
+    if ordering.lstrip('-') == 'id':
+        return (ordering,)
+
+    return (ordering, '-id' if ordering.startswith('-') else 'id')
+
+
+def search_recipes(queryset, text):
+    """
+    full text search over title, tag and ingredient names
+
+    Matches use the GIN index on Recipe.search_vector and every row is
+    annotated with its `rank` so callers can order by relevance. The rank
+    is cast from real to double precision: the float that a keyset cursor
+    stores then compares equal to the column again.
+    """
+    query = SearchQuery(text, search_type='websearch', config=SEARCH_CONFIG)
+    return queryset.filter(search_vector=query).annotate(
+        rank=Cast(SearchRank(F('search_vector'), query), FloatField())
+    )
@@ -0,0 +1,181 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opaque cursor pagination over a unique ordering.
+
+    Each page is fetched with a `WHERE (a, b) < (x, y) ORDER BY a, b LIMIT n`
+    style predicate built from the last row of the previous page, so page N
+    costs the same as page 1: there is no OFFSET scan and no COUNT(*).
+    Views choose the ordering through `keyset_ordering` (or
+    `get_keyset_ordering()`); its last field must be unique, e.g. `id`.
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'RECIPE_API_MAX_PAGE_SIZE', 1000)
+    ordering = ('-id',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.ordering = self.get_ordering(view)
+        position, reverse = self.decode_cursor(request)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(_invert(field) for field in ordering)
+
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(_keyset_filter(ordering, position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        """return requested page size, capped at max_page_size"""
+        if self.page_size_query_param:
+            try:
+                size = int(request.query_params[self.page_size_query_param])
+            except (KeyError, ValueError):
+                pass
+            else:
+                if size > 0:
+                    return min(size, self.max_page_size)
+
+        return self.page_size
+
+    def get_ordering(self, view):
+        """return the ordering for the view, the last field must be unique"""
+        if hasattr(view, 'get_keyset_ordering'):
+            ordering = tuple(view.get_keyset_ordering())
+        else:
+            ordering = tuple(getattr(view, 'keyset_ordering', self.ordering))
+
+        assert ordering and ordering[-1].lstrip('-') in ('id', 'pk'), (
+            'Keyset ordering must end with a unique field, got %r' % (ordering,)
+        )
+        return ordering
+
+    def decode_cursor(self, request):
+        """return (position, reverse) for the cursor in the request"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            position = data['p']
+            reverse = bool(data.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        return position, reverse
+
+    def encode_cursor(self, instance, reverse=False):
+        """return an opaque cursor pointing at instance"""
+        position = [
+            getattr(instance, field.lstrip('-')) for field in self.ordering
+        ]
+        data = {'p': position}
+        if reverse:
+            data['r'] = 1
+
+        raw = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+
+        cursor = self.encode_cursor(self.page[-1])
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+
+        cursor = self.encode_cursor(self.page[0], reverse=True)
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+def _invert(field):
+    """flip the direction of an order_by field"""
+    return field[1:] if field.startswith('-') else '-' + field
+
+
+def _keyset_filter(ordering, position):
+    """
+    Build the row comparison `(f1, ..., fn) > (v1, ..., vn)` for ordering.
+
+    The comparison is expanded into nested OR/AND terms, with a redundant
+    `f1 >= v1` bound in front so that the index range scan starts at the
+    cursor instead of filtering every row before it.
+    """
+    fields = [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+
+    name, descending = fields[-1]
+    condition = Q(**{f"{name}__{'lt' if descending else 'gt'}": position[-1]})
+
+    for (name, descending), value in reversed(list(zip(fields, position))[:-1]):
+        strict = Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+        condition = strict | (Q(**{name: value}) & condition)
+
+    if len(fields) > 1:
+        name, descending = fields[0]
+        bound = Q(**{f"{name}__{'lte' if descending else 'gte'}": position[0]})
+        condition = bound & condition
+
+    return condition
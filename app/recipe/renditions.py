@@ -0,0 +1,187 @@
+"""
+Resized copies of recipe images, generated off the request thread.
+
+`schedule()` queues a job on a small thread pool once the upload commits.
+The job decodes the original once, using JPEG draft mode to decode at the
+smallest scale that still covers the largest width. It then steps down
+through RECIPE_IMAGE_RENDITIONS['WIDTHS'] with reduce() based resizes and
+saves every width in every format under a name derived from the
+original's. Images are never upscaled, so a small original gives
+renditions at its own width under the configured names.
+
+Queued jobs are lost when the process exits; `manage.py
+generate_renditions` fills in recipes whose renditions are missing.
+"""
+import io
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from core.models import Recipe
+from core.storage import image_storage
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'WIDTHS': [320, 640, 1280],
+    'FORMATS': ['webp', 'jpeg'],
+    'QUALITY': 80,
+    'WORKERS': 2,
+}
+
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+# EXIF orientations that swap width and height
+TRANSPOSED = {5, 6, 7, 8}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'RECIPE_IMAGE_RENDITIONS', {})}
+
+
+def rendition_names(image_name):
+    """{width: {format: storage name}} for the renditions of image_name"""
+    config = get_config()
+    stem = posixpath.splitext(posixpath.basename(image_name))[0]
+    return {
+        width: {
+            fmt: f'renditions/recipe/{stem}/{width}.{EXTENSIONS[fmt]}'
+            for fmt in config['FORMATS']
+        }
+        for width in sorted(config['WIDTHS'])
+    }
+
+
+def rendition_urls(recipe, request=None):
+    """the status and URLs of the recipe image's renditions, None without image"""
+    if not recipe.image:
+        return None
+
+    def url(name):
+        url = image_storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+
+    return {
+        'status': 'ready' if recipe.image_renditions else 'pending',
+        'widths': {
+            str(width): {fmt: url(name) for fmt, name in formats.items()}
+            for width, formats in rendition_names(recipe.image.name).items()
+        },
+    }
+
+
+def _encode(image, fmt, quality):
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    elif fmt == 'webp' and image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    buffer = io.BytesIO()
+    image.save(buffer, fmt.upper(), quality=quality)
+    return buffer.getvalue()
+
+
+def _save(name, content):
+    # names are fixed, so replace what a previous run left behind
+    image_storage.replace(name, ContentFile(content))
+
+
+def render(image_name):
+    """write every rendition of image_name to storage, return their names"""
+    config = get_config()
+    names = rendition_names(image_name)
+
+    with image_storage.open(image_name) as source, Image.open(source) as image:
+        orientation = image.getexif().get(0x0112, 1)
+        width, height = image.size
+        if orientation in TRANSPOSED:
+            width, height = height, width
+
+        largest = min(max(names), width)
+        scale = largest / width
+        # decode JPEGs at 1/2, 1/4 or 1/8 scale when that still covers
+        # the largest rendition, the size is in stored orientation
+        image.draft('RGB', (round(image.width * scale), round(image.height * scale)))
+        current = ImageOps.exif_transpose(image)
+
+        # largest first, every step resizes the previous, smaller result
+        for target in sorted(names, reverse=True):
+            target_width = min(target, width)
+            size = (target_width, max(1, round(height * target_width / width)))
+            if current.size != size:
+                current = current.resize(size, Image.LANCZOS, reducing_gap=2.0)
+            for fmt, name in names[target].items():
+                _save(name, _encode(current, fmt, config['QUALITY']))
+
+    return {str(width): formats for width, formats in names.items()}
+
+
+def generate(recipe_id, image_name, force=False):
+    """render image_name and record the result on the recipe, False on failure
+
+    Unless forced, renditions another recipe already has are reused.
+    """
+    expected = {
+        str(width): formats for width, formats in rendition_names(image_name).items()
+    }
+    # recipes sharing a stored image share its renditions
+    done = not force and Recipe.objects.filter(
+        image=image_name, image_renditions=expected
+    ).exists()
+
+    try:
+        renditions = expected if done else render(image_name)
+    except Exception:
+        logger.exception('failed to render %s for recipe %s', image_name, recipe_id)
+        return False
+
+    # skip recipes whose image changed while we were rendering
+    Recipe.objects.filter(pk=recipe_id, image=image_name).update(
+        image_renditions=renditions
+    )
+    return True
+
+
+def _job(recipe_id, image_name):
+    # pool threads keep their own connections, see core.pool
+    close_old_connections()
+    try:
+        generate(recipe_id, image_name)
+    finally:
+        close_old_connections()
+
+
+def get_executor():
+    """return the process wide rendition pool, created on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_config()['WORKERS'],
+                thread_name_prefix='renditions',
+            )
+        return _executor
+
+
+def schedule(recipe):
+    """render the recipe's image on the pool once the transaction commits
+
+    Does nothing when the recipe has no image or its renditions are done.
+    """
+    if not recipe.image or recipe.image_renditions is not None:
+        return
+
+    image_name = recipe.image.name
+    transaction.on_commit(
+        lambda: get_executor().submit(_job, recipe.pk, image_name)
+    )
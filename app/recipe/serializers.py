@@ -1,9 +1,27 @@
 from rest_framework import serializers
 
-from core.models import Tag, Ingredient, Recipe
+from django.core.files import File
+from django.core.validators import validate_image_file_extension
+from django.db import transaction
 
+from core.models import ImageUpload, Tag, Ingredient, Recipe
+from recipe import filters, renditions, uploads, validators
+from recipe.fields import HeaderCheckedImageField, UserPrimaryKeysField
 
-class TagSerializer(serializers.ModelSerializer):
+
+class DynamicFieldsMixin:
+    """serializer mixin that keeps only the field names passed in `fields`"""
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class TagSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """serializer for Tag objects"""
     class Meta:
         model = Tag
@@ -11,7 +29,7 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """serializer for Ingredient objects"""
 
     class Meta:
@@ -20,16 +38,12 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for Recipe objects"""
-    ingredients = serializers.PrimaryKeyRelatedField(
-        many = True, 
-        queryset = Ingredient.objects.all() 
-    )
-    tags = serializers.PrimaryKeyRelatedField(
-        many = True, 
-        queryset = Tag.objects.all()
+    ingredients = UserPrimaryKeysField(
+        queryset=Ingredient.objects.all(), ids_attr='ingredient_ids'
     )
+    tags = UserPrimaryKeysField(queryset=Tag.objects.all(), ids_attr='tag_ids')
 
     class Meta:
         model = Recipe
@@ -45,8 +59,64 @@ class RecipeDetailSerializer(RecipeSerializer):
 
 class RecipeImageSerializer(serializers.ModelSerializer):
     """serializer for uploading images to recipes"""
+    image = HeaderCheckedImageField(
+        allow_null=True, validators=[validate_image_file_extension]
+    )
+    renditions = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields = ("id", "image",)
-        read_only_fields = ('id',)
\ No newline at end of file
+        fields = ("id", "image", "renditions",)
+        read_only_fields = ('id',)
+
+    def get_renditions(self, obj):
+        return renditions.rendition_urls(obj, self.context.get('request'))
+
+    def update(self, instance, validated_data):
+        image = validated_data.get('image')
+        with transaction.atomic():
+            uploads.attach(instance, uploads.store(image) if image else None)
+        return instance
+
+
+class ImageUploadSerializer(serializers.ModelSerializer):
+    """serializer for starting and resuming chunked image uploads"""
+    filename = serializers.CharField(write_only=True, max_length=100)
+
+    class Meta:
+        model = ImageUpload
+        fields = ('id', 'filename', 'size', 'offset',)
+        read_only_fields = ('id', 'offset',)
+
+    def validate_filename(self, value):
+        validate_image_file_extension(File(None, name=value))
+        return value
+
+    def validate_size(self, value):
+        if value < 1:
+            raise serializers.ValidationError('Ensure the size is at least 1 byte.')
+        validators.check_size(value)
+        return value
+
+    def create(self, validated_data):
+        return uploads.start(**validated_data)
+
+
+class FinishUploadSerializer(serializers.Serializer):
+    """serializer for finalizing a chunked image upload"""
+    sha256 = serializers.RegexField(r'^[0-9a-fA-F]{64}$', required=False)
+
+
+class BulkParamsSerializer(serializers.Serializer):
+    """serializer for validating bulk query parameters"""
+    atomic = serializers.BooleanField(default=True)
+
+
+class RecipeFilterSerializer(serializers.Serializer):
+    """serializer for validating recipe list query parameters"""
+    match = serializers.ChoiceField(choices=filters.MATCH_MODES, default='any')
+    ordering = serializers.ChoiceField(choices=filters.ORDERING_CHOICES, required=False)
+    min_time_minutes = serializers.IntegerField(required=False)
+    max_time_minutes = serializers.IntegerField(required=False)
+    min_price = serializers.DecimalField(max_digits=None, decimal_places=2, required=False)
+    max_price = serializers.DecimalField(max_digits=None, decimal_places=2, required=False)
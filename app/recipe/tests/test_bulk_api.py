@@ -0,0 +1,201 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+
+BULK_URL = reverse('recipe:recipe-bulk')
+
+
+def sample_recipe(user, **kwargs):
+    """create and return a sample recipe"""
+    defaults = {
+        'title': 'Sample Recipe',
+        'time_minutes': 10,
+        'price': 5.00,
+    }
+    defaults.update(kwargs)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class BulkRecipeAPITests(TestCase):
+    """Test the bulk recipe collection endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'diego@oxd.com',
+            'MyPassword123'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = Ingredient.objects.create(user=self.user, name='Kale')
+
+    def payload(self, count, **kwargs):
+        items = []
+        for i in range(count):
+            item = {
+                'title': f'Recipe {i}',
+                'time_minutes': 10 + i,
+                'price': '5.00',
+                'tags': [self.tag.id],
+                'ingredients': [self.ingredient.id],
+            }
+            item.update(kwargs)
+            items.append(item)
+        return items
+
+    def test_bulk_create(self):
+        """test creating recipes returns ids in input order"""
+        res = self.client.post(BULK_URL, self.payload(3), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        ids = [item['id'] for item in res.data['results']]
+        titles = [Recipe.objects.get(id=pk).title for pk in ids]
+        self.assertEqual(titles, ['Recipe 0', 'Recipe 1', 'Recipe 2'])
+        for pk in ids:
+            recipe = Recipe.objects.get(id=pk)
+            self.assertEqual(list(recipe.tags.all()), [self.tag])
+            self.assertEqual(list(recipe.ingredients.all()), [self.ingredient])
+
+    def test_bulk_create_query_count_constant(self):
+        """test the number of queries does not grow with the item count"""
+        with self.assertNumQueries(8):
+            self.client.post(BULK_URL, self.payload(2), format='json')
+        with self.assertNumQueries(8):
+            self.client.post(BULK_URL, self.payload(50), format='json')
+
+        self.assertEqual(Recipe.objects.count(), 52)
+
+    def test_bulk_create_atomic_rejects_all(self):
+        """test one invalid item aborts the whole request by default"""
+        items = self.payload(2)
+        items[1]['title'] = ''
+
+        res = self.client.post(BULK_URL, items, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIsNone(res.data['errors'][0])
+        self.assertIn('title', res.data['errors'][1])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_create_per_item_errors(self):
+        """test atomic=0 writes valid items and reports invalid ones"""
+        other = get_user_model().objects.create_user('other@oxd.com', 'pass12345')
+        foreign = Tag.objects.create(user=other, name='Foreign')
+        items = self.payload(3)
+        items[1]['tags'] = [foreign.id]
+
+        res = self.client.post(f'{BULK_URL}?atomic=0', items, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+        results = res.data['results']
+        self.assertIn('id', results[0])
+        self.assertIn('tags', results[1]['errors'])
+        self.assertIn('id', results[2])
+        self.assertEqual(Recipe.objects.count(), 2)
+
+    def test_bulk_update(self):
+        """test patching recipes updates fields and replaces relations"""
+        recipe1 = sample_recipe(self.user, title='Curry')
+        recipe2 = sample_recipe(self.user, title='Soup')
+        recipe1.tags.add(self.tag)
+        new_tag = Tag.objects.create(user=self.user, name='Spicy')
+
+        items = [
+            {'id': recipe2.id, 'price': '9.50'},
+            {'id': recipe1.id, 'title': 'Thai Curry', 'tags': [new_tag.id]},
+        ]
+        res = self.client.patch(BULK_URL, items, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['id'] for item in res.data['results']],
+            [recipe2.id, recipe1.id]
+        )
+        recipe1.refresh_from_db()
+        recipe2.refresh_from_db()
+        self.assertEqual(recipe1.title, 'Thai Curry')
+        self.assertEqual(list(recipe1.tags.all()), [new_tag])
+        self.assertEqual(str(recipe2.price), '9.50')
+        self.assertEqual(recipe2.title, 'Soup')
+
+    def test_bulk_update_duplicate_relations(self):
+        """test repeated relation ids and recipes do not duplicate rows"""
+        recipe = sample_recipe(self.user, title='Curry')
+        new_tag = Tag.objects.create(user=self.user, name='Spicy')
+
+        items = [
+            {'id': recipe.id, 'tags': [self.tag.id, str(self.tag.id)]},
+            {'id': recipe.id, 'tags': [new_tag.id, new_tag.id],
+             'ingredients': [self.ingredient.id, self.ingredient.id]},
+        ]
+        res = self.client.patch(BULK_URL, items, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        # the last item for a recipe wins, as for its columns
+        self.assertEqual(list(recipe.tags.all()), [new_tag])
+        self.assertEqual(list(recipe.ingredients.all()), [self.ingredient])
+
+    def test_bulk_atomic_flag(self):
+        """test the usual boolean spellings of atomic and a 400 for others"""
+        for value in ('false', 'False', 'no', 'off', '0'):
+            res = self.client.post(
+                f'{BULK_URL}?atomic={value}', [{'title': 'Bad'}], format='json'
+            )
+            self.assertEqual(res.status_code, status.HTTP_207_MULTI_STATUS)
+
+        res = self.client.post(f'{BULK_URL}?atomic=true', [{'title': 'Bad'}], format='json')
+        self.assertIn('errors', res.data)
+
+        res = self.client.post(f'{BULK_URL}?atomic=maybe', self.payload(1), format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('atomic', res.data)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_update_other_users_recipe(self):
+        """test recipes of other users cannot be updated"""
+        other = get_user_model().objects.create_user('other@oxd.com', 'pass12345')
+        recipe = sample_recipe(other, title='Theirs')
+
+        res = self.client.patch(
+            BULK_URL, [{'id': recipe.id, 'title': 'Mine'}], format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Theirs')
+
+    def test_bulk_delete(self):
+        """test deleting recipes by id"""
+        recipe1 = sample_recipe(self.user)
+        recipe2 = sample_recipe(self.user)
+        keep = sample_recipe(self.user)
+
+        res = self.client.delete(BULK_URL, [recipe2.id, recipe1.id], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['id'] for item in res.data['results']],
+            [recipe2.id, recipe1.id]
+        )
+        self.assertEqual(list(Recipe.objects.all()), [keep])
+
+    def test_bulk_delete_atomic_missing_id(self):
+        """test a missing id aborts the delete"""
+        recipe = sample_recipe(self.user)
+
+        res = self.client.delete(BULK_URL, [recipe.id, 999999], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Recipe.objects.filter(id=recipe.id).exists())
+
+    def test_bulk_requires_list(self):
+        """test a non list body is rejected"""
+        res = self.client.post(BULK_URL, {'title': 'Nope'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,208 @@
+import hashlib
+import io
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ImageUpload, Recipe, StoredImage
+from core.storage import content_name
+from recipe import uploads
+
+
+def start_url(recipe_id):
+    return reverse('recipe:recipe-start-upload', args=[recipe_id])
+
+
+def chunk_url(recipe_id, upload_id):
+    return reverse('recipe:recipe-upload-chunk', args=[recipe_id, upload_id])
+
+
+def finish_url(recipe_id, upload_id):
+    return reverse('recipe:recipe-finish-upload', args=[recipe_id, upload_id])
+
+
+def sample_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (300, 200), 'teal').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class ChunkedUploadTests(TestCase):
+    """Test resumable chunked image uploads"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+        self.user = get_user_model().objects.create_user('diego@oxd.com', 'pass12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Paella', time_minutes=40, price=12
+        )
+        self.data = sample_image()
+
+    def start(self, size=None):
+        res = self.client.post(start_url(self.recipe.id), {
+            'filename': 'photo.png', 'size': size or len(self.data)
+        })
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res.data['id']
+
+    def put(self, upload_id, start, end, body=None, total=None):
+        body = self.data[start:end + 1] if body is None else body
+        return self.client.generic(
+            'PUT', chunk_url(self.recipe.id, upload_id), body,
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{end}/{total or len(self.data)}',
+        )
+
+    def finish(self, upload_id, **data):
+        with patch('recipe.renditions.schedule') as schedule:
+            res = self.client.post(finish_url(self.recipe.id, upload_id), data)
+        self.scheduled = schedule.call_count
+        return res
+
+    def test_upload_in_chunks(self):
+        """test chunks are assembled in one file and attached on finalize"""
+        upload_id = self.start()
+        upload = ImageUpload.objects.get(pk=upload_id)
+        size = len(self.data)
+
+        for start in range(0, size, 100):
+            res = self.put(upload_id, start, min(start + 99, size - 1))
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['offset'], size)
+
+        res = self.finish(upload_id, sha256=hashlib.sha256(self.data).hexdigest())
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['renditions']['status'], 'pending')
+        self.recipe.refresh_from_db()
+        # moved to its content address
+        self.assertEqual(self.recipe.image.name, content_name(
+            hashlib.sha256(self.data).hexdigest(), 'photo.png'
+        ))
+        with default_storage.open(self.recipe.image.name) as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertFalse(default_storage.exists(upload.name))
+        self.assertEqual(StoredImage.objects.get(name=self.recipe.image.name).refcount, 1)
+        self.assertFalse(ImageUpload.objects.exists())
+        self.assertEqual(self.scheduled, 1)
+
+    def test_resume(self):
+        """test a client can ask for the offset and continue from there"""
+        upload_id = self.start()
+        self.put(upload_id, 0, 99)
+
+        res = self.client.get(chunk_url(self.recipe.id, upload_id))
+        self.assertEqual(res.data['offset'], 100)
+
+        # a chunk after a lost one is refused with the offset
+        res = self.put(upload_id, 200, 299)
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(res.data['offset'], 100)
+
+    def test_resent_and_overlapping_chunks(self):
+        """test bytes the upload already has are skipped"""
+        upload_id = self.start()
+        self.put(upload_id, 0, 99)
+
+        res = self.put(upload_id, 0, 99)
+        self.assertEqual(res.data['offset'], 100)
+        res = self.put(upload_id, 50, len(self.data) - 1)
+        self.assertEqual(res.data['offset'], len(self.data))
+
+        res = self.finish(upload_id, sha256=hashlib.sha256(self.data).hexdigest())
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_hash_rebuilt_by_other_worker(self):
+        """test a worker without the hash state reads the received bytes once"""
+        upload_id = self.start()
+        self.put(upload_id, 0, 99)
+        uploads._hashes.clear()
+        self.put(upload_id, 100, len(self.data) - 1)
+        uploads._hashes.clear()
+
+        res = self.finish(upload_id, sha256=hashlib.sha256(self.data).hexdigest())
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_finish_incomplete(self):
+        """test finalizing before every byte arrived is refused"""
+        upload_id = self.start()
+        self.put(upload_id, 0, 99)
+
+        res = self.finish(upload_id)
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(res.data['offset'], 100)
+
+    def test_checksum_mismatch(self):
+        """test a corrupted upload is discarded"""
+        upload_id = self.start()
+        upload = ImageUpload.objects.get(pk=upload_id)
+        self.put(upload_id, 0, len(self.data) - 1)
+
+        res = self.finish(upload_id, sha256='0' * 64)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(default_storage.exists(upload.name))
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    def test_not_an_image(self):
+        """test finalizing bytes that are no image fails"""
+        self.data = b'plain text, not a png'
+        upload_id = self.start()
+        self.put(upload_id, 0, len(self.data) - 1)
+
+        res = self.finish(upload_id)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.scheduled, 0)
+
+    def test_bad_ranges(self):
+        """test malformed, mismatched and oversized chunks are rejected"""
+        upload_id = self.start()
+
+        res = self.client.generic('PUT', chunk_url(self.recipe.id, upload_id), b'x',
+                                  content_type='application/octet-stream')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.put(upload_id, 0, 9, body=b'short').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.put(upload_id, 0, 9, total=10).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        with override_settings(RECIPE_IMAGE_UPLOADS={'MAX_CHUNK_SIZE': 5}):
+            self.assertEqual(self.put(upload_id, 0, 9).status_code,
+                             status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    @override_settings(RECIPE_IMAGE_LIMITS={'MAX_BYTES': 10})
+    def test_start_validation(self):
+        """test the size limit and image extensions on start"""
+        res = self.client.post(start_url(self.recipe.id), {'filename': 'a.png', 'size': 11})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(start_url(self.recipe.id), {'filename': 'a.exe', 'size': 5})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_other_users_upload(self):
+        """test uploads of other users are not found"""
+        upload_id = self.start()
+        other = get_user_model().objects.create_user('other@oxd.com', 'pass12345')
+        self.client.force_authenticate(other)
+
+        res = self.client.get(chunk_url(self.recipe.id, upload_id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        res = self.client.get(chunk_url(self.recipe.id, 'not-a-uuid'))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,221 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from core.versions import bump_data_version, cache_is_shared, get_data_version
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+BULK_URL = reverse('recipe:recipe-bulk')
+
+
+def detail_url(recipe_id):
+    """return recipe detail url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def sample_recipe(user, **kwargs):
+    """create and return a sample recipe"""
+    defaults = {
+        'title': 'Sample Recipe',
+        'time_minutes': 10,
+        'price': 5.00,
+    }
+    defaults.update(kwargs)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class DataVersionTests(TestCase):
+    """Test the per-user data version"""
+
+    def test_bump_changes_version(self):
+        """test bumping gives a new version for that user only"""
+        before = get_data_version(1), get_data_version(2)
+
+        bump_data_version(1)
+
+        self.assertNotEqual(get_data_version(1), before[0])
+        self.assertEqual(get_data_version(2), before[1])
+
+    def test_evicted_version_does_not_repeat(self):
+        """test a version restarted after eviction differs from the old one"""
+        old = get_data_version(3)
+        cache.delete('data-version:3')
+
+        self.assertNotEqual(get_data_version(3), old)
+
+    def test_cache_is_shared(self):
+        """test process-local backends are not shared unless configured"""
+        with override_settings(CACHE_IS_SHARED=None):
+            self.assertFalse(cache_is_shared())
+        with override_settings(CACHE_IS_SHARED=True):
+            self.assertTrue(cache_is_shared())
+        with override_settings(CACHE_IS_SHARED=None, CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': '/tmp/recipe-test-cache',
+        }}):
+            self.assertTrue(cache_is_shared())
+
+
+@override_settings(CACHE_IS_SHARED=True)
+class ConditionalListTests(TestCase):
+    """Test ETags and If-None-Match on list endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'diego@oxd.com',
+            'MyPassword123'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+
+    def get_etag(self, url, params=None):
+        res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res['ETag']
+
+    def test_not_modified_without_queries(self):
+        """test a matching If-None-Match is a 304 that reads no data"""
+        etag = self.get_etag(RECIPE_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+        self.assertEqual(res.content, b'')
+
+    def test_etag_depends_on_query(self):
+        """test different query parameters have different ETags"""
+        self.assertNotEqual(
+            self.get_etag(TAGS_URL),
+            self.get_etag(TAGS_URL, {'assigned_only': 1})
+        )
+
+    def test_writes_change_etag(self):
+        """test creates, relation changes and bulk writes change the ETag"""
+        etag = self.get_etag(RECIPE_URL)
+        recipe = sample_recipe(self.user)
+        self.assertNotEqual(self.get_etag(RECIPE_URL), etag)
+
+        etag = self.get_etag(TAGS_URL)
+        recipe.tags.add(self.tag)
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        etag = self.get_etag(RECIPE_URL)
+        res = self.client.post(BULK_URL, [{
+            'title': 'Soup', 'time_minutes': 5, 'price': '2.00',
+            'tags': [self.tag.id], 'ingredients': [],
+        }], format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_other_users_writes_keep_etag(self):
+        """test writes by another user do not invalidate the ETag"""
+        etag = self.get_etag(TAGS_URL)
+        other = get_user_model().objects.create_user('other@oxd.com', 'pass12345')
+        Tag.objects.create(user=other, name='Theirs')
+
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    @override_settings(CACHE_IS_SHARED=False)
+    def test_off_with_process_local_cache(self):
+        """test lists have no ETag when the versions are not shared"""
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH='*')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('ETag', res)
+
+
+class ConditionalDetailTests(TestCase):
+    """Test per-recipe ETags, If-None-Match and If-Match"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'diego@oxd.com',
+            'MyPassword123'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(self.user, title='Curry')
+        self.url = detail_url(self.recipe.id)
+
+    def test_not_modified(self):
+        """test a matching If-None-Match is a 304 from one version lookup"""
+        etag = self.client.get(self.url)['ETag']
+
+        with self.assertNumQueries(1):
+            res = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_etag_changes_with_related_names(self):
+        """test renaming a tag of the recipe changes its ETag"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe.tags.add(tag)
+        etag = self.client.get(self.url)['ETag']
+
+        tag.name = 'Plant based'
+        tag.save()
+
+        res = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'][0]['name'], 'Plant based')
+
+    def test_stale_copies_get_new_etags(self):
+        """test saving two copies of a recipe in turn gives two ETags"""
+        first = Recipe.objects.get(pk=self.recipe.pk)
+        second = Recipe.objects.get(pk=self.recipe.pk)
+
+        first.title = 'Thai Curry'
+        first.save()
+        etag = self.client.get(self.url)['ETag']
+        second.title = 'Green Curry'
+        second.save()
+
+        res = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertEqual(res.data['title'], 'Green Curry')
+
+    def test_if_match_current(self):
+        """test an update with the current ETag succeeds and returns the new one"""
+        etag = self.client.get(self.url)['ETag']
+
+        res = self.client.patch(self.url, {'title': 'Thai Curry'}, HTTP_IF_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.title, 'Thai Curry')
+
+    def test_if_match_stale(self):
+        """test an update or delete with an outdated ETag is rejected"""
+        etag = self.client.get(self.url)['ETag']
+        self.client.patch(self.url, {'title': 'Thai Curry'})
+
+        res = self.client.patch(self.url, {'title': 'Lost update'}, HTTP_IF_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+        res = self.client.delete(self.url, HTTP_IF_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.title, 'Thai Curry')
+
+    def test_if_match_missing_recipe(self):
+        """test If-Match on a missing recipe is still a 404"""
+        res = self.client.delete(detail_url(999999), HTTP_IF_MATCH='"x"')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
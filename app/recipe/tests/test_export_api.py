@@ -0,0 +1,125 @@
+import csv
+import io
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+def sample_recipe(user, **kwargs):
+    """create and return a sample recipe"""
+    defaults = {
+        'title': 'Sample Recipe',
+        'time_minutes': 10,
+        'price': 5.00,
+    }
+    defaults.update(kwargs)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class RecipeExportAPITests(TestCase):
+    """Test streaming recipe exports"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'diego@oxd.com',
+            'MyPassword123'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = Ingredient.objects.create(user=self.user, name='Kale, raw')
+
+    def content(self, res):
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        return b''.join(res.streaming_content).decode()
+
+    def test_export_requires_auth(self):
+        """test exporting needs authentication"""
+        res = APIClient().get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_export_ndjson(self):
+        """test the default export is one JSON recipe per line with names"""
+        recipe = sample_recipe(self.user, title='Curry', price='7.50')
+        recipe.tags.add(self.tag)
+        recipe.ingredients.add(self.ingredient)
+        sample_recipe(self.user, title='Soup')
+        other = get_user_model().objects.create_user('other@oxd.com', 'pass12345')
+        sample_recipe(other, title='Theirs')
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in self.content(res).splitlines()]
+        self.assertEqual([line['title'] for line in lines], ['Soup', 'Curry'])
+        self.assertEqual(lines[1], {
+            'id': recipe.id,
+            'title': 'Curry',
+            'time_minutes': 10,
+            'price': '7.50',
+            'link': '',
+            'tags': ['Vegan'],
+            'ingredients': ['Kale, raw'],
+        })
+
+    def test_export_csv(self):
+        """test ?format=csv streams a header and one row per recipe"""
+        recipe = sample_recipe(self.user, title='Curry')
+        recipe.tags.add(self.tag, Tag.objects.create(user=self.user, name='Spicy'))
+        recipe.ingredients.add(self.ingredient)
+
+        res = self.client.get(EXPORT_URL, {'format': 'csv'})
+
+        self.assertTrue(res['Content-Type'].startswith('text/csv'))
+        self.assertIn('recipes.csv', res['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(self.content(res))))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['title'], 'Curry')
+        self.assertEqual(sorted(rows[0]['tags'].split('|')), ['Spicy', 'Vegan'])
+        self.assertEqual(rows[0]['ingredients'], 'Kale, raw')
+
+    def test_export_csv_empty(self):
+        """test an empty account exports only the header"""
+        res = self.client.get(EXPORT_URL, {'format': 'csv'})
+
+        self.assertEqual(
+            self.content(res).strip(),
+            'id,title,time_minutes,price,link,tags,ingredients'
+        )
+
+    def test_export_applies_filters(self):
+        """test list filters narrow the export"""
+        recipe = sample_recipe(self.user, title='Curry')
+        recipe.tags.add(self.tag)
+        sample_recipe(self.user, title='Soup')
+
+        res = self.client.get(EXPORT_URL, {'tags': str(self.tag.id)})
+
+        lines = self.content(res).splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [recipe.id])
+
+    @override_settings(RECIPE_EXPORT_CHUNK_SIZE=2)
+    def test_export_loads_names_per_chunk(self):
+        """test names are loaded with one query per relation and chunk"""
+        for i in range(5):
+            sample_recipe(self.user, title=f'Recipe {i}').tags.add(self.tag)
+
+        res = self.client.get(EXPORT_URL)
+        # the cursor is declared once, then each of the 3 chunks loads its
+        # tag names (no recipe has ingredients, so that lookup is skipped)
+        with self.assertNumQueries(4):
+            content = self.content(res)
+
+        self.assertEqual(len(content.splitlines()), 5)
@@ -0,0 +1,100 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
+from django.test import TestCase
+
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.fastpath import FastListSerializer
+from recipe.serializers import (
+    IngredientSerializer,
+    RecipeDetailSerializer,
+    RecipeSerializer,
+    TagSerializer,
+)
+
+
+class PlainRecipeSerializer(serializers.ModelSerializer):
+    """recipe serializer reading relations through the M2M tables"""
+    tags = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+
+    class Meta:
+        model = Recipe
+        fields = ('id', 'title', 'tags')
+
+
+class FastListSerializerTests(TestCase):
+    """Test the fast list path renders exactly like DRF"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'diego@oxd.com',
+            'MyPassword123'
+        )
+        self.tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('Vegan', 'Dessert', 'Ünicode ☕')
+        ]
+        ingredient = Ingredient.objects.create(user=self.user, name='Kale')
+
+        for i, price in enumerate(['5.00', '0.50', '999.99', '12.3']):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe "{i}"',
+                time_minutes=i * 15,
+                price=price,
+                link='' if i % 2 else f'https://example.com/{i}',
+            )
+            recipe.tags.add(*self.tags[:i])
+            if i % 2:
+                recipe.ingredients.add(ingredient)
+
+    def assert_same_bytes(self, serializer_class, queryset, **kwargs):
+        expected = serializer_class(queryset, many=True, **kwargs).data
+
+        engine = FastListSerializer(serializer_class, **kwargs)
+        with self.assertNumQueries(1 + len(engine.relations)):
+            actual = engine.render(engine.rows(queryset))
+
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(actual), renderer.render(expected))
+
+    def test_recipe_list(self):
+        """test recipes render identically, including decimals and relation ids"""
+        self.assert_same_bytes(RecipeSerializer, Recipe.objects.order_by('-id'))
+
+    def test_recipe_list_sparse(self):
+        """test a field subset renders identically"""
+        self.assert_same_bytes(
+            RecipeSerializer, Recipe.objects.order_by('price', 'id'),
+            fields=['title', 'price']
+        )
+
+    def test_tag_and_ingredient_lists(self):
+        """test tag and ingredient lists render identically"""
+        self.assert_same_bytes(TagSerializer, Tag.objects.order_by('-name', '-id'))
+        self.assert_same_bytes(IngredientSerializer, Ingredient.objects.order_by('id'))
+
+    def test_relation_map(self):
+        """test M2M ids are grouped from the through table in one query"""
+        self.assert_same_bytes(
+            PlainRecipeSerializer,
+            # DRF reads the relation in the order of the related query
+            Recipe.objects.order_by('id').prefetch_related(
+                Prefetch('tags', queryset=Tag.objects.order_by('id'))
+            )
+        )
+
+    def test_nested_serializer_unsupported(self):
+        """test serializers with nested fields fall back to DRF"""
+        self.assertIsNone(FastListSerializer.for_serializer(RecipeDetailSerializer))
+
+    def test_engines_compiled_once(self):
+        """test engines are cached per serializer class and field set"""
+        engine = FastListSerializer.for_serializer(RecipeSerializer, fields=['title'])
+
+        self.assertIs(
+            FastListSerializer.for_serializer(RecipeSerializer, fields=['title']), engine
+        )
+        self.assertIsNot(FastListSerializer.for_serializer(RecipeSerializer), engine)
@@ -0,0 +1,157 @@
+import io
+import struct
+import tempfile
+import zlib
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image, ImageFile
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from recipe import validators
+
+
+def image_bytes(size=(10, 10), image_format='PNG'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'orange').save(buffer, image_format)
+    return buffer.getvalue()
+
+
+def png_claiming(width, height):
+    """a small PNG whose header claims width x height pixels"""
+    data = bytearray(image_bytes())
+    # the IHDR chunk follows the 8 byte signature: length, type, data, crc
+    data[16:24] = struct.pack('>II', width, height)
+    data[29:33] = struct.pack('>I', zlib.crc32(bytes(data[12:29])))
+    return bytes(data)
+
+
+def upload(data, name='image.png'):
+    return ContentFile(data, name=name)
+
+
+def image_upload_url(recipe_id):
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+class CheckImageTests(TestCase):
+    """Test the header-only checks of uploaded images"""
+
+    def assertRejected(self, data, reason):
+        counter = validators.rejected[reason]
+        before = counter.value()
+        with self.assertRaises(ValidationError) as cm:
+            validators.check_image(upload(data))
+        self.assertEqual(cm.exception.get_codes(), [f'image_{reason}'])
+        self.assertEqual(counter.value(), before + 1)
+
+    def test_accepts_image_without_decoding(self):
+        """test a valid image passes and its pixels are not loaded"""
+        before = validators.accepted.value()
+        file = upload(image_bytes((30, 20), 'JPEG'))
+        with patch.object(ImageFile.ImageFile, 'load', side_effect=AssertionError):
+            result = validators.check_image(file)
+
+        self.assertEqual(result, ('JPEG', (30, 20)))
+        self.assertEqual(file.tell(), 0)
+        self.assertEqual(validators.accepted.value(), before + 1)
+
+    def test_sniff_format(self):
+        """test formats are told apart by their first bytes"""
+        for image_format in ('JPEG', 'PNG', 'GIF', 'WEBP', 'BMP', 'TIFF'):
+            self.assertEqual(
+                validators.sniff_format(image_bytes(image_format=image_format)[:16]),
+                image_format,
+            )
+        self.assertIsNone(validators.sniff_format(b'%PDF-1.7'))
+
+    def test_rejects_decompression_bomb(self):
+        """test a header claiming too many pixels is rejected"""
+        self.assertRejected(png_claiming(100000, 100000), 'pixels')
+
+    @override_settings(RECIPE_IMAGE_LIMITS={'MAX_PIXELS': 99})
+    def test_rejects_too_many_pixels(self):
+        """test the configured pixel limit"""
+        self.assertRejected(image_bytes((10, 10)), 'pixels')
+
+    @override_settings(RECIPE_IMAGE_LIMITS={'MAX_BYTES': 10})
+    def test_rejects_too_many_bytes(self):
+        """test the configured byte size limit"""
+        self.assertRejected(image_bytes(), 'size')
+
+    def test_rejects_other_formats(self):
+        """test files that are no image of an allowed format are rejected"""
+        self.assertRejected(b'notimage', 'format')
+        self.assertRejected(image_bytes(image_format='BMP'), 'format')
+
+        with override_settings(RECIPE_IMAGE_LIMITS={'FORMATS': ['BMP']}):
+            validators.check_image(upload(image_bytes(image_format='BMP')))
+            self.assertRejected(image_bytes(), 'format')
+
+    def test_rejects_broken_header(self):
+        """test a file with an image signature but a broken header"""
+        self.assertRejected(b'\x89PNG\r\n\x1a\n' + b'\0' * 32, 'unreadable')
+
+
+class ImageValidationApiTests(TestCase):
+    """Test the image checks of the upload endpoint"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user('diego@oxd.com', 'pass12345')
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Curry', time_minutes=10, price=5
+        )
+
+    def post(self, data, name='image.png'):
+        return self.client.post(
+            image_upload_url(self.recipe.id),
+            {'image': SimpleUploadedFile(name, data)}, format='multipart',
+        )
+
+    def test_bomb_rejected(self):
+        """test an image claiming huge dimensions is not stored"""
+        res = self.post(png_claiming(100000, 100000))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', res.data)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    def test_extension_still_checked(self):
+        """test a valid image under a non-image file name is rejected"""
+        res = self.post(image_bytes(), name='image.exe')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(RECIPE_IMAGE_LIMITS={'MAX_BYTES': 10})
+    def test_large_body_rejected_before_parsing(self):
+        """test a body too large for any allowed image gets a 413"""
+        before = validators.rejected['size'].value()
+        res = self.post(b'\0' * (validators.FORM_OVERHEAD + 100))
+
+        self.assertEqual(res.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertEqual(validators.rejected['size'].value(), before + 1)
+
+    def test_malformed_content_length(self):
+        """test a malformed Content-Length is treated as unknown"""
+        res = self.client.post(
+            image_upload_url(self.recipe.id), b'', content_type='image/png',
+            CONTENT_LENGTH='abc',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
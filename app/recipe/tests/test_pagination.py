@@ -0,0 +1,121 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Recipe
+from core.signals import refresh_recipes
+from recipe.pagination import KeysetPagination
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def sample_recipes(user, count):
+    """bulk create and return recipes for user"""
+    return Recipe.objects.bulk_create([
+        Recipe(user=user, title=f'Recipe {i}', time_minutes=10, price=5.00)
+        for i in range(count)
+    ])
+
+
+class KeysetPaginationTests(TestCase):
+    """Test cursor pagination of the recipe and tag lists"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'diego@oxd.com',
+            'MyPassword123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url, params):
+        """follow next links and return every page"""
+        pages = []
+        res = self.client.get(url, params)
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            pages.append(res.data)
+            if not res.data['next']:
+                return pages
+            res = self.client.get(res.data['next'])
+
+    def test_recipes_paginated_newest_first(self):
+        """test walking recipe pages returns every recipe exactly once"""
+        recipes = sample_recipes(self.user, 7)
+
+        pages = self.walk(RECIPE_URL, {'page_size': 3})
+
+        self.assertEqual([len(p['results']) for p in pages], [3, 3, 1])
+        ids = [r['id'] for p in pages for r in p['results']]
+        self.assertEqual(ids, sorted((r.id for r in recipes), reverse=True))
+        self.assertIsNone(pages[0]['previous'])
+        self.assertNotIn('count', pages[0])
+
+    def test_search_pages_with_tied_ranks(self):
+        """test every equally ranked search match is served exactly once"""
+        recipes = sample_recipes(self.user, 10)
+        refresh_recipes([recipe.id for recipe in recipes])
+
+        pages = self.walk(RECIPE_URL, {'search': 'recipe', 'page_size': 2})
+
+        ids = [item['id'] for page in pages for item in page['results']]
+        self.assertEqual(sorted(ids), sorted(recipe.id for recipe in recipes))
+        self.assertEqual(len(pages), 5)
+
+    def test_previous_link(self):
+        """test the previous link returns the preceding page"""
+        sample_recipes(self.user, 5)
+
+        first = self.client.get(RECIPE_URL, {'page_size': 2}).data
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+
+        self.assertEqual(back['results'], first['results'])
+        self.assertIsNone(back['previous'])
+
+    def test_tags_paginated_by_name(self):
+        """test tag pages follow the -name ordering with id tie breaks"""
+        for name in ['Vegan', 'Dessert', 'Vegan', 'Curry', 'Breakfast']:
+            Tag.objects.create(user=self.user, name=name)
+
+        pages = self.walk(TAGS_URL, {'page_size': 2})
+
+        tags = Tag.objects.filter(user=self.user).order_by('-name', '-id')
+        ids = [t['id'] for p in pages for t in p['results']]
+        self.assertEqual(ids, [t.id for t in tags])
+
+    def test_page_size_capped(self):
+        """test page_size cannot exceed the configured maximum"""
+        sample_recipes(self.user, 5)
+
+        with patch.object(KeysetPagination, 'max_page_size', 2):
+            res = self.client.get(RECIPE_URL, {'page_size': 1000})
+
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_invalid_cursor(self):
+        """test a tampered cursor returns 404"""
+        res = self.client.get(RECIPE_URL, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_no_offset_or_count(self):
+        """test later pages use a keyset predicate instead of OFFSET"""
+        sample_recipes(self.user, 5)
+        first = self.client.get(RECIPE_URL, {'page_size': 2}).data
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(first['next'])
+
+        sql = ' '.join(q['sql'].upper() for q in ctx.captured_queries)
+        self.assertNotIn('OFFSET', sql)
+        self.assertNotIn('COUNT(', sql)
@@ -0,0 +1,103 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.pagination import KeysetPagination
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+# the list reads relation ids from the recipe row itself, the detail view
+# prefetches tags and ingredients with one query each
+LIST_QUERIES = 1
+DETAIL_QUERIES = 3
+
+
+def detail_url(recipe_id):
+    """return recipe detail url"""
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class RecipeQueryBudgetTests(TestCase):
+    """Guard the number of queries used to serialize recipes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'diego@oxd.com',
+            'MyPassword123'
+        )
+        self.client.force_authenticate(self.user)
+        self.tags = Tag.objects.bulk_create([
+            Tag(user=self.user, name='Vegan'),
+            Tag(user=self.user, name='Dessert'),
+        ])
+        self.ingredients = Ingredient.objects.bulk_create([
+            Ingredient(user=self.user, name='Salt'),
+            Ingredient(user=self.user, name='Kale'),
+        ])
+
+    def create_recipes(self, count):
+        """bulk create count recipes, each with every tag and ingredient"""
+        recipes = Recipe.objects.bulk_create([
+            Recipe(user=self.user, title=f'Recipe {i}', time_minutes=10, price=5)
+            for i in range(count)
+        ])
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+            for recipe in recipes for tag in self.tags
+        ])
+        Recipe.ingredients.through.objects.bulk_create([
+            Recipe.ingredients.through(recipe_id=recipe.id, ingredient_id=ing.id)
+            for recipe in recipes for ing in self.ingredients
+        ])
+        Recipe.objects.filter(id__in=[r.id for r in recipes]).update_derived_fields()
+        return recipes
+
+    def assert_list_budget(self, count, params=None):
+        self.create_recipes(count)
+        params = dict(params or {}, page_size=count)
+
+        with patch.object(KeysetPagination, 'max_page_size', count):
+            with self.assertNumQueries(LIST_QUERIES):
+                res = self.client.get(RECIPE_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), count)
+        self.assertEqual(len(res.data['results'][0]['tags']), 2)
+        self.assertEqual(len(res.data['results'][0]['ingredients']), 2)
+
+    def test_list_1_recipe(self):
+        """test listing one recipe stays within the query budget"""
+        self.assert_list_budget(1)
+
+    def test_list_100_recipes(self):
+        """test listing 100 recipes stays within the query budget"""
+        self.assert_list_budget(100)
+
+    def test_list_10000_recipes(self):
+        """test listing 10,000 recipes stays within the query budget"""
+        self.assert_list_budget(10000)
+
+    def test_filtered_list(self):
+        """test filtering by ingredient keeps the query budget"""
+        self.assert_list_budget(
+            100, {'ingredients': str(self.ingredients[0].id)}
+        )
+
+    def test_detail(self):
+        """test the nested detail view stays within the query budget"""
+        recipe = self.create_recipes(1)[0]
+
+        with self.assertNumQueries(DETAIL_QUERIES):
+            res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['tags']), 2)
+        self.assertEqual(len(res.data['ingredients']), 2)
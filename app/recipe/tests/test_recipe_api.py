@@ -4,11 +4,13 @@ import os
 from PIL import Image
 
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
-from rest_framework.test import APIClient
+from rest_framework.test import APIClient, APIRequestFactory
 from core.models import Recipe, Ingredient, Tag
 
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
@@ -71,11 +73,11 @@ class PrivateRecipeAPITests(TestCase):
         sample_recipe(self.user)
 
         res = self.client.get(RECIPE_URL)
-        recipes = Recipe.objects.all()
+        recipes = Recipe.objects.all().order_by('-id')
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
     
 
     def test_recipes_limited_to_user(self):
@@ -90,8 +92,8 @@ class PrivateRecipeAPITests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'], serializer.data)
     
     def test_view_recipe_detail(self):
         """test viewing a recipe detail"""
@@ -133,7 +135,7 @@ class PrivateRecipeAPITests(TestCase):
 
         payload = {
             'title': 'Avocado Lime Cheesecake',
-            'tags': [tag1.id, tag2,id],
+            'tags': [tag1.id, tag2.id],
             'time_minutes': 60,
             'price': 20.00
         }
@@ -170,6 +172,213 @@ class PrivateRecipeAPITests(TestCase):
         self.assertIn(ingredient1, ingredients)
         self.assertIn(ingredient2, ingredients)
     
+    def test_create_recipe_ingredients_single_lookup(self):
+        """Test submitted ingredient ids are resolved in one query"""
+        ingredients = Ingredient.objects.bulk_create([
+            Ingredient(user = self.user, name = f'Ingredient {i}')
+            for i in range(40)
+        ])
+        request = APIRequestFactory().post(RECIPE_URL)
+        request.user = self.user
+        serializer = RecipeSerializer(
+            data = {
+                'title': 'Minestrone',
+                'ingredients': [i.id for i in ingredients],
+                'tags': [],
+                'time_minutes': 45,
+                'price': 8.00,
+            },
+            context = {'request': request},
+        )
+
+        with self.assertNumQueries(1):
+            self.assertTrue(serializer.is_valid())
+
+        self.assertEqual(len(serializer.validated_data['ingredients']), 40)
+
+    def test_create_recipe_foreign_ids_rejected(self):
+        """Test ids owned by another user or missing are all reported"""
+        user2 = get_user_model().objects.create_user('other@oxd.com', 'MyPassword123')
+        own = sample_tag(user = self.user)
+        foreign = sample_tag(user = user2, name = 'Foreign')
+
+        payload = {
+            'title': 'Pad Thai',
+            'tags': [own.id, foreign.id, 999999],
+            'time_minutes': 20,
+            'price': 9.00,
+        }
+        res = self.client.post(RECIPE_URL, payload, format = 'json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(str(foreign.id), str(res.data['tags']))
+        self.assertIn('999999', str(res.data['tags']))
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_filter_recipe_any_tags_unique(self):
+        """Test a recipe matching several tags is returned once"""
+        recipe = sample_recipe(user = self.user)
+        tag1 = sample_tag(user = self.user, name = 'Vegan')
+        tag2 = sample_tag(user = self.user, name = 'Dessert')
+        recipe.tags.add(tag1, tag2)
+
+        res = self.client.get(RECIPE_URL, {'tags': f"{tag1.id},{tag2.id}"})
+
+        self.assertEqual([r['id'] for r in res.data['results']], [recipe.id])
+
+    def test_filter_recipe_all_tags(self):
+        """Test match=all only returns recipes having every tag"""
+        both = sample_recipe(user = self.user, title = 'Vegan Brownies')
+        one = sample_recipe(user = self.user, title = 'Vegan Curry')
+        tag1 = sample_tag(user = self.user, name = 'Vegan')
+        tag2 = sample_tag(user = self.user, name = 'Dessert')
+        both.tags.add(tag1, tag2)
+        one.tags.add(tag1)
+
+        res = self.client.get(
+            RECIPE_URL,
+            {'tags': f"{tag1.id},{tag2.id}", 'match': 'all'}
+        )
+
+        self.assertEqual([r['id'] for r in res.data['results']], [both.id])
+
+    def test_filter_recipe_invalid_match(self):
+        """Test an unknown match mode is rejected"""
+        res = self.client.get(RECIPE_URL, {'tags': '1', 'match': 'some'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_recipes_ranked(self):
+        """Test search matches titles and tag names, best match first"""
+        tagged = sample_recipe(user = self.user, title = 'Green Curry')
+        tagged.tags.add(sample_tag(user = self.user, name = 'Curry'))
+        title_only = sample_recipe(user = self.user, title = 'Red Curry Paste')
+        sample_recipe(user = self.user, title = 'Fish and Chips')
+
+        res = self.client.get(RECIPE_URL, {'search': 'curries'})
+
+        ids = [r['id'] for r in res.data['results']]
+        self.assertEqual(ids, [tagged.id, title_only.id])
+
+    def test_search_follows_relation_changes(self):
+        """Test the search index picks up new and renamed ingredients"""
+        recipe = sample_recipe(user = self.user, title = 'Salad')
+        ingredient = sample_ingredient(user = self.user, name = 'Kale')
+        recipe.ingredients.add(ingredient)
+
+        res = self.client.get(RECIPE_URL, {'search': 'kale'})
+        self.assertEqual([r['id'] for r in res.data['results']], [recipe.id])
+
+        ingredient.name = 'Spinach'
+        ingredient.save()
+
+        res = self.client.get(RECIPE_URL, {'search': 'kale'})
+        self.assertEqual(res.data['results'], [])
+        res = self.client.get(RECIPE_URL, {'search': 'spinach'})
+        self.assertEqual([r['id'] for r in res.data['results']], [recipe.id])
+
+    def test_search_paginated(self):
+        """Test search results can be paged through by rank"""
+        recipes = [
+            sample_recipe(user = self.user, title = 'Soup ' * (i + 1))
+            for i in range(5)
+        ]
+
+        ids = []
+        res = self.client.get(RECIPE_URL, {'search': 'soup', 'page_size': 2})
+        while True:
+            ids.extend(r['id'] for r in res.data['results'])
+            if not res.data['next']:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(sorted(ids), sorted(r.id for r in recipes))
+
+    def test_filter_recipe_ranges(self):
+        """Test min/max time and price filters"""
+        quick_cheap = sample_recipe(user = self.user, time_minutes = 15, price = 8.00)
+        sample_recipe(user = self.user, time_minutes = 45, price = 8.00)
+        sample_recipe(user = self.user, time_minutes = 15, price = 12.50)
+
+        res = self.client.get(
+            RECIPE_URL,
+            {'max_time_minutes': 30, 'max_price': '10.00', 'min_price': '1'}
+        )
+
+        self.assertEqual([r['id'] for r in res.data['results']], [quick_cheap.id])
+
+    def test_filter_recipe_invalid_range(self):
+        """Test a malformed range bound is rejected"""
+        res = self.client.get(RECIPE_URL, {'max_price': 'cheap'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_order_recipes_by_price_paginated(self):
+        """Test ordering by price pages through ties in a stable order"""
+        prices = [7, 3, 5, 3, 9, 5]
+        recipes = [sample_recipe(user = self.user, price = p) for p in prices]
+
+        ids = []
+        res = self.client.get(RECIPE_URL, {'ordering': 'price', 'page_size': 4})
+        while True:
+            ids.extend(r['id'] for r in res.data['results'])
+            if not res.data['next']:
+                break
+            res = self.client.get(res.data['next'])
+
+        expected = sorted(recipes, key = lambda r: (r.price, r.id))
+        self.assertEqual(ids, [r.id for r in expected])
+
+    def test_order_recipes_by_time_descending(self):
+        """Test ordering by -time_minutes"""
+        slow = sample_recipe(user = self.user, time_minutes = 90)
+        quick = sample_recipe(user = self.user, time_minutes = 5)
+
+        res = self.client.get(RECIPE_URL, {'ordering': '-time_minutes'})
+
+        self.assertEqual([r['id'] for r in res.data['results']], [slow.id, quick.id])
+
+    def test_list_sparse_fields(self):
+        """Test fields= trims the output and the selected columns"""
+        recipe = sample_recipe(user = self.user, title = 'Ramen')
+        recipe.tags.add(sample_tag(user = self.user))
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(RECIPE_URL, {'fields': 'id,title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [{'id': recipe.id, 'title': 'Ramen'}])
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertNotIn('tag_ids', ctx.captured_queries[0]['sql'])
+        self.assertNotIn('"link"', ctx.captured_queries[0]['sql'])
+
+    def test_list_exclude_fields(self):
+        """Test exclude= drops fields from the output"""
+        sample_recipe(user = self.user)
+
+        res = self.client.get(RECIPE_URL, {'exclude': 'tags,ingredients,link'})
+
+        self.assertEqual(
+            set(res.data['results'][0]),
+            {'id', 'title', 'time_minutes', 'price'}
+        )
+
+    def test_detail_sparse_fields_skip_relations(self):
+        """Test the detail view runs no M2M query when relations are not requested"""
+        recipe = sample_recipe(user = self.user)
+        recipe.tags.add(sample_tag(user = self.user))
+
+        with self.assertNumQueries(1):
+            res = self.client.get(detail_url(recipe.id), {'fields': 'id,title'})
+
+        self.assertEqual(res.data, {'id': recipe.id, 'title': recipe.title})
+
+    def test_sparse_fields_unknown(self):
+        """Test unknown field names are rejected"""
+        res = self.client.get(RECIPE_URL, {'fields': 'id,secret'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_partial_recipe_update(self):
         """Test updating a recipe with patch"""
         recipe = sample_recipe(user = self.user)
@@ -227,7 +436,7 @@ class RecipeImageUploadTests(TestCase):
         )
 
         self.client.force_authenticate(self.user)
-        self.recipe = sample_tag(user = self.user)
+        self.recipe = sample_recipe(user = self.user)
     
     def tearDown(self):
         """removing all test files that we created"""
@@ -281,9 +490,9 @@ class RecipeImageUploadTests(TestCase):
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
 
     def test_filter_recipe_by_ingredients(self):
         """Test returning recipe with specific ingredients"""
@@ -307,9 +516,9 @@ class RecipeImageUploadTests(TestCase):
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
         
 
 
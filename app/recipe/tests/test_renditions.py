@@ -0,0 +1,178 @@
+import io
+import os
+import posixpath
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image, ImageOps
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.storage import image_storage
+from recipe import renditions
+
+
+def jpeg(size, orientation=None):
+    """return the bytes of a JPEG of size, optionally with an EXIF orientation"""
+    buffer = io.BytesIO()
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    Image.new('RGB', size, 'orange').save(buffer, 'JPEG', exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+class RenditionTests(TestCase):
+    """Test generating recipe image renditions"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+        self.user = get_user_model().objects.create_user('diego@oxd.com', 'pass12345')
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Paella', time_minutes=40, price=12
+        )
+
+    def save_image(self, content):
+        name = default_storage.save('uploads/recipe/photo.jpg', ContentFile(content))
+        Recipe.objects.filter(pk=self.recipe.pk).update(image=name)
+        return name
+
+    def sizes(self, name):
+        return {
+            int(width): Image.open(default_storage.path(formats['webp'])).size
+            for width, formats in renditions.rendition_names(name).items()
+        }
+
+    def test_renders_every_width_and_format(self):
+        """test every configured width is written in every format"""
+        name = self.save_image(jpeg((2000, 1000)))
+
+        self.assertTrue(renditions.generate(self.recipe.id, name))
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(set(self.recipe.image_renditions), {'320', '640', '1280'})
+        for formats in self.recipe.image_renditions.values():
+            self.assertEqual(set(formats), {'webp', 'jpeg'})
+            for rendition in formats.values():
+                self.assertTrue(default_storage.exists(rendition))
+        self.assertEqual(
+            self.sizes(name), {320: (320, 160), 640: (640, 320), 1280: (1280, 640)}
+        )
+
+    def test_decodes_reduced_jpeg(self):
+        """test large JPEGs are decoded at the smallest sufficient scale"""
+        name = self.save_image(jpeg((4000, 3000)))
+
+        with patch('recipe.renditions.ImageOps.exif_transpose',
+                   wraps=ImageOps.exif_transpose) as transpose:
+            renditions.render(name)
+
+        self.assertEqual(transpose.call_args[0][0].size, (2000, 1500))
+
+    def test_no_upscaling(self):
+        """test small images keep their size"""
+        name = self.save_image(jpeg((400, 200)))
+
+        renditions.render(name)
+
+        self.assertEqual(
+            self.sizes(name), {320: (320, 160), 640: (400, 200), 1280: (400, 200)}
+        )
+
+    def test_exif_orientation(self):
+        """test rotated photos come out upright"""
+        name = self.save_image(jpeg((1000, 500), orientation=6))
+
+        renditions.render(name)
+
+        self.assertEqual(self.sizes(name)[320], (320, 640))
+
+    def test_replaced_image_not_recorded(self):
+        """test a job for a replaced image leaves the new one alone"""
+        name = self.save_image(jpeg((100, 100)))
+        Recipe.objects.filter(pk=self.recipe.pk).update(image='uploads/recipe/new.jpg')
+
+        renditions.generate(self.recipe.id, name)
+
+        self.recipe.refresh_from_db()
+        self.assertIsNone(self.recipe.image_renditions)
+
+    def test_rerender_replaces_in_place(self):
+        """test forced renders swap files without deleting them first"""
+        name = self.save_image(jpeg((400, 200)))
+        renditions.render(name)
+
+        with patch.object(image_storage, 'delete', side_effect=AssertionError):
+            self.assertTrue(renditions.generate(self.recipe.id, name, force=True))
+
+        directory = posixpath.dirname(renditions.rendition_names(name)[320]['webp'])
+        self.assertFalse(
+            [f for f in os.listdir(default_storage.path(directory)) if f.endswith('.part')]
+        )
+
+    def test_full_save_keeps_renditions(self):
+        """test saving a stale copy of the recipe keeps recorded renditions"""
+        name = self.save_image(jpeg((100, 100)))
+        stale = Recipe.objects.get(pk=self.recipe.pk)
+        renditions.generate(self.recipe.id, name)
+
+        stale.title = 'Seafood Paella'
+        stale.save()
+
+        self.recipe.refresh_from_db()
+        self.assertIsNotNone(self.recipe.image_renditions)
+
+    def test_broken_image(self):
+        """test an unreadable image fails without raising"""
+        name = self.save_image(b'not an image')
+
+        with self.assertLogs('recipe.renditions', 'ERROR'):
+            self.assertFalse(renditions.generate(self.recipe.id, name))
+
+    def test_upload_schedules_renditions(self):
+        """test the upload returns pending rendition URLs and queues the job"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = reverse('recipe:recipe-upload-image', args=[self.recipe.id])
+
+        with patch('recipe.renditions.get_executor') as executor, \
+                self.captureOnCommitCallbacks(execute=True):
+            res = client.post(url, {
+                'image': ContentFile(jpeg((800, 600)), name='photo.jpg')
+            }, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['renditions']['status'], 'pending')
+        self.assertEqual(set(res.data['renditions']['widths']), {'320', '640', '1280'})
+        self.assertTrue(
+            res.data['renditions']['widths']['320']['webp'].startswith('http://testserver/media/')
+        )
+        self.recipe.refresh_from_db()
+        executor.return_value.submit.assert_called_once_with(
+            renditions._job, self.recipe.id, self.recipe.image.name
+        )
+
+    def test_command_fills_missing(self):
+        """test generate_renditions renders recipes without renditions"""
+        self.save_image(jpeg((100, 100)))
+        out = StringIO()
+
+        call_command('generate_renditions', stdout=out)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_renditions['320']['jpeg'],
+                         'renditions/recipe/photo/320.jpg')
+        self.assertIn('Rendered 1 images, 0 failed', out.getvalue())
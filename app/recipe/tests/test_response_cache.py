@@ -0,0 +1,155 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from recipe.views import response_cache_hits, response_cache_misses
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+METRICS_URL = reverse('core:metrics')
+
+
+def sample_recipe(user, **kwargs):
+    """create and return a sample recipe"""
+    defaults = {
+        'title': 'Sample Recipe',
+        'time_minutes': 10,
+        'price': 5.00,
+    }
+    defaults.update(kwargs)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+@override_settings(CACHE_IS_SHARED=True)
+class ResponseCacheTests(TestCase):
+    """Test the per-user versioned list response cache"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'diego@oxd.com',
+            'MyPassword123'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        self.tag2 = Tag.objects.create(user=self.user, name='Dessert')
+
+    def counts(self):
+        return response_cache_hits.value(), response_cache_misses.value()
+
+    def test_second_request_hits_cache(self):
+        """test a repeated list request is served without queries"""
+        sample_recipe(self.user, title='Curry')
+        first = self.client.get(RECIPE_URL)
+        hits, misses = self.counts()
+
+        with self.assertNumQueries(0):
+            second = self.client.get(RECIPE_URL)
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(self.counts(), (hits + 1, misses))
+
+    def test_writes_invalidate(self):
+        """test creating through the API or ORM refreshes cached lists"""
+        self.client.get(RECIPE_URL)
+        self.client.post(RECIPE_URL, {
+            'title': 'Soup', 'time_minutes': 5, 'price': '2.00',
+            'tags': [], 'ingredients': [],
+        })
+
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual([r['title'] for r in res.data['results']], ['Soup'])
+
+        self.client.get(TAGS_URL)
+        self.tag1.delete()
+        res = self.client.get(TAGS_URL)
+        self.assertEqual([t['name'] for t in res.data['results']], ['Dessert'])
+
+    def test_query_normalized(self):
+        """test reordered parameters and id lists share one entry"""
+        self.client.get(RECIPE_URL, {'tags': f'{self.tag1.id},{self.tag2.id}', 'match': 'all'})
+        hits, misses = self.counts()
+
+        self.client.get(f'{RECIPE_URL}?match=all&tags={self.tag2.id},{self.tag1.id}')
+
+        self.assertEqual(self.counts(), (hits + 1, misses))
+
+    def test_different_queries_and_users_separate(self):
+        """test other parameters and other users miss the cache"""
+        recipe = sample_recipe(self.user, title='Curry')
+        recipe.tags.add(self.tag1)
+        self.client.get(RECIPE_URL)
+
+        res = self.client.get(RECIPE_URL, {'tags': str(self.tag2.id)})
+        self.assertEqual(res.data['results'], [])
+
+        other = get_user_model().objects.create_user('other@oxd.com', 'pass12345')
+        self.client.force_authenticate(other)
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.data['results'], [])
+
+    def test_schemes_separate(self):
+        """test http and https clients do not share entries and their links"""
+        self.client.get(TAGS_URL)
+        hits, misses = self.counts()
+
+        self.client.get(TAGS_URL, secure=True)
+
+        self.assertEqual(self.counts(), (hits, misses + 1))
+
+    def test_errors_not_cached(self):
+        """test invalid requests are not stored"""
+        self.client.get(RECIPE_URL, {'match': 'some'})
+        hits, misses = self.counts()
+
+        res = self.client.get(RECIPE_URL, {'match': 'some'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.counts(), (hits, misses + 1))
+
+    @override_settings(CACHE_IS_SHARED=False)
+    def test_off_with_process_local_cache(self):
+        """test lists are not cached when the versions are not shared"""
+        sample_recipe(self.user, title='Curry')
+        counts = self.counts()
+        self.client.get(RECIPE_URL)
+        # like a write in another worker, this leaves the version alone
+        Recipe.objects.filter(user=self.user).update(title='Stew')
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual([r['title'] for r in res.data['results']], ['Stew'])
+        self.assertEqual(self.counts(), counts)
+
+
+class MetricsAPITests(TestCase):
+    """Test the staff metrics endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_staff_only(self):
+        """test regular users cannot read metrics"""
+        user = get_user_model().objects.create_user('diego@oxd.com', 'pass12345')
+        self.client.force_authenticate(user)
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_reports_cache_counters(self):
+        """test staff users see the response cache counters"""
+        admin = get_user_model().objects.create_superuser('admin@oxd.com', 'pass12345')
+        self.client.force_authenticate(admin)
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['response_cache.hit']['value'], response_cache_hits.value())
+        self.assertIn('response_cache.miss', res.data)
@@ -47,7 +47,7 @@ class PrivateTagsAPITests(TestCase):
         serializer = TagSerializer(tags, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_tags_limited_to_user(self):
         """test that tags returned are for the authenticated user"""
@@ -59,8 +59,8 @@ class PrivateTagsAPITests(TestCase):
         res = self.client.get(TAGS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], tag.name)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], tag.name)
 
     def create_tag_successfull(self):
         """test creating a new tag"""
@@ -97,8 +97,8 @@ class PrivateTagsAPITests(TestCase):
         serializer1 = TagSerializer(tag1)
         serializer2 =  TagSerializer(tag2)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertNotIn(serializer2.data, res.data['results'])
 
     def test_list_of_tags_unique(self):
         """Test filtering tags by assigned returns unique items"""
@@ -126,5 +126,47 @@ class PrivateTagsAPITests(TestCase):
 
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(res.data), 1)
-        
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_autocomplete_tags(self):
+        """Test q= returns prefix matches first, then fuzzy matches"""
+        Tag.objects.create(user=self.user, name='Vegetarian')
+        Tag.objects.create(user=self.user, name='Vegan')
+        Tag.objects.create(user=self.user, name='Dessert')
+
+        res = self.client.get(TAGS_URL, {'q': 'vega'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]['name'], 'Vegan')
+        self.assertNotIn('Dessert', [tag['name'] for tag in res.data])
+
+    def test_autocomplete_tags_fuzzy(self):
+        """Test q= tolerates typos through trigram similarity"""
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.get(TAGS_URL, {'q': 'vegn'})
+
+        self.assertEqual([tag['name'] for tag in res.data], ['Vegan'])
+
+    def test_autocomplete_tags_limit(self):
+        """Test the number of autocomplete results is limited"""
+        for i in range(5):
+            Tag.objects.create(user=self.user, name=f'Spicy {i}')
+        user2 = get_user_model().objects.create_user('other@oxd.com', 'MyPassword123')
+        Tag.objects.create(user=user2, name='Spicy')
+
+        res = self.client.get(TAGS_URL, {'q': 'spicy', 'limit': 3})
+
+        self.assertEqual(len(res.data), 3)
+        self.assertNotIn('Spicy', [tag['name'] for tag in res.data])
+
+    def test_tags_sparse_fields(self):
+        """Test fields= applies to the tag list and autocomplete"""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.get(TAGS_URL, {'fields': 'name'})
+        self.assertEqual(res.data['results'], [{'name': 'Vegan'}])
+
+        res = self.client.get(TAGS_URL, {'fields': 'id', 'q': 'veg'})
+        self.assertEqual(res.data, [{'id': tag.id}])
+
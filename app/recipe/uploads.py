@@ -0,0 +1,196 @@
+"""
+Storing recipe images, and resumable uploads of them.
+
+`store()` saves an uploaded file under its content address (core.storage)
+and `attach()` makes a stored name a recipe's image; core.signals keeps
+the StoredImage reference counts right.
+
+A client of the resumable upload starts an upload with the file name
+and size, PUTs the bytes in order as
+`Content-Range: bytes <start>-<end>/<size>` chunks, and finalizes.
+Every chunk is written straight into one file under MEDIA_ROOT and fed
+to a SHA-256 kept in process memory, so finalizing only renames the file
+to its content address, without copying or re-reading it. The row lock
+taken per chunk keeps writes to one upload in order across workers. A
+worker that did not see the previous chunks rebuilds the hash from the
+bytes on disk once.
+"""
+import hashlib
+import posixpath
+import re
+import threading
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+from core.models import ImageUpload, StoredImage
+from core.storage import content_name, file_digest, image_storage
+
+
+DEFAULTS = {
+    'MAX_CHUNK_SIZE': 8 * 1024 * 1024,
+}
+
+BLOCK_SIZE = 64 * 1024
+
+# hash states of uploads in progress kept by this process
+MAX_HASH_STATES = 1000
+
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+_hashes = OrderedDict()
+_hashes_lock = threading.Lock()
+
+
+class IncompleteChunk(Exception):
+    """the request body ended before the range it announced"""
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'RECIPE_IMAGE_UPLOADS', {})}
+
+
+def parse_content_range(header):
+    """return (start, end, total) of a Content-Range header, end inclusive"""
+    match = CONTENT_RANGE.match(header or '')
+    if match is None:
+        raise ValueError('expected "bytes <start>-<end>/<size>"')
+
+    start, end, total = map(int, match.groups())
+    if end < start or end >= total:
+        raise ValueError('the range is empty or past the end of the file')
+    return start, end, total
+
+
+def store(file):
+    """save an uploaded image under its content address, return the name
+
+    Call in one transaction with attach(): the StoredImage row lock taken
+    here keeps gc_media from deleting a reused file before it is counted.
+    """
+    name = content_name(file_digest(file), file.name)
+    StoredImage.objects.lock(name, file.size)
+    return image_storage.save(name, file)
+
+
+def attach(recipe, name):
+    """make the stored image name, or None, the recipe's image
+
+    Returns False when the recipe already had that image, its renditions
+    then stay as they are.
+    """
+    old_name = recipe.image.name or None
+    if name == old_name:
+        return False
+
+    recipe.image = name
+    recipe.image_renditions = None
+    # core.signals counts the change on the StoredImage rows
+    recipe.save(update_fields=['image', 'image_renditions'])
+    return True
+
+
+def start(recipe, filename, size):
+    """create an empty file for recipe's next image and its upload"""
+    ext = posixpath.splitext(filename)[1].lower()
+    name = image_storage.save(
+        f'uploads/partial/{uuid.uuid4()}{ext}', ContentFile(b'')
+    )
+    return ImageUpload.objects.create(
+        user_id=recipe.user_id, recipe=recipe, name=name, size=size
+    )
+
+
+def _hash_at(upload):
+    """the SHA-256 of the first upload.offset bytes, taken out of the store"""
+    with _hashes_lock:
+        state = _hashes.pop(upload.pk, None)
+    if state is not None and state[0] == upload.offset:
+        return state[1]
+
+    # another worker received the earlier chunks
+    digest = hashlib.sha256()
+    remaining = upload.offset
+    with image_storage.open(upload.name, 'rb') as f:
+        while remaining:
+            block = f.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest
+
+
+def _keep_hash(upload, digest):
+    with _hashes_lock:
+        _hashes[upload.pk] = (upload.offset, digest)
+        while len(_hashes) > MAX_HASH_STATES:
+            _hashes.popitem(last=False)
+
+
+def write_chunk(upload, start, stream, length):
+    """
+    write length bytes of stream, which start at byte start, to the upload
+
+    The caller holds the upload's row lock and has checked that start is
+    not past upload.offset. Bytes the upload already has are skipped, so a
+    chunk resent after a lost response is harmless. Saves the new offset,
+    also when the stream ends early, and then raises IncompleteChunk.
+    """
+    skip = upload.offset - start
+    if skip >= length:
+        return
+
+    while skip:
+        skipped = len(stream.read(min(BLOCK_SIZE, skip)))
+        if not skipped:
+            raise IncompleteChunk()
+        skip -= skipped
+
+    digest = _hash_at(upload)
+    remaining = length - (upload.offset - start)
+    with open(image_storage.path(upload.name), 'r+b') as f:
+        f.seek(upload.offset)
+        while remaining:
+            block = stream.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                break
+            f.write(block)
+            digest.update(block)
+            upload.offset += len(block)
+            remaining -= len(block)
+
+    upload.save(update_fields=['offset'])
+    _keep_hash(upload, digest)
+    if remaining:
+        raise IncompleteChunk()
+
+
+def sha256(upload):
+    """hex SHA-256 of a complete upload, usually without reading the file"""
+    digest = _hash_at(upload)
+    _keep_hash(upload, digest)
+    return digest.hexdigest()
+
+
+def discard(upload):
+    """delete an upload and what it received"""
+    with _hashes_lock:
+        _hashes.pop(upload.pk, None)
+    image_storage.delete(upload.name)
+    upload.delete()
+
+
+def finish(upload):
+    """move a complete upload to its content address, return the name"""
+    name = content_name(sha256(upload), upload.name)
+    with _hashes_lock:
+        _hashes.pop(upload.pk, None)
+
+    # as in store(), the caller attaches the name in this transaction
+    StoredImage.objects.lock(name, upload.size)
+    image_storage.adopt(upload.name, name)
+    upload.delete()
+    return name
@@ -0,0 +1,116 @@
+"""
+Cheap checks of uploaded recipe images, before anything decodes them.
+
+`check_image()` looks at the byte size, sniffs the format from the first
+bytes and lets Pillow parse only the header of that one format for the
+dimensions. A decompression bomb or a 100 megapixel photo is rejected
+after reading a few kilobytes, instead of holding a worker while
+ImageField verifies the whole file. Limits come from RECIPE_IMAGE_LIMITS.
+Every outcome is counted in core.metrics.
+"""
+import warnings
+
+from django.conf import settings
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+from core import metrics
+
+
+DEFAULTS = {
+    'MAX_BYTES': 20 * 1024 * 1024,
+    'MAX_PIXELS': 40 * 1000 * 1000,
+    'FORMATS': ['JPEG', 'PNG', 'WEBP', 'GIF'],
+}
+
+# bytes a multipart body may carry besides the image: boundaries, headers
+FORM_OVERHEAD = 64 * 1024
+
+# Pillow format names by the magic bytes their files start with
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'GIF87a', 'GIF'),
+    (b'GIF89a', 'GIF'),
+    (b'BM', 'BMP'),
+    (b'II*\x00', 'TIFF'),
+    (b'MM\x00*', 'TIFF'),
+)
+
+accepted = metrics.Counter(
+    'image_check.accepted', 'uploaded images that passed the header check'
+)
+rejected = {
+    reason: metrics.Counter(f'image_check.rejected_{reason}', description)
+    for reason, description in (
+        ('size', 'uploaded images over the byte size limit'),
+        ('format', 'uploads that are no image of an allowed format'),
+        ('pixels', 'uploaded images over the pixel count limit'),
+        ('unreadable', 'uploads with a broken image header'),
+    )
+}
+
+
+def get_limits():
+    return {**DEFAULTS, **getattr(settings, 'RECIPE_IMAGE_LIMITS', {})}
+
+
+def reject(reason, message):
+    rejected[reason].incr()
+    raise ValidationError(message, code=f'image_{reason}')
+
+
+def check_size(size):
+    """raise ValidationError when size bytes are over the limit"""
+    max_bytes = get_limits()['MAX_BYTES']
+    if size > max_bytes:
+        reject('size', f'Ensure the image is at most {max_bytes} bytes.')
+
+
+def sniff_format(head):
+    """the Pillow format name of a file starting with head, or None"""
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'WEBP'
+    for signature, name in SIGNATURES:
+        if head.startswith(signature):
+            return name
+    return None
+
+
+def check_image(file):
+    """
+    raise ValidationError unless file looks like an acceptable image
+
+    Reads the header only, and returns the format and (width, height).
+    """
+    limits = get_limits()
+    check_size(file.size)
+
+    file.seek(0)
+    image_format = sniff_format(file.read(16))
+    file.seek(0)
+    if image_format not in limits['FORMATS']:
+        reject('format', 'Upload an image in one of these formats: {}.'.format(
+            ', '.join(limits['FORMATS'])
+        ))
+
+    try:
+        with warnings.catch_warnings():
+            # the pixel limit below decides, not Pillow's warning
+            warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+            with Image.open(file, formats=[image_format]) as image:
+                size = image.size
+    except Image.DecompressionBombError:
+        size = None
+    except Exception:
+        reject('unreadable', 'Upload a valid image. The file is corrupted.')
+    finally:
+        file.seek(0)
+
+    if size is None or size[0] * size[1] > limits['MAX_PIXELS']:
+        reject('pixels', 'Ensure the image has at most {} pixels.'.format(
+            limits['MAX_PIXELS']
+        ))
+
+    accepted.incr()
+    return image_format, size
@@ -1,20 +1,242 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import Case, IntegerField, Prefetch, Q, Value, When
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import IsAuthenticated
 
-from core.models import Tag, Ingredient, Recipe
-from recipe import serializers
+from core import metrics
+from core.models import ImageUpload, Tag, Ingredient, Recipe
+from core.storage import image_storage
+from core.versions import cache_is_shared, get_data_version
+from recipe import bulk, export, filters, renditions, serializers, uploads, validators
+from recipe.fastpath import FastListSerializer
+from users.authentication import CachedTokenAuthentication, SignedTokenAuthentication
+
+
+class SparseFieldsMixin:
+    """
+    ?fields= and ?exclude= for list and retrieve
+
+    Trims the serializer output, and with only_requested_columns() the
+    SQL column list too. `field_columns` maps serializer fields stored in
+    another column, e.g. tags -> tag_ids.
+    """
+    sparse_actions = ('list', 'retrieve')
+    field_columns = {}
+    # columns the view reads itself, always selected
+    required_columns = ('id',)
+
+    def get_sparse_fields(self):
+        """return the requested serializer field names, or None for all"""
+        if self.action not in self.sparse_actions:
+            return None
+        if hasattr(self, '_sparse_fields'):
+            return self._sparse_fields
+
+        fields = self.request.query_params.get('fields')
+        exclude = self.request.query_params.get('exclude')
+        self._sparse_fields = None
+
+        if fields or exclude:
+            available = self.get_serializer_class().Meta.fields
+            requested = fields.split(',') if fields else list(available)
+            excluded = exclude.split(',') if exclude else []
+
+            unknown = [name for name in requested + excluded if name not in available]
+            if unknown:
+                raise ValidationError({'fields': f"Unknown field(s): {', '.join(unknown)}."})
+
+            self._sparse_fields = [
+                name for name in available
+                if name in requested and name not in excluded
+            ]
+
+        return self._sparse_fields
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            kwargs['fields'] = fields
+
+        return super().get_serializer(*args, **kwargs)
+
+    def only_requested_columns(self, queryset):
+        """defer the columns no requested field or the ordering needs"""
+        fields = self.get_sparse_fields()
+        if fields is None:
+            return queryset
+
+        model = queryset.model
+        names = [field.lstrip('-') for field in queryset.query.order_by]
+        names += [self.field_columns.get(name, name) for name in fields]
+
+        columns = set(self.required_columns)
+        for name in names:
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            if field.concrete and not field.many_to_many:
+                columns.add(name)
+
+        return queryset.only(*columns)
+
+    def wants_field(self, name):
+        """return True if the response includes the serializer field name"""
+        fields = self.get_sparse_fields()
+        return fields is None or name in fields
+
+
+class FastListMixin:
+    """list action rendered by FastListSerializer from values_list() rows"""
+
+    def list(self, request, *args, **kwargs):
+        engine = FastListSerializer.for_serializer(
+            self.get_serializer_class(), fields = self.get_sparse_fields(),
+        )
+        if engine is None:
+            return super().list(request, *args, **kwargs)
+
+        rows = engine.rows(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(engine.render(page))
+
+        return Response(engine.render(rows))
+
+
+def representation_etag(request, *parts):
+    """strong ETag for parts, the negotiated format and the full path"""
+    key = ':'.join(map(str, parts + (
+        request.accepted_renderer.format, request.get_full_path()
+    )))
+    return quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+
+def conditional_response(request, etag):
+    """return the 304 or 412 response the request headers ask for, if any"""
+    response = get_conditional_response(request, etag = etag)
+    if response is not None:
+        response['ETag'] = etag
+
+    return response
+
+
+class DataVersionMixin:
+    """the requesting user's data version, read once per request"""
+
+    def get_data_version(self):
+        if not hasattr(self, '_data_version'):
+            self._data_version = get_data_version(self.request.user.id)
+
+        return self._data_version
 
 
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
+class ConditionalListMixin(DataVersionMixin):
+    """
+    ETag and If-None-Match for list, from the per-user data version
+
+    The ETag is known before the queryset is built, so a matching
+    If-None-Match gets a 304 without reading the data tables. Off when
+    the cache holding the versions is process-local, where another
+    worker's write would leave this worker's ETag unchanged.
+    """
+
+    def list(self, request, *args, **kwargs):
+        if not cache_is_shared():
+            return super().list(request, *args, **kwargs)
+
+        etag = representation_etag(request, request.user.id, self.get_data_version())
+        response = conditional_response(request, etag)
+        if response is not None:
+            return response
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+
+        return response
+
+
+response_cache_hits = metrics.Counter(
+    'response_cache.hit', 'list responses served from the response cache'
+)
+response_cache_misses = metrics.Counter(
+    'response_cache.miss', 'list responses computed and stored in the response cache'
+)
+
+
+class CachedListMixin(DataVersionMixin):
+    """
+    cache list response data per user, endpoint and query parameters
+
+    Keys include the user's data version, so every write makes the user's
+    entries unreachable and they expire after RECIPE_RESPONSE_CACHE_TIMEOUT.
+    Values of `unordered_params` are comma separated sets and are sorted.
+    Off when the cache is process-local, as for ConditionalListMixin.
+    """
+    unordered_params = ('tags', 'ingredients', 'fields', 'exclude')
+
+    def response_cache_key(self, request):
+        params = []
+        for name, values in sorted(request.query_params.lists()):
+            if name in self.unordered_params:
+                values = [','.join(sorted(value.split(','))) for value in values]
+            params.append((name, sorted(values)))
+
+        # the data holds absolute pagination links
+        origin = (request.scheme, request.get_host())
+        digest = hashlib.md5(repr((origin, params)).encode()).hexdigest()
+        return (
+            f'response:{request.user.id}:{self.get_data_version()}:'
+            f'{self.basename}:{digest}'
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not cache_is_shared():
+            return super().list(request, *args, **kwargs)
+
+        key = self.response_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            response_cache_hits.incr()
+            return Response(data)
+
+        response_cache_misses.incr()
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            timeout = getattr(settings, 'RECIPE_RESPONSE_CACHE_TIMEOUT', 300)
+            cache.set(key, response.data, timeout)
+
+        return response
+
+
+class BaseRecipeAttrViewSet(SparseFieldsMixin,
+                            ConditionalListMixin,
+                            CachedListMixin,
+                            FastListMixin,
+                            viewsets.GenericViewSet,
                             mixins.ListModelMixin,
                             mixins.CreateModelMixin):
     """Based viewset for user owned recipe attributes"""
 
-    authentication_classes = (TokenAuthentication, )
+    authentication_classes = (CachedTokenAuthentication, SignedTokenAuthentication, )
     permission_classes = (IsAuthenticated, )
+    keyset_ordering = ('-name', '-id')
+    autocomplete_limit = 10
+    max_autocomplete_limit = 50
 
     def get_queryset(self):
         """return objects for currently authenticated user only"""
@@ -24,7 +246,48 @@ class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
         if assigned_only:
             queryset = queryset.filter(recipe__isnull = False)
 
-        return queryset.filter(user=self.request.user).order_by('-name').distinct()
+        queryset = queryset.filter(user=self.request.user)
+
+        q = self.request.query_params.get('q')
+        if q:
+            return self.only_requested_columns(self._autocomplete(queryset, q))
+
+        queryset = queryset.order_by(*self.keyset_ordering).distinct()
+
+        return self.only_requested_columns(queryset)
+
+    def _autocomplete(self, queryset, q):
+        """
+        prefix and fuzzy name matches, best first
+
+        Both the ILIKE prefix test and the trigram `%` operator are served
+        by the GIN (user, name gin_trgm_ops) index.
+        """
+        try:
+            limit = int(self.request.query_params.get('limit', self.autocomplete_limit))
+        except ValueError:
+            limit = self.autocomplete_limit
+        limit = max(1, min(limit, self.max_autocomplete_limit))
+
+        queryset = queryset.filter(
+            Q(name__istartswith = q) | Q(name__trigram_similar = q)
+        ).annotate(
+            prefix = Case(
+                When(name__istartswith = q, then = Value(1)),
+                default = Value(0),
+                output_field = IntegerField(),
+            ),
+            similarity = TrigramSimilarity('name', q),
+        ).order_by('-prefix', '-similarity', 'name', 'id').distinct()
+
+        return queryset[:limit]
+
+    def paginate_queryset(self, queryset):
+        # autocomplete results are already limited
+        if self.request.query_params.get('q'):
+            return None
+
+        return super().paginate_queryset(queryset)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -42,36 +305,146 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
     serializer_class = serializers.IngredientSerializer
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(SparseFieldsMixin,
+                    ConditionalListMixin,
+                    CachedListMixin,
+                    FastListMixin,
+                    viewsets.ModelViewSet):
     """Manage recipes in DB"""
     serializer_class = serializers.RecipeSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication, )
+    authentication_classes = (CachedTokenAuthentication, SignedTokenAuthentication, )
     permission_classes = (IsAuthenticated, )
+    keyset_ordering = ('-id',)
+    field_columns = {'tags': 'tag_ids', 'ingredients': 'ingredient_ids'}
+    required_columns = ('id', 'version')
 
     def _params_to_ints(self, qs):
         """convert of string ids to a list of integer ids"""
         res = [int(x) for x in qs.split(',')]
         return res
 
+    def get_list_params(self):
+        """return the validated filter and ordering query parameters"""
+        if not hasattr(self, '_list_params'):
+            params = serializers.RecipeFilterSerializer(data = self.request.query_params)
+            params.is_valid(raise_exception = True)
+            self._list_params = params.validated_data
+
+        return self._list_params
+
     def get_queryset(self):
         """retrieve recipes for authenticated users """
 
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
+        params = self.get_list_params()
         queryset = self.queryset
 
-        if tags:
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in = tag_ids)
-        
-        if ingredients:
-            ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in = ingredient_ids)
+        queryset = filters.filter_recipes(
+            queryset,
+            tag_ids = self._params_to_ints(tags) if tags else None,
+            ingredient_ids = self._params_to_ints(ingredients) if ingredients else None,
+            match = params['match'],
+        )
+        queryset = filters.filter_ranges(queryset, params)
+
+        search = self.request.query_params.get('search')
+        if search:
+            queryset = filters.search_recipes(queryset, search)
 
+        queryset = queryset.filter(user = self.request.user).defer('search_vector')
+        queryset = queryset.order_by(*self.get_keyset_ordering())
+        queryset = self.only_requested_columns(queryset)
 
-        return queryset.filter(user = self.request.user)
+        return self._prefetch_relations(queryset)
+
+    def get_keyset_ordering(self):
+        """return the requested ordering, search relevance or newest first"""
+        params = self.get_list_params()
+        if params.get('ordering'):
+            return filters.keyset_ordering(params['ordering'])
+        if self.request.query_params.get('search'):
+            return ('-rank', '-id')
+
+        return self.keyset_ordering
+
+    def _prefetch_relations(self, queryset):
+        """load nested tags and ingredients in one query each"""
+        if self.action == 'retrieve':
+            if self.wants_field('tags'):
+                queryset = queryset.prefetch_related(
+                    Prefetch('tags', queryset=Tag.objects.only('id', 'name'))
+                )
+            if self.wants_field('ingredients'):
+                queryset = queryset.prefetch_related(
+                    Prefetch('ingredients', queryset=Ingredient.objects.only('id', 'name'))
+                )
+
+        # the list serializer reads Recipe.tag_ids / ingredient_ids instead
+        return queryset
     
+    def object_etag(self, version):
+        """strong ETag of the requested recipe at version"""
+        return representation_etag(self.request, 'recipe', self.kwargs['pk'], version)
+
+    def current_version(self, lock = False):
+        """return the stored version of the requested recipe, None if missing"""
+        queryset = Recipe.objects.filter(user = self.request.user)
+        if lock:
+            queryset = queryset.select_for_update()
+        try:
+            return queryset.filter(pk = self.kwargs['pk']) \
+                .values_list('version', flat = True).first()
+        except (TypeError, ValueError):
+            return None
+
+    def retrieve(self, request, *args, **kwargs):
+        """recipe detail with an ETag, 304 for a matching If-None-Match"""
+        if 'HTTP_IF_NONE_MATCH' in request.META:
+            version = self.current_version()
+            if version is not None:
+                response = conditional_response(request, self.object_etag(version))
+                if response is not None:
+                    return response
+
+        instance = self.get_object()
+        response = Response(self.get_serializer(instance).data)
+        response['ETag'] = self.object_etag(instance.version)
+
+        return response
+
+    def update(self, request, *args, **kwargs):
+        """update, or 412 when If-Match does not name the current version"""
+        with transaction.atomic():
+            response = self._check_if_match(request)
+            if response is None:
+                response = super().update(request, *args, **kwargs)
+
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = self.object_etag(self.current_version())
+
+        return response
+
+    def destroy(self, request, *args, **kwargs):
+        """delete, or 412 when If-Match does not name the current version"""
+        with transaction.atomic():
+            response = self._check_if_match(request)
+            if response is None:
+                response = super().destroy(request, *args, **kwargs)
+
+        return response
+
+    def _check_if_match(self, request):
+        # the row stays locked until the write commits
+        if 'HTTP_IF_MATCH' not in request.META:
+            return None
+        version = self.current_version(lock = True)
+        if version is None:
+            return None
+
+        return conditional_response(request, self.object_etag(version))
+
     def get_serializer_class(self):
         """return appropriate serializer class"""
         if self.action == 'retrieve':
@@ -89,14 +462,282 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def upload_image(self, request, pk = None):
         """upload an image to a recipe"""
         recipe = self.get_object()
+        # refuse a body too big for any allowed image before parsing it
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            # what Django's request parsing assumes too
+            length = 0
+        try:
+            validators.check_size(length - validators.FORM_OVERHEAD)
+        except ValidationError as exc:
+            return Response({'image': exc.detail},
+                            status = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
         serializer = self.get_serializer(
             recipe,
             data = request.data,
         )
 
         if serializer.is_valid():
-            serializer.save()
+            recipe = serializer.save()
+            renditions.schedule(recipe)
             return Response(serializer.data, status = status.HTTP_200_OK)
         
         return Response(serializer.errors, status = status.HTTP_400_BAD_REQUEST)
 
+    @action(methods=['POST'], detail = True, url_path='uploads')
+    def start_upload(self, request, pk = None):
+        """start a resumable upload of the recipe's image
+
+        Takes the `filename` and `size` of the image. Send the bytes in order
+        with PUT to the returned upload's URL, as chunks of at most
+        RECIPE_IMAGE_UPLOADS['MAX_CHUNK_SIZE'] bytes with a
+        `Content-Range: bytes <start>-<end>/<size>` header, then POST to its
+        finalize/ URL. GET on the upload reports the offset to resume from.
+        """
+        recipe = self.get_object()
+        serializer = serializers.ImageUploadSerializer(data = request.data)
+
+        if serializer.is_valid():
+            serializer.save(recipe = recipe)
+            return Response(serializer.data, status = status.HTTP_201_CREATED)
+
+        return Response(serializer.errors, status = status.HTTP_400_BAD_REQUEST)
+
+    def get_upload(self, upload_id, lock = False):
+        """the user's upload of the requested recipe, 404 when missing"""
+        queryset = ImageUpload.objects.filter(
+            user = self.request.user, recipe_id = self.kwargs['pk']
+        )
+        if lock:
+            queryset = queryset.select_for_update()
+        try:
+            upload = queryset.filter(pk = upload_id).first()
+        except (TypeError, ValueError, DjangoValidationError):
+            upload = None
+        if upload is None:
+            raise NotFound()
+
+        return upload
+
+    @action(methods=['GET', 'PUT'], detail = True,
+            url_path=r'uploads/(?P<upload_id>[^/.]+)')
+    def upload_chunk(self, request, pk = None, upload_id = None):
+        """report the upload's offset, or PUT the chunk that starts there"""
+        if request.method == 'GET':
+            upload = self.get_upload(upload_id)
+            return Response(serializers.ImageUploadSerializer(upload).data)
+
+        try:
+            start, end, total = uploads.parse_content_range(
+                request.META.get('HTTP_CONTENT_RANGE')
+            )
+        except ValueError as exc:
+            return Response({'detail': f'Invalid Content-Range: {exc}.'},
+                            status = status.HTTP_400_BAD_REQUEST)
+
+        length = end - start + 1
+        max_chunk = uploads.get_config()['MAX_CHUNK_SIZE']
+        if length > max_chunk:
+            return Response(
+                {'detail': f'A chunk may contain at most {max_chunk} bytes.'},
+                status = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+        if request.META.get('CONTENT_LENGTH') != str(length):
+            return Response({'detail': 'Content-Length does not match Content-Range.'},
+                            status = status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            upload = self.get_upload(upload_id, lock = True)
+            if total != upload.size:
+                return Response({'detail': f'The upload is {upload.size} bytes long.'},
+                                status = status.HTTP_400_BAD_REQUEST)
+            if start > upload.offset:
+                # the client lost a chunk, it resumes from offset
+                return Response(serializers.ImageUploadSerializer(upload).data,
+                                status = status.HTTP_409_CONFLICT)
+            try:
+                uploads.write_chunk(upload, start, request.stream, length)
+            except uploads.IncompleteChunk:
+                return Response(serializers.ImageUploadSerializer(upload).data,
+                                status = status.HTTP_400_BAD_REQUEST)
+
+        return Response(serializers.ImageUploadSerializer(upload).data)
+
+    @action(methods=['POST'], detail = True,
+            url_path=r'uploads/(?P<upload_id>[^/.]+)/finalize')
+    def finish_upload(self, request, pk = None, upload_id = None):
+        """make a complete upload the recipe's image
+
+        With `sha256`, an upload whose bytes do not match is discarded.
+        """
+        serializer = serializers.FinishUploadSerializer(data = request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status = status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            upload = self.get_upload(upload_id, lock = True)
+            if upload.offset != upload.size:
+                return Response(serializers.ImageUploadSerializer(upload).data,
+                                status = status.HTTP_409_CONFLICT)
+
+            expected = serializer.validated_data.get('sha256')
+            if expected and expected.lower() != uploads.sha256(upload):
+                uploads.discard(upload)
+                return Response({'sha256': ['The uploaded bytes do not match.']},
+                                status = status.HTTP_400_BAD_REQUEST)
+            try:
+                with image_storage.open(upload.name, 'rb') as f:
+                    validators.check_image(f)
+            except ValidationError as exc:
+                uploads.discard(upload)
+                return Response({'image': exc.detail},
+                                status = status.HTTP_400_BAD_REQUEST)
+
+            recipe = upload.recipe
+            uploads.attach(recipe, uploads.finish(upload))
+            renditions.schedule(recipe)
+
+        serializer = serializers.RecipeImageSerializer(
+            recipe, context = self.get_serializer_context()
+        )
+        return Response(serializer.data)
+
+    @action(
+        methods=['GET'], detail = False, url_path='export',
+        renderer_classes=[export.NDJSONRenderer, export.CSVRenderer]
+    )
+    def export(self, request):
+        """stream every matching recipe as NDJSON or, with ?format=csv, CSV
+
+        Accepts the same filters as the list. Rows are read in chunks of
+        RECIPE_EXPORT_CHUNK_SIZE through a server-side cursor.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        chunk_size = getattr(settings, 'RECIPE_EXPORT_CHUNK_SIZE', 2000)
+        records = export.export_records(queryset, chunk_size)
+
+        renderer = request.accepted_renderer
+        if renderer.format == 'csv':
+            content = renderer.render_records(records, export.EXPORT_FIELDS)
+        else:
+            content = renderer.render_records(records)
+
+        response = StreamingHttpResponse(content, content_type = renderer.media_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="recipes.{renderer.format}"'
+        )
+        return response
+
+    @action(methods=['POST', 'PATCH', 'DELETE'], detail = False, url_path='bulk')
+    def bulk(self, request):
+        """create, update or delete many recipes in one request
+
+        POST takes a list of recipes, PATCH a list of partial recipes with
+        their `id` and DELETE a list of ids. With `?atomic=0` valid items are
+        written and invalid ones reported, otherwise any error aborts all.
+        """
+        items = request.data
+        if not isinstance(items, list):
+            return Response(
+                {'detail': 'Expected a list of items.'},
+                status = status.HTTP_400_BAD_REQUEST
+            )
+
+        max_items = getattr(settings, 'RECIPE_BULK_MAX_ITEMS', 1000)
+        if len(items) > max_items:
+            return Response(
+                {'detail': f'A bulk request may contain at most {max_items} items.'},
+                status = status.HTTP_400_BAD_REQUEST
+            )
+
+        params = serializers.BulkParamsSerializer(data = request.query_params)
+        params.is_valid(raise_exception = True)
+        atomic = params.validated_data['atomic']
+
+        if request.method == 'DELETE':
+            return self._bulk_delete(items, atomic)
+
+        return self._bulk_write(items, atomic, partial = request.method == 'PATCH')
+
+    def _bulk_write(self, items, atomic, partial):
+        """validate every item, then write the valid ones in bulk"""
+        user = self.request.user
+        context = self.get_serializer_context()
+        context['resolved_pks'] = bulk.preload_related(
+            serializers.RecipeSerializer(context = context), items
+        )
+
+        instances = {}
+        if partial:
+            ids = [item.get('id') for item in items if isinstance(item, dict)]
+            ids = [pk for pk in ids if isinstance(pk, int)]
+            instances = Recipe.objects.filter(user = user, id__in = ids).in_bulk()
+
+        errors = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            instance = None
+            if partial:
+                instance = instances.get(item.get('id')) if isinstance(item, dict) else None
+                if instance is None:
+                    errors[index] = {'id': ['Not found.']}
+                    continue
+
+            serializer = serializers.RecipeSerializer(
+                instance, data = item, partial = partial, context = context
+            )
+            if serializer.is_valid():
+                valid.append((index, instance, serializer.validated_data))
+            else:
+                errors[index] = serializer.errors
+
+        if atomic and any(errors):
+            return Response({'errors': errors}, status = status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            validated = [data for _, _, data in valid]
+            if partial:
+                recipes = bulk.update_recipes([obj for _, obj, _ in valid], validated)
+            else:
+                recipes = bulk.create_recipes(user, validated)
+
+        results = [{'errors': error} for error in errors]
+        for (index, _, _), recipe in zip(valid, recipes):
+            results[index] = {'id': recipe.id}
+
+        return self._bulk_response(results, errors, created = not partial)
+
+    def _bulk_delete(self, items, atomic):
+        """delete the recipes with the given ids"""
+        try:
+            ids = [int(pk) for pk in items]
+        except (TypeError, ValueError):
+            return Response(
+                {'detail': 'Expected a list of ids.'},
+                status = status.HTTP_400_BAD_REQUEST
+            )
+
+        with transaction.atomic():
+            queryset = Recipe.objects.filter(user = self.request.user, id__in = ids)
+            found = set(queryset.values_list('id', flat = True))
+            errors = [None if pk in found else {'id': ['Not found.']} for pk in ids]
+
+            if atomic and any(errors):
+                return Response({'errors': errors}, status = status.HTTP_400_BAD_REQUEST)
+
+            queryset.delete()
+
+        results = [
+            {'errors': error} if error else {'id': pk}
+            for pk, error in zip(ids, errors)
+        ]
+        return self._bulk_response(results, errors)
+
+    def _bulk_response(self, results, errors, created = False):
+        if any(errors):
+            return Response({'results': results}, status = status.HTTP_207_MULTI_STATUS)
+
+        code = status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        return Response({'results': results}, status = code)
@@ -0,0 +1,229 @@
+"""
+TokenAuthentication that remembers recently seen tokens.
+
+DRF's TokenAuthentication runs a query joining authtoken_token and the user
+table on every request. CachedTokenAuthentication keeps (user, token) in a
+bounded per-process LRU for TOKEN_AUTH_CACHE['TIMEOUT'] seconds, and with
+TOKEN_AUTH_CACHE['SHARED_CACHE'] set also in that cache, so other workers
+skip the query too. The shared cache gets neither the raw token nor the
+password hash: entries are keyed by a digest of the token and hold the
+user's other fields, from which workers rebuild the instances.
+
+Deleting a token or saving its user drops the entry from this process
+and the shared cache. With a shared cache, every hit in process memory
+is checked against the shared entry, so other workers stop accepting a
+revoked token at once. Without one, other processes may keep serving it
+from memory until it times out, so keep the timeout short.
+"""
+import copy
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router
+from rest_framework import exceptions
+from rest_framework.authentication import (
+    BaseAuthentication,
+    TokenAuthentication,
+    get_authorization_header,
+)
+from rest_framework.authtoken.models import Token
+from rest_framework.permissions import SAFE_METHODS
+
+from core import metrics
+from users import tokens
+
+
+local_hits = metrics.Counter(
+    'auth_token.local_hit', 'token lookups served from process memory'
+)
+shared_hits = metrics.Counter(
+    'auth_token.shared_hit', 'token lookups served from the shared cache'
+)
+misses = metrics.Counter(
+    'auth_token.miss', 'token lookups that queried the database'
+)
+
+DEFAULTS = {
+    'MAX_ENTRIES': 10000,
+    'TIMEOUT': 60,
+    'SHARED_CACHE': None,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'TOKEN_AUTH_CACHE', {})}
+
+
+class TokenCache:
+    """thread safe LRU of token key -> (user, token, stamp) with expiry"""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, timeout, max_entries):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_cache = TokenCache()
+
+
+def _shared_cache():
+    alias = get_config()['SHARED_CACHE']
+    return caches[alias] if alias else None
+
+
+def _shared_key(key):
+    # keep raw tokens out of the cache server
+    return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+MISSING = object()
+
+# never copied into the shared cache
+PRIVATE_USER_FIELDS = ('password',)
+
+
+def _shared_entry(user, token):
+    """what the shared cache keeps: the user's public fields, no credentials"""
+    fields = {
+        field.attname: getattr(user, field.attname)
+        for field in user._meta.concrete_fields
+        if field.attname not in PRIVATE_USER_FIELDS
+    }
+    # tells local copies of this entry from those of a later one
+    return fields, token.created, secrets.token_hex(8)
+
+
+def _from_shared_entry(key, entry):
+    """rebuild (user, token, stamp) of a shared entry, the key is not cached"""
+    fields, created, stamp = entry
+    User = get_user_model()
+    user = User.from_db(
+        router.db_for_read(User), list(fields), list(fields.values())
+    )
+    token = Token.from_db(
+        router.db_for_read(Token), ['key', 'user_id', 'created'],
+        [key, user.pk, created],
+    )
+    token.user = user
+    return user, token, stamp
+
+
+def invalidate_token(key):
+    """forget key in this process and the shared cache"""
+    local_cache.delete(key)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.delete(_shared_key(key))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Drop-in TokenAuthentication with an in-memory and shared cache"""
+
+    def authenticate_credentials(self, key):
+        config = get_config()
+        shared = _shared_cache()
+        shared_entry = MISSING
+        entry = local_cache.get(key)
+
+        if entry is not None and shared is not None:
+            # revoking in another worker removed or replaced the shared entry
+            shared_entry = shared.get(_shared_key(key))
+            if shared_entry is None or shared_entry[-1] != entry[-1]:
+                entry = None
+
+        if entry is not None:
+            local_hits.incr()
+        else:
+            if shared_entry is MISSING and shared is not None:
+                shared_entry = shared.get(_shared_key(key))
+            if shared_entry not in (None, MISSING):
+                shared_hits.incr()
+                entry = _from_shared_entry(key, shared_entry)
+            else:
+                misses.incr()
+                # raises for unknown tokens and inactive users, never cached
+                user, token = super().authenticate_credentials(key)
+                entry = (user, token, None)
+                if shared is not None:
+                    shared_entry = _shared_entry(user, token)
+                    shared.set(
+                        _shared_key(key), shared_entry, config['TIMEOUT']
+                    )
+                    entry = (user, token, shared_entry[-1])
+            local_cache.set(
+                key, entry, config['TIMEOUT'], config['MAX_ENTRIES']
+            )
+
+        user, token, _ = entry
+        # requests must not change the cached instance
+        return copy.copy(user), token
+
+
+def deferred_user(user_id):
+    """a user with only the primary key loaded, other fields load on access"""
+    User = get_user_model()
+    return User.from_db(router.db_for_read(User), ['id'], [user_id])
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """
+    Authenticate `Authorization: Bearer <access token>`
+
+    Reads need no query: request.user only has its id loaded, which is all
+    that scoping querysets needs. Writes may assign the user as an owner, so
+    they first check that the user still exists and is active; a deleted
+    user would otherwise fail the foreign key.
+    """
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid bearer header.')
+
+        try:
+            user_id = tokens.verify_access_token(auth[1].decode())
+        except (tokens.InvalidToken, UnicodeError):
+            raise exceptions.AuthenticationFailed('Invalid or expired token.')
+
+        if request.method not in SAFE_METHODS and not get_user_model() \
+                .objects.filter(pk=user_id, is_active=True).exists():
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+
+        return deferred_user(user_id), None
+
+    def authenticate_header(self, request):
+        return self.keyword
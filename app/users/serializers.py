@@ -36,6 +36,8 @@ class AuthTokenSerializer(serializers.Serializer):
         style={'input_type': 'password'},
         trim_whitespace=False
     )
+    # 'signed' issues a short lived access token and a refresh token
+    token_type = serializers.ChoiceField(choices=('db', 'signed'), default='db')
 
     def validate(self, attrs):
         """validate and authenticate the user"""
@@ -54,3 +56,8 @@ class AuthTokenSerializer(serializers.Serializer):
 
         attrs['user'] = user
         return attrs
+
+
+class RefreshTokenSerializer(serializers.Serializer):
+    """serializer for a signed refresh token"""
+    refresh = serializers.CharField()
@@ -0,0 +1,22 @@
+"""Drop cached tokens when they are deleted or their user changes"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from users.authentication import invalidate_token
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields == frozenset(['last_login']):
+        return
+
+    # deactivation, profile and password changes
+    for key in Token.objects.filter(user=instance).values_list('key', flat=True):
+        invalidate_token(key)
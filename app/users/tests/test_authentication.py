@@ -0,0 +1,178 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from users.authentication import (
+    TokenCache,
+    _shared_key,
+    local_cache,
+    misses,
+    shared_hits,
+)
+
+ME_URL = reverse('users:me')
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test the cached token authentication"""
+
+    def setUp(self):
+        local_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='diego@oxd.com',
+            password='MyPassword123',
+            name='Diego'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_second_request_skips_token_query(self):
+        """test a cached token authenticates without any query"""
+        with self.assertNumQueries(1):
+            self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], 'diego@oxd.com')
+
+    def test_invalid_token(self):
+        """test unknown tokens are rejected every time"""
+        self.client.credentials(HTTP_AUTHORIZATION='Token nope')
+        before = misses.value()
+
+        for _ in range(2):
+            res = self.client.get(ME_URL)
+            self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.assertEqual(misses.value(), before + 2)
+
+    def test_deleted_token_rejected(self):
+        """test deleting a token invalidates the cached entry"""
+        self.client.get(ME_URL)
+
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """test deactivating a user invalidates the cached entry"""
+        self.client.get(ME_URL)
+
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_profile_update_visible(self):
+        """test the next request sees a profile update"""
+        self.client.get(ME_URL)
+
+        self.client.patch(ME_URL, {'name': 'Diego R'})
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'Diego R')
+
+    @override_settings(TOKEN_AUTH_CACHE={'SHARED_CACHE': 'default'})
+    def test_shared_cache(self):
+        """test another process finds the token in the shared cache"""
+        self.client.get(ME_URL)
+        # a fresh worker has nothing in memory
+        local_cache.clear()
+        before = shared_hits.value()
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(shared_hits.value(), before + 1)
+
+        self.assertEqual(res.data['email'], 'diego@oxd.com')
+        self.assertEqual(res.data['name'], 'Diego')
+
+        self.token.delete()
+        local_cache.clear()
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(TOKEN_AUTH_CACHE={'SHARED_CACHE': 'default'})
+    def test_revoked_in_other_worker(self):
+        """test a token revoked by another worker fails despite local entries"""
+        self.client.get(ME_URL)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(ME_URL).status_code, status.HTTP_200_OK)
+
+        # the other worker only clears its own memory and the shared cache
+        with patch.object(local_cache, 'delete'):
+            self.token.delete()
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(TOKEN_AUTH_CACHE={'SHARED_CACHE': 'default'})
+    def test_deactivated_in_other_worker(self):
+        """test deactivating the user in another worker ends local entries"""
+        self.client.get(ME_URL)
+
+        with patch.object(local_cache, 'delete'):
+            self.user.is_active = False
+            self.user.save()
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(TOKEN_AUTH_CACHE={'SHARED_CACHE': 'default'})
+    def test_shared_cache_keeps_no_credentials(self):
+        """test the shared entry has neither the token nor the password hash"""
+        self.client.get(ME_URL)
+
+        entry = repr(cache.get(_shared_key(self.token.key)))
+
+        self.assertIn('diego@oxd.com', entry)
+        self.assertNotIn(self.token.key, entry)
+        self.assertNotIn(self.user.password, entry)
+
+    @override_settings(TOKEN_AUTH_CACHE={'SHARED_CACHE': 'default'})
+    def test_password_change_from_shared_entry(self):
+        """test a user rebuilt from the shared cache can change the password"""
+        self.client.get(ME_URL)
+        local_cache.clear()
+
+        res = self.client.patch(ME_URL, {'password': 'NewPassword123'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('NewPassword123'))
+        self.assertEqual(self.user.name, 'Diego')
+
+
+class TokenCacheTests(TestCase):
+    """Test the bounded LRU with expiry"""
+
+    def test_evicts_least_recently_used(self):
+        """test the oldest untouched entry goes first"""
+        cache = TokenCache()
+        cache.set('a', 1, 60, 2)
+        cache.set('b', 2, 60, 2)
+        cache.get('a')
+        cache.set('c', 3, 60, 2)
+
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), (1, None, 3))
+
+    def test_expires(self):
+        """test entries are dropped after their timeout"""
+        cache = TokenCache()
+        with patch('users.authentication.time.monotonic', return_value=100):
+            cache.set('a', 1, 60, 10)
+        with patch('users.authentication.time.monotonic', return_value=161):
+            self.assertIsNone(cache.get('a'))
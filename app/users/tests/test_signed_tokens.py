@@ -0,0 +1,164 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import DeniedToken
+
+TOKEN_URL = reverse('users:token')
+REFRESH_URL = reverse('users:token-refresh')
+REVOKE_URL = reverse('users:token-revoke')
+ME_URL = reverse('users:me')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class SignedTokenTests(TestCase):
+    """Test signed access and refresh tokens"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='diego@oxd.com',
+            password='MyPassword123',
+            name='Diego'
+        )
+
+    def obtain(self):
+        res = self.client.post(TOKEN_URL, {
+            'email': 'diego@oxd.com',
+            'password': 'MyPassword123',
+            'token_type': 'signed',
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def bearer(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def test_db_token_is_default(self):
+        """test the token endpoint still issues database tokens by default"""
+        res = self.client.post(TOKEN_URL, {
+            'email': 'diego@oxd.com', 'password': 'MyPassword123'
+        })
+
+        self.assertEqual(res.data, {'token': Token.objects.get(user=self.user).key})
+
+    @override_settings(CACHE_IS_SHARED=True)
+    def test_access_token_needs_no_query(self):
+        """test a signed access token authenticates without the database"""
+        tokens = self.obtain()
+        self.assertEqual(set(tokens), {'access', 'refresh', 'expires_in'})
+        self.assertFalse(Token.objects.exists())
+        self.bearer(tokens['access'])
+
+        # the list and its ETag come from the cache after the first request
+        self.client.get(TAGS_URL)
+        with self.assertNumQueries(0):
+            res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_access_token_profile(self):
+        """test the profile view loads the full user"""
+        self.bearer(self.obtain()['access'])
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data, {'email': 'diego@oxd.com', 'name': 'Diego'})
+
+    def test_access_token_of_deleted_user(self):
+        """test a deleted user's access token is refused for writes and profile"""
+        self.bearer(self.obtain()['access'])
+        self.user.delete()
+
+        res = self.client.post(TAGS_URL, {'name': 'Vegan'})
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalid_and_expired_access_token(self):
+        """test tampered and expired access tokens are rejected"""
+        access = self.obtain()['access']
+
+        self.bearer(access[:-2] + 'xx')
+        self.assertEqual(self.client.get(ME_URL).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.bearer(access)
+        with patch('users.tokens.time.time', return_value=2 ** 40):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_token_is_not_an_access_token(self):
+        """test refresh tokens cannot be used as bearer tokens"""
+        self.bearer(self.obtain()['refresh'])
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_rotates(self):
+        """test a refresh token works once and returns a new pair"""
+        refresh = self.obtain()['refresh']
+
+        res = self.client.post(REFRESH_URL, {'refresh': refresh})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res.data['refresh'], refresh)
+
+        res = self.client.post(REFRESH_URL, {'refresh': refresh})
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_inactive_user(self):
+        """test deactivated users cannot refresh"""
+        refresh = self.obtain()['refresh']
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.post(REFRESH_URL, {'refresh': refresh})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoke(self):
+        """test a revoked refresh token cannot be refreshed"""
+        refresh = self.obtain()['refresh']
+
+        res = self.client.post(REVOKE_URL, {'refresh': refresh})
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.post(REVOKE_URL, {'refresh': refresh}).status_code,
+                         status.HTTP_204_NO_CONTENT)
+
+        res = self.client.post(REFRESH_URL, {'refresh': refresh})
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(SIGNED_TOKENS={'ACCESS_TTL': 60, 'REFRESH_TTL': 120})
+    def test_configured_lifetime(self):
+        """test SIGNED_TOKENS sets the access token lifetime"""
+        self.assertEqual(self.obtain()['expires_in'], 60)
+
+
+class PruneTokensCommandTests(TestCase):
+    """Test the prune_tokens command"""
+
+    def test_prunes_expired_entries(self):
+        """test only expired denylist entries and old db tokens go"""
+        now = timezone.now()
+        DeniedToken.objects.create(jti='old', expires=now - timedelta(seconds=1))
+        DeniedToken.objects.create(jti='live', expires=now + timedelta(days=1))
+        user = get_user_model().objects.create_user('diego@oxd.com', 'pass12345')
+        other = get_user_model().objects.create_user('other@oxd.com', 'pass12345')
+        Token.objects.create(user=user)
+        Token.objects.filter(user=user).update(created=now - timedelta(days=100))
+        Token.objects.create(user=other)
+
+        call_command('prune_tokens', db_token_max_age=90, stdout=StringIO())
+
+        self.assertEqual(list(DeniedToken.objects.values_list('jti', flat=True)), ['live'])
+        self.assertEqual(list(Token.objects.values_list('user', flat=True)), [other.id])
@@ -0,0 +1,98 @@
+"""
+Short-lived signed access tokens and single use refresh tokens.
+
+Both are django.core.signing payloads, HMAC signed with SECRET_KEY under
+different salts. Access tokens carry the user id and expiry and are
+checked without the database, so they stay valid until they expire; keep
+SIGNED_TOKENS['ACCESS_TTL'] short. Refreshing or revoking a refresh token
+adds its id to DeniedToken until the token would have expired anyway.
+"""
+import secrets
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.db import IntegrityError, transaction
+
+from core.models import DeniedToken
+
+
+ACCESS_SALT = 'users.tokens.access'
+REFRESH_SALT = 'users.tokens.refresh'
+
+DEFAULTS = {
+    'ACCESS_TTL': 300,
+    'REFRESH_TTL': 14 * 24 * 3600,
+}
+
+
+class InvalidToken(Exception):
+    """the token is malformed, forged, expired or already used"""
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'SIGNED_TOKENS', {})}
+
+
+def _unsign(token, salt):
+    try:
+        payload = signing.loads(token, salt=salt)
+    except signing.BadSignature:
+        raise InvalidToken('bad signature')
+
+    if not isinstance(payload, dict) or payload.get('exp', 0) <= time.time():
+        raise InvalidToken('expired')
+
+    return payload
+
+
+def issue_tokens(user):
+    """return a new access and refresh token for user"""
+    config = get_config()
+    now = int(time.time())
+    return {
+        'access': signing.dumps(
+            {'uid': user.pk, 'exp': now + config['ACCESS_TTL']}, salt=ACCESS_SALT
+        ),
+        'refresh': signing.dumps(
+            {'uid': user.pk, 'exp': now + config['REFRESH_TTL'],
+             'jti': secrets.token_hex(16)},
+            salt=REFRESH_SALT
+        ),
+        'expires_in': config['ACCESS_TTL'],
+    }
+
+
+def verify_access_token(token):
+    """return the user id of a valid access token, without queries"""
+    return _unsign(token, ACCESS_SALT)['uid']
+
+
+def _deny(payload):
+    """add the refresh token to the denylist, False if it already was"""
+    expires = datetime.fromtimestamp(payload['exp'], tz=timezone.utc)
+    try:
+        with transaction.atomic():
+            DeniedToken.objects.create(jti=payload['jti'], expires=expires)
+    except IntegrityError:
+        return False
+
+    return True
+
+
+def refresh_tokens(token):
+    """exchange a refresh token for a new pair, the old one is used up"""
+    payload = _unsign(token, REFRESH_SALT)
+    user = get_user_model().objects.filter(pk=payload['uid'], is_active=True).first()
+    # a concurrent refresh with the same token loses the insert race
+    if user is None or not _deny(payload):
+        raise InvalidToken('revoked')
+
+    return issue_tokens(user)
+
+
+def revoke_refresh_token(token):
+    """make a refresh token unusable, revoking twice is fine"""
+    _deny(_unsign(token, REFRESH_SALT))
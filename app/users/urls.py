@@ -1,11 +1,19 @@
 from django.urls import path
 
-from .views import CreateAuthTokenView, CreateUserView, ManageUserView
+from .views import (
+    CreateAuthTokenView,
+    CreateUserView,
+    ManageUserView,
+    RefreshTokenView,
+    RevokeTokenView,
+)
 
 app_name = 'users'
 
 urlpatterns = [
     path('create/', CreateUserView.as_view(), name='create'),
     path('token/', CreateAuthTokenView.as_view(), name='token'),
+    path('token/refresh/', RefreshTokenView.as_view(), name='token-refresh'),
+    path('token/revoke/', RevokeTokenView.as_view(), name='token-revoke'),
     path('me/', ManageUserView.as_view(), name='me')
 ]
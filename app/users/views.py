@@ -1,8 +1,17 @@
-from rest_framework import generics, authentication, permissions
+from rest_framework import exceptions, generics, permissions, status
+from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 
-from .serializers import UserSerializer, AuthTokenSerializer
+from . import tokens
+from .authentication import (
+    PRIVATE_USER_FIELDS,
+    CachedTokenAuthentication,
+    SignedTokenAuthentication,
+)
+from .serializers import AuthTokenSerializer, RefreshTokenSerializer, UserSerializer
 
 
 class CreateUserView(generics.CreateAPIView):
@@ -15,13 +24,72 @@ class CreateAuthTokenView(ObtainAuthToken):
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+
+        if serializer.validated_data['token_type'] == 'signed':
+            return Response(tokens.issue_tokens(user))
+
+        token, _ = Token.objects.get_or_create(user=user)
+        return Response({'token': token.key})
+
+
+class SignedTokenView(APIView):
+    """base for the views that take a refresh token instead of credentials"""
+    authentication_classes = ()
+    permission_classes = (permissions.AllowAny,)
+
+    def get_authenticate_header(self, request):
+        # answer invalid tokens with 401 rather than 403
+        return SignedTokenAuthentication.keyword
+
+    def get_refresh_token(self):
+        serializer = RefreshTokenSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data['refresh']
+
+
+class RefreshTokenView(SignedTokenView):
+    """exchange a refresh token for a new access and refresh token"""
+
+    def post(self, request):
+        try:
+            return Response(tokens.refresh_tokens(self.get_refresh_token()))
+        except tokens.InvalidToken:
+            raise exceptions.AuthenticationFailed('Invalid, expired or used refresh token.')
+
+
+class RevokeTokenView(SignedTokenView):
+    """revoke a refresh token, access tokens run out on their own"""
+
+    def post(self, request):
+        try:
+            tokens.revoke_refresh_token(self.get_refresh_token())
+        except tokens.InvalidToken:
+            raise exceptions.AuthenticationFailed('Invalid or expired refresh token.')
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication, SignedTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
         """retrieve and return authenticated user"""
-        return self.request.user
+        user = self.request.user
+        # signed access tokens only carry the id, the serializer never
+        # reads the password a shared token cache leaves out
+        deferred = user.get_deferred_fields() - set(PRIVATE_USER_FIELDS)
+        if deferred:
+            try:
+                user.refresh_from_db(fields=deferred)
+            except type(user).DoesNotExist:
+                # deleted while its access token is still valid
+                raise exceptions.AuthenticationFailed('User inactive or deleted.')
+
+        return user